@@ -14,6 +14,51 @@ __PERSONAL_API_KEY__ = None
 # The base URL for the AC Transit APIs
 __BASE_URL__ = 'https://api.actransit.org/transit'
 
+# Intern the low cardinality strings (route names, directions, ...) while decoding
+__INTERN_STRINGS__ = True
+
+# The cache for the static data (stops, routes and trips) of the current GTFS schedule,
+# None when the static data is not cached.
+__STATIC_CACHE__ = None
+
+# The GTFS feed serving the static data offline, None when the static data is
+# fetched from the APIs.
+__OFFLINE_FEED__ = None
+
+# The cache for the predictions keyed by stop ID, None when the predictions are not cached.
+__PREDICTION_CACHE__ = None
+
+# The time to live of the cached predictions in seconds.
+__PREDICTION_TTL__ = 15
+
+# The size in feet of the cells of the grid the get_active_stops queries are snapped
+# to, None when the queries are made from the exact coordinates.
+__STOP_QUERY_GRID__ = None
+
+# The cache for the stops of the cells of the grid, bounded so that the clients
+# moving across the service area do not grow it without limit.
+__STOP_QUERY_CACHE__ = None
+
+# The default time to live in seconds and size of the cache of the grid cells.
+STOP_QUERY_TTL = 3600
+STOP_QUERY_CACHE_ENTRIES = 4096
+
+# The cache for the raw responses of the APIs (caching.TTLCache or
+# disk_cache.DiskCache), None when the responses are not cached.
+__RESPONSE_CACHE__ = None
+
+# The time to live of the cached responses, seconds or a function of the URL
+# returning seconds, None for the time to live of the endpoint (see response_ttl).
+__RESPONSE_CACHE_TTL__ = None
+
+# The default time to live in seconds of the cached responses of the endpoints, the
+# static data only changes with the GTFS schedule.
+STATIC_TTL = 3600
+PREDICTIONS_TTL = 15
+TRIP_ESTIMATE_TTL = 30
+SERVICE_NOTICES_TTL = 60
+SCHEDULE_INFO_TTL = 300
+
 
 # for processing JSON
 from json import dumps
@@ -33,13 +78,37 @@ from api_classes import ACTransitTripScheduleType
 from api_classes import ACTransitTripEstimate
 from api_classes import ACTransitGtfsScheduleInfo
 
+# for sharing the low cardinality strings between the wrapper objects
+from interning import ROUTE_TABLE
+
+# for decoding the JSON responses with the fastest installed backend
+from json_backends import decode_json
+
+# for caching the stops of the grid cells
+from caching import TTLCache
+
+# for snapping the nearby stop queries to a grid
+from query_grid import snap_to_grid
+from query_grid import stops_within
+
+# for receiving the responses compressed
+from compression import accept_encoding
+from compression import read_body
+
 # for processing the requests(sending)
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
 from urllib.request import urlopen
 from urllib.request import Request
 
 # for processing the response(receiving)
 import urllib.response
 
+# for telling the cached responses of the static data
+import re
+
 # gonna use the webbrowser to ping me when theh bus is nearby
 import webbrowser
 
@@ -61,21 +130,305 @@ def set_api_key(api_key):
   return
 
 
+
+def set_base_url(base_url):
+  '''
+  Sets the base URL of the APIs, for eg - the URL of a gateway.Gateway serving \
+  the same routes as ACTransit. Pass None to go back to ACTransit's APIs.
+
+  :return: None
+  '''
+
+  global __BASE_URL__
+
+  __BASE_URL__ = 'https://api.actransit.org/transit' if base_url is None else base_url.rstrip('/')
+  return
+
+
+
+def set_string_interning(enabled):
+  '''
+  Enables or disables the interning of the low cardinality strings (route names, \
+  directions, stop names, ...) while decoding the JSON responses. Interning is \
+  enabled by default, it makes all the wrapper objects share one copy of these strings.
+
+  :return: None
+  '''
+
+  global __INTERN_STRINGS__
+
+  __INTERN_STRINGS__ = enabled
+  return
+
+
+def set_static_cache(cache):
+  '''
+  Sets the cache used for the static data (stops, routes and trips), which only \
+  changes with the GTFS schedule. Pass None to stop caching the static data.
+
+  The cache needs to be invalidated when the GTFS schedule changes, see \
+  schedule_watcher.ScheduleWatcher.
+
+  :return: None
+  '''
+
+  global __STATIC_CACHE__
+
+  __STATIC_CACHE__ = cache
+  return
+
+
+
+def set_offline_feed(feed):
+  '''
+  Sets the GTFS feed (gtfs_feed.GtfsFeed) serving the static data offline. \
+  get_stops, get_active_stops, get_routes and get_trips are then served from the \
+  feed without calling ACTransit's APIs. Pass None to go back to the APIs.
+
+  :return: None
+  '''
+
+  global __OFFLINE_FEED__
+
+  __OFFLINE_FEED__ = feed
+  return
+
+
+
+def invalidate_static_cache():
+  '''
+  Removes all the static data (stops, routes and trips) from the static cache, \
+  the stops of the grid cells (see set_stop_query_grid) and the responses of the \
+  static data from the response cache (see set_response_cache), so that the static \
+  data is fetched again from the APIs.
+
+  :return: None
+  '''
+
+  global __STATIC_CACHE__, __STOP_QUERY_CACHE__, __RESPONSE_CACHE__
+
+  if __STATIC_CACHE__ is not None:
+    __STATIC_CACHE__.clear()
+  if __STOP_QUERY_CACHE__ is not None:
+    __STOP_QUERY_CACHE__.clear()
+  cache = __RESPONSE_CACHE__
+  if cache is not None:
+    for key in cache.keys():
+      if _is_static_response(key):
+        cache.invalidate(key)
+  return
+
+
+
+def set_prediction_cache(cache, ttl=15):
+  '''
+  Sets the cache used for the predictions, get_predictions then serves the \
+  predictions of a stop fetched less than ttl seconds ago from the cache. Pass \
+  None to stop caching the predictions. See prefetch.PredictionPrefetcher to \
+  refresh the predictions of the busy stops before they expire.
+
+  :return: None
+  '''
+
+  global __PREDICTION_CACHE__, __PREDICTION_TTL__
+
+  __PREDICTION_CACHE__ = cache
+  __PREDICTION_TTL__ = ttl
+  return
+
+
+
+def set_stop_query_grid(cell_size, cache=None):
+  '''
+  Snaps the get_active_stops queries to a grid of cells of cell_size feet. The \
+  stops of a cell are fetched once, from the center of the cell with the search \
+  radius extended to cover the whole cell, and the stops within the search radius \
+  of the exact point are filtered on the client. The queries made from the same \
+  cell then share the response, kept in cache - by default a TTLCache of \
+  STOP_QUERY_CACHE_ENTRIES cells expiring after STOP_QUERY_TTL seconds. Pass None \
+  to query from the exact coordinates again.
+
+  :return: None
+  '''
+
+  global __STOP_QUERY_GRID__, __STOP_QUERY_CACHE__
+
+  __STOP_QUERY_GRID__ = cell_size
+  if cell_size is None:
+    __STOP_QUERY_CACHE__ = None
+  elif cache is not None:
+    __STOP_QUERY_CACHE__ = cache
+  else:
+    __STOP_QUERY_CACHE__ = TTLCache(ttl=STOP_QUERY_TTL, max_entries=STOP_QUERY_CACHE_ENTRIES, \
+      name='stop_query_grid')
+  return
+
+
+
+def set_response_cache(cache, ttl=None):
+  '''
+  Sets the cache used for the raw responses of the APIs, fetch_decode_json then only \
+  calls ACTransit's APIs for the URLs that are not cached. A disk_cache.DiskCache \
+  shares the responses between all the processes using the same file. Pass None \
+  to stop caching the responses.
+
+  ttl is the time to live of the responses in seconds, or a function of the URL \
+  (without the API key) returning it, a TTL of 0 skips the caching of the URL. \
+  None means the time to live of the endpoint of the URL, see response_ttl - the \
+  predictions are then never served stale, whatever the TTL of the cache.
+
+  for eg - set_response_cache(DiskCache('~/.actransit.db'), \
+    ttl=lambda url: 0 if '/predictions' in url else 3600)
+
+  :return: None
+  '''
+
+  global __RESPONSE_CACHE__, __RESPONSE_CACHE_TTL__
+
+  __RESPONSE_CACHE__ = cache
+  __RESPONSE_CACHE_TTL__ = ttl
+  return
+
+
+
+def response_cache_key(url):
+  '''
+  The key of the response of the URL in the response cache, the URL without the \
+  API key so that the cached responses are shared whatever the key used.
+
+  :return: str
+  '''
+
+  parts = urlsplit(url)
+  query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) \
+    if name != 'token']
+  return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+
+# The end of the paths of the static data (stops, active stops, routes and trips),
+# the predictions of a stop are not static.
+__STATIC_PATH__ = re.compile(\
+  r'/(?:stops|routes|route/[^/]+/trips|stops/[^/]+/(?!predictions/?$)[^/]+(?:/[^/]+/[^/]+)?)/?$')
+
+
+
+def _is_static_response(key):
+  '''
+  Whether the key of the response cache is the URL of static data.
+
+  :return: bool
+  '''
+
+  global __STATIC_PATH__
+
+  return __STATIC_PATH__.search(urlsplit(key).path) is not None
+
+
+
+# The time to live of the responses of the endpoints that are not static data - (end
+# of the path, time to live).
+__RESPONSE_TTLS__ = [
+  (re.compile(r'/stops/[^/]+/predictions/?$'), PREDICTIONS_TTL),
+  (re.compile(r'/route/[^/]+/tripestimate/?$'), TRIP_ESTIMATE_TTL),
+  (re.compile(r'/servicenotices/?$'), SERVICE_NOTICES_TTL),
+  (re.compile(r'/gtfs/scheduleinfo/?$'), SCHEDULE_INFO_TTL),
+]
+
+
+
+def response_ttl(url):
+  '''
+  The default time to live in seconds of the cached response of the URL, as per \
+  its endpoint - STATIC_TTL for the static data, PREDICTIONS_TTL for the \
+  predictions... 0 (not cached) for the URLs of the other endpoints.
+
+  :return: int
+  '''
+
+  global __RESPONSE_TTLS__
+
+  path = urlsplit(url).path
+  for pattern, ttl in __RESPONSE_TTLS__:
+    if pattern.search(path):
+      return ttl
+  return STATIC_TTL if _is_static_response(url) else 0
+
+
+
+# Static data caching utility method
+def cached_static(key, load):
+  '''
+  Gets the static data for the key from the static cache, calling load() to get \
+  it when it is not cached (or when there is no static cache).
+
+  The cached lists are shared, so a copy of the list is returned.
+
+  :return: list
+  '''
+
+  global __STATIC_CACHE__
+
+  cache = __STATIC_CACHE__
+  if cache is None:
+    return load()
+  values = cache.get(key)
+  if values is None:
+    values = load()
+    cache.put(key, values)
+  return list(values)
+
+
+
+def _api_url(path, **params):
+  '''
+  The URL of the API at path (under the base URL, see set_base_url), with the query \
+  parameters in order followed by the API key.
+
+  :return: str
+  '''
+
+  global __BASE_URL__, __PERSONAL_API_KEY__
+
+  params['token'] = __PERSONAL_API_KEY__
+  return '{}{}?{}'.format(__BASE_URL__, path, urlencode(params))
+
+
+
 # JSON decoding utility method
 def fetch_decode_json(url):
   '''
   The utility method fetches the JSON response from the input URL,
   then decodes the JSON response object and returns the JSON string.
+  The response is requested compressed (gzip, deflate or brotli), decompressed \
+  while it is being read, and the bytes are decoded by the JSON backend in use \
+  (see json_backends). The bytes are served from the response cache when one is \
+  set, see set_response_cache.
 
   :return: JSON object
   '''
 
-  json_obj = None
-  json_decoder = JSONDecoder()
-  with urlopen(url) as res:
-    json_obj = str(res.read(), encoding='utf-8')
-  json_obj = json_decoder.decode(json_obj)
-  return json_obj
+  global __INTERN_STRINGS__, __RESPONSE_CACHE__, __RESPONSE_CACHE_TTL__
+
+  cache = __RESPONSE_CACHE__
+  data = None
+  if cache is not None:
+    key = response_cache_key(url)
+    ttl = __RESPONSE_CACHE_TTL__(key) if callable(__RESPONSE_CACHE_TTL__) \
+      else __RESPONSE_CACHE_TTL__
+    if ttl is None:
+      ttl = response_ttl(key)
+    if ttl != 0:
+      data = cache.get(key)
+  if data is None:
+    request = Request(url, headers={'Accept-Encoding': accept_encoding()})
+    with urlopen(request) as res:
+      data = read_body(res)
+    if cache is not None and ttl != 0:
+      # the bytes are cached rather than the decoded objects, they are compact and
+      # decode into fresh objects (interned as per the current setting)
+      cache.put(key, data, ttl)
+  return decode_json(data, intern=__INTERN_STRINGS__)
 
 
 
@@ -98,9 +451,22 @@ def get_stops():
   :return: list(ACTransitStop)
   '''
 
-  global __BASE_URL__, __PERSONAL_API_KEY__
+  global __OFFLINE_FEED__
+
+  if __OFFLINE_FEED__ is not None:
+    return __OFFLINE_FEED__.stops()
+  return cached_static('stops', _fetch_stops)
 
-  url = '{}/stops/?token={}'.format(__BASE_URL__, __PERSONAL_API_KEY__)
+
+
+def _fetch_stops():
+  '''
+  Fetches all currently active stops of the ACTransit system, bypassing the static cache.
+
+  :return: list(ACTransitStop)
+  '''
+
+  url = _api_url('/stops/')
   json_obj = fetch_decode_json(url)
   ac_transit_stops = []
   for obj in json_obj:
@@ -116,15 +482,41 @@ def get_active_stops(latitude, longitude, route_name, search_radius = 500):
   '''
   Retrieve all active stops within a certain radius (in feet) \
   of the given point. The default search radius is 500 feet.
+  The queries are snapped to a grid when one is set, see set_stop_query_grid.
+
+  :return: list(ACTransitStop)
+  '''
+
+  global __OFFLINE_FEED__, __STOP_QUERY_GRID__, __STOP_QUERY_CACHE__
+
+  if __OFFLINE_FEED__ is not None:
+    return __OFFLINE_FEED__.active_stops(latitude, longitude, route_name, search_radius)
+  grid, cache = __STOP_QUERY_GRID__, __STOP_QUERY_CACHE__
+  if grid is None:
+    return _fetch_active_stops(latitude, longitude, route_name, search_radius)
+
+  cell = snap_to_grid(latitude, longitude, grid)
+  radius = search_radius + cell.half_diagonal
+  key = (grid, cell.row, cell.column, str(route_name), radius)
+  stops = cache.get(key)
+  if stops is None:
+    stops = _fetch_active_stops(cell.latitude, cell.longitude, route_name, radius)
+    cache.put(key, stops)
+  return stops_within(latitude, longitude, stops, search_radius)
+
+
+
+def _fetch_active_stops(latitude, longitude, route_name, search_radius):
+  '''
+  Fetches the active stops within the search radius (in feet) of the given point, \
+  from the exact coordinates.
 
   :return: list(ACTransitStop)
   '''
 
   global __BASE_URL__, __PERSONAL_API_KEY__
 
-  url = '{base_url}/stops/{latitude}/{longitude}/{distance}/{routeName}?token={api_key}'.format(\
-    base_url=__BASE_URL__, latitude=latitude, longitude=longitude, \
-    distance=search_radius, routeName=route_name, api_key=__PERSONAL_API_KEY__)
+  url = _api_url('/stops/{}/{}/{}/{}'.format(latitude, longitude, search_radius, route_name))
   json_obj = fetch_decode_json(url)
   ac_transit_stops = []
   for obj in json_obj:
@@ -145,12 +537,8 @@ def get_active_stops_type2(latitude, longitude, route_name, search_radius = 500)
   :return: list(ACTransitStop)
   '''
 
-  global __BASE_URL__, __PERSONAL_API_KEY__
-  
-  url = '{base_url}/stops/{latitude}/{longitude}?\
-  distance={distance}&routeName={routeName}&token={api_key}'.format(\
-    base_url=__BASE_URL__, latitude=latitude, longitude=longitude, \
-    distance=search_radius, routeName=route_name, api_key=__PERSONAL_API_KEY__)
+  url = _api_url('/stops/{}/{}'.format(latitude, longitude), \
+    distance=search_radius, routeName=route_name)
   json_obj = fetch_decode_json(url)
   ac_transit_stops = []
   for obj in json_obj:
@@ -165,14 +553,32 @@ def get_active_stops_type2(latitude, longitude, route_name, search_radius = 500)
 def get_predictions(stopId):
   '''
   Retrieve vehicle predictions for a particular stop.
+  The predictions are served from the prediction cache when one is set, see \
+  set_prediction_cache.
 
   :return: list(ACTransitPrediction)
   '''
 
-  global __BASE_URL__, __PERSONAL_API_KEY__
+  global __PREDICTION_CACHE__
+
+  cache = __PREDICTION_CACHE__
+  if cache is None:
+    return _fetch_predictions(stopId)
+  predictions = cache.get(stopId)
+  if predictions is None:
+    predictions = cache_predictions(stopId, _fetch_predictions(stopId))
+  return list(predictions)
+
+
+
+def _fetch_predictions(stopId):
+  '''
+  Fetches the vehicle predictions for a particular stop, bypassing the prediction cache.
 
-  url = '{base_url}/stops/{stopId}/predictions?token={api_key}'.format(\
-    base_url=__BASE_URL__, stopId=stopId, api_key=__PERSONAL_API_KEY__)
+  :return: list(ACTransitPrediction)
+  '''
+
+  url = _api_url('/stops/{}/predictions'.format(stopId))
   json_obj = fetch_decode_json(url)
   ac_transit_predictions = []
   for obj in json_obj:
@@ -181,6 +587,156 @@ def get_predictions(stopId):
 
 
 
+def cache_predictions(stopId, predictions):
+  '''
+  Puts the predictions of the stop in the prediction cache (if there is one), \
+  for the time to live of the predictions.
+
+  :return: list(ACTransitPrediction)
+  '''
+
+  global __PREDICTION_CACHE__, __PREDICTION_TTL__
+
+  if __PREDICTION_CACHE__ is not None:
+    __PREDICTION_CACHE__.put(stopId, predictions, __PREDICTION_TTL__)
+  return predictions
+
+
+
+
+# GET route/{routeName}/tripestimate?fromStopId={fromStopId}&toStopId={toStopId}
+# Retrieve the estimated trip time between two stops of a route.
+def get_trip_estimate(route_name, origin_stop_id, destination_stop_id):
+  '''
+  Retrieve the estimated trip time between the origin and the destination stops \
+  of the route.
+
+  Returns None when ACTransit has no estimate for the stops.
+
+  :return: ACTransitTripEstimate
+  '''
+
+  url = _api_url('/route/{}/tripestimate'.format(route_name), \
+    fromStopId=origin_stop_id, toStopId=destination_stop_id)
+  json_obj = fetch_decode_json(url)
+  if isinstance(json_obj, list):
+    json_obj = json_obj[0] if len(json_obj) > 0 else None
+  if json_obj is None:
+    return None
+  return ACTransitTripEstimate(json_obj)
+
+
+
+
+# GET servicenotices
+# Retrieve the currently active service notices.
+def get_service_notices():
+  '''
+  Retrieve the currently active service notices, providing information regarding \
+  possible delays, detours and/or changes to service.
+
+  :return: list(ACTransitServiceNotice)
+  '''
+
+  url = _api_url('/servicenotices')
+  json_obj = fetch_decode_json(url)
+  ac_transit_service_notices = []
+  for obj in json_obj:
+    ac_transit_service_notices.append(ACTransitServiceNotice(obj))
+  return ac_transit_service_notices
+
+
+
+
+# GET gtfs/scheduleinfo
+# Retrieve the information about the current GTFS schedule.
+def get_gtfs_schedule_info():
+  '''
+  Retrieve the information about the current GTFS schedule, when it was last \
+  updated and the range of dates it services.
+
+  :return: ACTransitGtfsScheduleInfo
+  '''
+
+  url = _api_url('/gtfs/scheduleinfo')
+  return ACTransitGtfsScheduleInfo(fetch_decode_json(url))
+
+
+
+
+# GET routes
+# Retrieve all of AC Transit's currently active routes.
+def get_routes():
+  '''
+  Retrieve all currently active routes of the ACTransit system.
+
+  The routes are also registered in the shared route table referenced by the \
+  predictions, trips and trip estimates.
+
+  :return: list(ACTransitRoute)
+  '''
+
+  global __OFFLINE_FEED__
+
+  if __OFFLINE_FEED__ is not None:
+    ac_transit_routes = __OFFLINE_FEED__.routes()
+    ROUTE_TABLE.register(ac_transit_routes)
+    return ac_transit_routes
+  return cached_static('routes', _fetch_routes)
+
+
+
+def _fetch_routes():
+  '''
+  Fetches all currently active routes of the ACTransit system, bypassing the static cache.
+
+  :return: list(ACTransitRoute)
+  '''
+
+  url = _api_url('/routes')
+  json_obj = fetch_decode_json(url)
+  ac_transit_routes = []
+  for obj in json_obj:
+    ac_transit_routes.append(ACTransitRoute(obj))
+  ROUTE_TABLE.register(ac_transit_routes)
+  return ac_transit_routes
+
+
+
+
+# GET route/{routeName}/trips
+# Retrieve the trips of a route.
+def get_trips(route_name):
+  '''
+  Retrieve the trips of the route as per the current GTFS schedule.
+
+  :return: list(ACTransitTrip)
+  '''
+
+  global __OFFLINE_FEED__
+
+  if __OFFLINE_FEED__ is not None:
+    return __OFFLINE_FEED__.trips(route_name)
+  return cached_static(('trips', route_name), lambda: _fetch_trips(route_name))
+
+
+
+def _fetch_trips(route_name):
+  '''
+  Fetches the trips of the route, bypassing the static cache.
+
+  :return: list(ACTransitTrip)
+  '''
+
+  url = _api_url('/route/{}/trips'.format(route_name))
+  json_obj = fetch_decode_json(url)
+  ac_transit_trips = []
+  for obj in json_obj:
+    ac_transit_trips.append(ACTransitTrip(obj))
+  return ac_transit_trips
+
+
+
 
 def main():
   '''
@@ -20,6 +20,126 @@ For modifying data, please create another wrapper on these classes.
 '''
 
 from enum import Enum
+from operator import itemgetter
+
+from interning import ROUTE_TABLE
+
+
+
+def _tuple_getter(fields):
+  '''
+  The function getting the tuple of the values of the fields from a JSON object.
+  '''
+
+  if len(fields) == 1:
+    field = fields[0]
+    return lambda json_obj: (json_obj[field],)
+  return itemgetter(*fields)
+
+
+
+def _from_tuple(cls, values):
+  '''
+  Rebuilds the wrapper object of the class from the values of its fields, used
+  for unpickling.
+  '''
+
+  return cls.from_tuple(values)
+
+
+
+class ACTransitObject(object):
+  '''
+  The base class of the wrapper classes, it serializes them compactly - as a dict
+  of the fields of the JSON object (to_dict/from_dict) or as a tuple of the values
+  of the fields (to_tuple/from_tuple). The objects pickle as the tuple, instead of
+  the JSON object plus all the attributes extracted from it.
+
+  The fields of each class are listed by FIELDS, in the order of the tuple.
+
+  The objects compare equal when they are of the same class and all their fields
+  are equal, and they hash on their natural identity - the fields listed by
+  KEY_FIELDS, for eg - (StopId, TripId) for the predictions. key() gives the
+  identity, to match the objects of two snapshots (see snapshots.diff_snapshots).
+  '''
+
+  FIELDS = ()
+  KEY_FIELDS = ()
+
+  # itemgetter of the FIELDS and of the KEY_FIELDS of each class, made on first use
+  __getters__ = {}
+  __key_getters__ = {}
+
+  def to_dict(self):
+    '''
+    The JSON object (as a new dict) of the fields of the wrapper object, the keys
+    of the response that are not fields are left out.
+
+    :return: dict
+    '''
+
+    json_obj = self.__json__
+    return dict((field, json_obj[field]) for field in self.FIELDS)
+
+  @classmethod
+  def from_dict(cls, json_obj):
+    '''
+    Makes the wrapper object from the JSON object (decoded to python dict).
+
+    :return: ACTransitObject
+    '''
+
+    return cls(json_obj)
+
+  def to_tuple(self):
+    '''
+    The values of the fields of the wrapper object, in the order of FIELDS.
+
+    :return: tuple
+    '''
+
+    cls = type(self)
+    getter = ACTransitObject.__getters__.get(cls)
+    if getter is None:
+      getter = _tuple_getter(cls.FIELDS)
+      ACTransitObject.__getters__[cls] = getter
+    return getter(self.__json__)
+
+  @classmethod
+  def from_tuple(cls, values):
+    '''
+    Makes the wrapper object from the values of its fields, in the order of FIELDS.
+
+    :return: ACTransitObject
+    '''
+
+    return cls(dict(zip(cls.FIELDS, values)))
+
+  def key(self):
+    '''
+    The natural identity of the wrapper object, the values of its KEY_FIELDS.
+
+    :return: tuple
+    '''
+
+    cls = type(self)
+    getter = ACTransitObject.__key_getters__.get(cls)
+    if getter is None:
+      getter = _tuple_getter(cls.KEY_FIELDS)
+      ACTransitObject.__key_getters__[cls] = getter
+    return getter(self.__json__)
+
+  def __eq__(self, other):
+    if type(other) is not type(self):
+      return NotImplemented
+    return self.to_tuple() == other.to_tuple()
+
+  def __hash__(self):
+    return hash(self.key())
+
+  def __reduce__(self):
+    return (_from_tuple, (type(self), self.to_tuple()))
+
 
 
 
@@ -32,12 +152,15 @@ from enum import Enum
 #     "Longitude": -122.2882275,
 #     "ScheduledTime": null
 #   }
-class ACTransitStop(object):
+class ACTransitStop(ACTransitObject):
   '''
   This is the implementation of the object model used by ACTransit for their \
   Stops JSON object.
   '''
 
+  FIELDS = ('StopId', 'Name', 'Latitude', 'Longitude', 'ScheduledTime')
+  KEY_FIELDS = ('StopId',)
+
   def __init__(self, json_obj):
     '''
     Takes the JSON obj (decoded to python dict) and extracts the stopId, \
@@ -129,12 +252,16 @@ class ACTransitStop(object):
 #     "PredictedDeparture": "2017-01-11T17:31:00",
 #     "PredictionDateTime": "2017-01-11T17:10:41"
 #   }
-class ACTransitPrediction(object):
+class ACTransitPrediction(ACTransitObject):
   '''
   This is the implementation of the object model used by ACTransit for their \
   Predictions JSON object.
   '''
 
+  FIELDS = ('StopId', 'TripId', 'VehicleId', 'RouteName', 'PredictedDelayInSeconds', \
+    'PredictedDeparture', 'PredictionDateTime')
+  KEY_FIELDS = ('StopId', 'TripId')
+
   def __init__(self, json_obj):
     '''
     Takes the json_object representation(python dict) as the input and\
@@ -161,19 +288,19 @@ class ACTransitPrediction(object):
 
   @property
   def tripId(self):
-   '''
-   The tripId of the prediction as per the AC Transit system.
-   :return: int
-   '''
+    '''
+    The tripId of the prediction as per the AC Transit system.
+    :return: int
+    '''
 
     return self.__tripId
 
   @property
   def vehicleId(self):
-   '''
-   The vehicleId of the prediction as per the AC Transit system.
-   :return: int
-   '''
+    '''
+    The vehicleId of the prediction as per the AC Transit system.
+    :return: int
+    '''
 
     return self.__vehicleId
 
@@ -186,6 +313,17 @@ class ACTransitPrediction(object):
 
     return self.__route_name
 
+  @property
+  def route(self):
+    '''
+    The route of the prediction from the shared route table, None when the \
+    route is not in the table.
+
+    :return: ACTransitRoute
+    '''
+
+    return ROUTE_TABLE.get(self.__route_name)
+
   @property
   def predicted_delay_in_seconds(self):
     '''
@@ -248,12 +386,16 @@ class ACTransitPrediction(object):
 #   "Heading": 1,
 #   "TimeLastReported": "2017-02-12T18:42:34.7670857-08:00"
 # }
-class ACTransitVehicle(object):
+class ACTransitVehicle(ACTransitObject):
   '''
   A wrapper class for holding the vehicle information in the ACTransit response JSON.
   Real time informationr regarding a particular vehicle.
   '''
 
+  FIELDS = ('VehicleId', 'CurrentTripId', 'Latitude', 'Longitude', 'Heading', \
+    'TimeLastReported')
+  KEY_FIELDS = ('VehicleId',)
+
   def __init__(self, json_obj):
     '''
     Initialize the ACTransitVehicle from the JSON object received in the response
@@ -350,11 +492,14 @@ class ACTransitVehicle(object):
 #   "EarliestServiceDate": "2017-02-13T11:19:49.9671828-08:00",
 #   "LatestServiceDate": "2017-02-13T11:19:49.9671828-08:00"
 # }
-class ACTransitGtfsScheduleInfo(object):
+class ACTransitGtfsScheduleInfo(ACTransitObject):
   '''
   Wrapper class for the GtfsScheduleInfo JSON response object from ACTransit.
   '''
 
+  FIELDS = ('UpdatedDate', 'EarliestServiceDate', 'LatestServiceDate')
+  KEY_FIELDS = ('UpdatedDate',)
+
   def __init__(self, json_obj):
     '''
     Initializes the ACTransitGtfsScheduleInfo object from incoming JSON response
@@ -426,12 +571,15 @@ class ACTransitGtfsScheduleInfo(object):
 #     "sample str 2"
 #   ]
 # }
-class ACTransitServiceNotice(object):
+class ACTransitServiceNotice(ACTransitObject):
   '''
   The wrapper object for ServiceNotice JSON object response from ACTransit APIs.
   This provides information regarding possible delays, detours and/or changes to service.
   '''
 
+  FIELDS = ('PostDate', 'Title', 'NoticeText', 'Url', 'ImpactedRoutes')
+  KEY_FIELDS = ('PostDate', 'Url')
+
   def __init__(self, json_obj):
     '''
     Initializes the ACTransitServiceNotice object from the JSON response object from ACTransit.
@@ -519,12 +667,15 @@ class ACTransitServiceNotice(object):
 #   "Name": "sample str 2",
 #   "Description": "sample str 3"
 # }
-class ACTransitRoute(object):
+class ACTransitRoute(ACTransitObject):
   '''
   The wrapper for the Route JSON response object from ACTransit APIs.
   It holds the route information.
   '''
 
+  FIELDS = ('RouteId', 'Name', 'Description')
+  KEY_FIELDS = ('RouteId',)
+
   def __init__(self, json_obj):
     '''
     Initializes the ACTransitRoute object from the JSON object from response.
@@ -606,12 +757,15 @@ class ACTransitTripScheduleType(Enum):
 #     "StartTime": "2017-02-12T19:59:08.7349044-08:00",
 #     "Direction": "Northbound" (or might be "Southbound")
 # }
-class ACTransitTrip(object):
+class ACTransitTrip(ACTransitObject):
   '''
   The wrapper class for Trip JSON response object from ACTransit's APIs.
   This wrapper class holds the information describing the trip information of a vehicle.
   '''
 
+  FIELDS = ('TripId', 'RouteName', 'ScheduleType', 'StartTime', 'Direction')
+  KEY_FIELDS = ('TripId',)
+
   def __init__(self, json_obj):
     '''
     Initializes the ACTransitTrip object from the JSON response object.
@@ -644,6 +798,17 @@ class ACTransitTrip(object):
 
     return self.__route_name
 
+  @property
+  def route(self):
+    '''
+    The route the trip is running from the shared route table, None when the \
+    route is not in the table.
+
+    :return: ACTransitRoute
+    '''
+
+    return ROUTE_TABLE.get(self.__route_name)
+
   @property
   def schedule_type(self):
     '''
@@ -707,11 +872,14 @@ class ACTransitTrip(object):
 #     "Latitude": 1.0,
 #     "Longitude": 1.0
 #   }
-class ACTransitTimePoint(object):
+class ACTransitTimePoint(ACTransitObject):
   '''
   The wrapper class for the TimePoint JSON response object from ACTransit's APIs
   '''
 
+  FIELDS = ('TripId', 'Sequence', 'Latitude', 'Longitude')
+  KEY_FIELDS = ('TripId', 'Sequence')
+
   def __init__(self, json_obj):
     '''
     Initializes the ACTransitTimePoint object from the incoming JSON response objects
@@ -751,7 +919,7 @@ class ACTransitTimePoint(object):
     :return: float
     '''
 
-    return self.__latitude`
+    return self.__latitude
 
   @property
   def longitude(self):
@@ -797,13 +965,17 @@ class ACTransitTimePoint(object):
 #   "TripDuration": "00:00:00.1234567",
 #   "VehicleId": 1
 # }
-class ACTransitTripEstimate(object):
+class ACTransitTripEstimate(ACTransitObject):
   '''
   The wrapper class for the TripEstimate JSON response object from ACTransit APIs
 
   Provides details of all estimated trip times between stops.
   '''
 
+  FIELDS = ('RouteName', 'OriginStopId', 'DestinationStopId', 'ExpectedDepartureTime', \
+    'TripDuration', 'VehicleId')
+  KEY_FIELDS = ('RouteName', 'OriginStopId', 'DestinationStopId')
+
   def __init__(self, json_obj):
     '''
     Initializes the ACTransitTripEstimate object from the incoming JSON response object
@@ -827,6 +999,17 @@ class ACTransitTripEstimate(object):
 
     return self.__route_name
 
+  @property
+  def route(self):
+    '''
+    The route of the trip estimate from the shared route table, None when the \
+    route is not in the table.
+
+    :return: ACTransitRoute
+    '''
+
+    return ROUTE_TABLE.get(self.__route_name)
+
   @property
   def origin_stop_id(self):
     '''
@@ -0,0 +1,161 @@
+# batch_codec.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the binary codec for whole lists of wrapper objects, for
+shipping the results between processes or keeping them in caches.
+
+A batch holds the objects of one wrapper class, column by column - the values of
+every field of all the objects are stored together as JSON, the string columns
+dictionary coded (every distinct string once, and the code of the string of every
+object, -1 for None), optionally compressed with zlib. The class is stored by name,
+only the wrapper classes of api_classes are accepted.
+
+Decoding a batch never runs code from the data, a truncated or garbled batch raises
+ValueError, and the format does not depend on the version of Python.
+
+Layout of a batch -
+
+  header  : magic (b'ACT2'), flags (uint8, 1 when compressed), length of the class
+            name (uint8), count (uint32), class name (ascii)
+  payload : [zlib](utf-8 JSON array of the columns, in the order of FIELDS - a
+            column is the array of its values, or {"strings": [...], "codes": [...]})
+'''
+
+import json
+import struct
+import zlib
+
+from api_classes import ACTransitGtfsScheduleInfo
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitRoute
+from api_classes import ACTransitServiceNotice
+from api_classes import ACTransitStop
+from api_classes import ACTransitTimePoint
+from api_classes import ACTransitTrip
+from api_classes import ACTransitTripEstimate
+from api_classes import ACTransitVehicle
+
+
+
+__BATCH_MAGIC__ = b'ACT2'
+__BATCH_HEADER__ = struct.Struct('<4sBBI')
+__COMPRESSED__ = 1
+
+# The classes that can be stored in a batch, by name.
+__CLASSES__ = dict((cls.__name__, cls) for cls in (ACTransitStop, ACTransitPrediction, \
+  ACTransitVehicle, ACTransitGtfsScheduleInfo, ACTransitServiceNotice, ACTransitRoute, \
+  ACTransitTrip, ACTransitTimePoint, ACTransitTripEstimate))
+
+
+
+def _encode_column(values):
+  '''
+  The JSON value of a column, dictionary coded when all its values are strings or None.
+  '''
+
+  if not all(value is None or isinstance(value, str) for value in values):
+    return list(values)
+  codes = {}
+  strings = []
+  for value in values:
+    if value is not None and value not in codes:
+      codes[value] = len(strings)
+      strings.append(value)
+  return {'strings': strings, 'codes': [-1 if value is None else codes[value] for value in values]}
+
+
+
+def _decode_column(column, count):
+  '''
+  The values of a column from its JSON value, checked against the count of objects.
+  '''
+
+  if isinstance(column, dict):
+    strings, codes = column.get('strings'), column.get('codes')
+    if not isinstance(strings, list) or not isinstance(codes, list) or \
+      not all(type(code) is int and -1 <= code < len(strings) for code in codes):
+      raise ValueError('Corrupted string column in the batch')
+    values = [None if code < 0 else strings[code] for code in codes]
+  elif isinstance(column, list):
+    values = column
+  else:
+    raise ValueError('Corrupted column in the batch')
+  if len(values) != count:
+    raise ValueError('The columns of the batch do not hold {} objects'.format(count))
+  return values
+
+
+
+def encode_batch(objs, cls=None, compression_level=None):
+  '''
+  Encodes the list of wrapper objects (all of the same class) into a batch. cls is
+  needed for an empty list only. The batch is compressed with zlib when
+  compression_level is given.
+
+  :return: bytes
+  '''
+
+  objs = list(objs)
+  if cls is None:
+    if not objs:
+      raise ValueError('The class of an empty batch must be given')
+    cls = type(objs[0])
+  if __CLASSES__.get(cls.__name__) is not cls:
+    raise ValueError('Cannot encode {} objects in a batch'.format(cls.__name__))
+  for obj in objs:
+    if type(obj) is not cls:
+      raise ValueError('A batch only holds {} objects, not {}'.format(\
+        cls.__name__, type(obj).__name__))
+
+  rows = [obj.to_tuple() for obj in objs]
+  columns = [_encode_column(column) for column in zip(*rows)] if rows else []
+  payload = json.dumps(columns, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+  flags = 0
+  if compression_level is not None:
+    payload = zlib.compress(payload, compression_level)
+    flags |= __COMPRESSED__
+  name = cls.__name__.encode('ascii')
+  return __BATCH_HEADER__.pack(__BATCH_MAGIC__, flags, len(name), len(objs)) + name + payload
+
+
+
+def decode_batch(data):
+  '''
+  Decodes a batch back into the list of wrapper objects.
+
+  :return: list(ACTransitObject)
+  '''
+
+  data = memoryview(data)
+  if len(data) < __BATCH_HEADER__.size:
+    raise ValueError('Not a batch of wrapper objects')
+  magic, flags, name_length, count = __BATCH_HEADER__.unpack_from(data, 0)
+  if magic != __BATCH_MAGIC__:
+    raise ValueError('Not a batch of wrapper objects')
+  start = __BATCH_HEADER__.size
+  name = bytes(data[start:start + name_length]).decode('ascii', 'replace')
+  cls = __CLASSES__.get(name)
+  if cls is None:
+    raise ValueError('Unknown class {} in the batch'.format(repr(name)))
+  payload = data[start + name_length:]
+  if flags & __COMPRESSED__:
+    try:
+      payload = zlib.decompress(payload)
+    except zlib.error as e:
+      raise ValueError('Corrupted batch: {}'.format(e))
+  if count == 0:
+    return []
+
+  try:
+    columns = json.loads(bytes(payload).decode('utf-8'))
+  except ValueError as e:
+    # JSONDecodeError and UnicodeDecodeError
+    raise ValueError('Corrupted batch: {}'.format(e))
+  fields = cls.FIELDS
+  if not isinstance(columns, list) or len(columns) != len(fields):
+    raise ValueError('The batch does not hold the {} fields of {}'.format(len(fields), name))
+  columns = [_decode_column(column, count) for column in columns]
+  return [cls(dict(zip(fields, row))) for row in zip(*columns)]
@@ -0,0 +1,174 @@
+# caching.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the in-memory caches used by the library to avoid calling
+ACTransit's APIs again for data that was fetched recently.
+'''
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from weakref import WeakSet
+
+
+
+# The caches alive, for the memory report of diagnostics.
+__CACHES__ = WeakSet()
+
+
+
+def live_caches():
+  '''
+  The TTLCache objects alive in the process.
+
+  :return: list(TTLCache)
+  '''
+
+  return list(__CACHES__)
+
+
+
+class TTLCache(object):
+  '''
+  A thread safe in-memory cache whose entries expire after a time to live (TTL).
+
+  When max_entries is given, the least recently used entries are evicted once the
+  cache grows beyond it.
+  '''
+
+  def __init__(self, ttl=None, max_entries=None, clock=monotonic, name=None):
+    '''
+    Initializes the cache. The ttl is the default time to live of the entries in
+    seconds, None means that the entries never expire. The name labels the cache
+    in the memory report.
+    '''
+
+    self.__name = name
+    self.__ttl = ttl
+    self.__max_entries = max_entries
+    self.__clock = clock
+    self.__entries = OrderedDict()
+    self.__lock = Lock()
+    __CACHES__.add(self)
+
+  @property
+  def name(self):
+    '''
+    The name of the cache, None when it was not named.
+
+    :return: str
+    '''
+
+    return self.__name
+
+  @property
+  def ttl(self):
+    '''
+    The default time to live of the entries in seconds.
+
+    :return: float
+    '''
+
+    return self.__ttl
+
+  def get(self, key, default=None):
+    '''
+    Gets the value cached for the key, or the default when the key is not cached
+    or its entry has expired.
+
+    :return: object
+    '''
+
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry is None:
+        return default
+      value, expires_at = entry
+      if expires_at is not None and expires_at <= self.__clock():
+        del self.__entries[key]
+        return default
+      self.__entries.move_to_end(key)
+      return value
+
+  def put(self, key, value, ttl=None):
+    '''
+    Caches the value for the key. The ttl overrides the default time to live of
+    the cache for this entry.
+
+    :return: None
+    '''
+
+    ttl = self.__ttl if ttl is None else ttl
+    expires_at = None if ttl is None else self.__clock() + ttl
+    with self.__lock:
+      self.__entries[key] = (value, expires_at)
+      self.__entries.move_to_end(key)
+      if self.__max_entries is not None:
+        while len(self.__entries) > self.__max_entries:
+          self.__entries.popitem(last=False)
+    return
+
+  def expires_at(self, key):
+    '''
+    The time (as per the clock of the cache) at which the entry for the key expires.
+    None when the key is not cached or its entry never expires.
+
+    :return: float
+    '''
+
+    with self.__lock:
+      entry = self.__entries.get(key)
+      return None if entry is None else entry[1]
+
+  def values(self):
+    '''
+    The values cached, including the values whose entries have expired but were
+    not removed yet.
+
+    :return: list
+    '''
+
+    with self.__lock:
+      return [entry[0] for entry in self.__entries.values()]
+
+  def keys(self):
+    '''
+    The keys cached, including the keys whose entries have expired but were not
+    removed yet.
+
+    :return: list
+    '''
+
+    with self.__lock:
+      return list(self.__entries.keys())
+
+  def invalidate(self, key):
+    '''
+    Removes the entry for the key from the cache.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      self.__entries.pop(key, None)
+    return
+
+  def clear(self):
+    '''
+    Removes all the entries from the cache.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      self.__entries.clear()
+    return
+
+  def __contains__(self, key):
+    return self.get(key, self) is not self
+
+  def __len__(self):
+    return len(self.__entries)
@@ -0,0 +1,131 @@
+# compression.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module negotiates the compression of the responses of ACTransit's APIs and
+decompresses them while they are being read.
+
+gzip and deflate are always accepted, brotli is accepted when the brotli (or
+brotlicffi) package is installed. The body of the response is read in chunks and
+every chunk is decompressed as soon as it arrives, the decompressed bytes go
+straight to the JSON decoding.
+'''
+
+import zlib
+
+
+
+# The size of the chunks read from the responses.
+CHUNK_SIZE = 65536
+
+try:
+  import brotli as __brotli__
+except ImportError:
+  try:
+    import brotlicffi as __brotli__
+  except ImportError:
+    __brotli__ = None
+
+
+
+def accept_encoding():
+  '''
+  The value of the Accept-Encoding request header, the encodings that can be decompressed.
+
+  :return: str
+  '''
+
+  encodings = ['gzip', 'deflate']
+  if __brotli__ is not None:
+    encodings.append('br')
+  return ', '.join(encodings)
+
+
+
+class _IdentityDecompressor(object):
+
+  def decompress(self, chunk):
+    return chunk
+
+  def flush(self):
+    return b''
+
+
+
+class _ZlibDecompressor(object):
+  '''
+  Decompresses gzip and deflate bodies. Some servers send raw deflate streams for
+  the deflate encoding instead of zlib streams, those are detected on the first chunk.
+  '''
+
+  def __init__(self):
+    # MAX_WBITS | 32 detects the gzip and zlib headers
+    self.__decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+    self.__started = False
+
+  def decompress(self, chunk):
+    if not self.__started and chunk:
+      self.__started = True
+      try:
+        return self.__decompressor.decompress(chunk)
+      except zlib.error:
+        self.__decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    return self.__decompressor.decompress(chunk)
+
+  def flush(self):
+    return self.__decompressor.flush()
+
+
+
+class _BrotliDecompressor(object):
+
+  def __init__(self):
+    self.__decompressor = __brotli__.Decompressor()
+
+  def decompress(self, chunk):
+    if hasattr(self.__decompressor, 'process'):
+      return self.__decompressor.process(chunk)
+    return self.__decompressor.decompress(chunk)
+
+  def flush(self):
+    return b''
+
+
+
+def decompressor(content_encoding):
+  '''
+  The decompressor for the Content-Encoding of a response.
+
+  :return: object with decompress(chunk) and flush() methods
+  '''
+
+  encoding = (content_encoding or 'identity').strip().lower()
+  if encoding in ('identity', ''):
+    return _IdentityDecompressor()
+  if encoding in ('gzip', 'x-gzip', 'deflate'):
+    return _ZlibDecompressor()
+  if encoding == 'br' and __brotli__ is not None:
+    return _BrotliDecompressor()
+  raise ValueError('Unsupported Content-Encoding {}'.format(repr(content_encoding)))
+
+
+
+def read_body(response, chunk_size=CHUNK_SIZE):
+  '''
+  Reads the body of the response (as returned by urlopen), decompressing the chunks
+  as they are read.
+
+  :return: bytes
+  '''
+
+  body_decompressor = decompressor(response.headers.get('Content-Encoding'))
+  chunks = []
+  while True:
+    chunk = response.read(chunk_size)
+    if not chunk:
+      break
+    chunks.append(body_decompressor.decompress(chunk))
+  chunks.append(body_decompressor.flush())
+  return b''.join(chunks)
@@ -0,0 +1,298 @@
+# delay_analytics.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module computes the delay statistics of large sets of predictions, grouped by
+route, stop, hour of day and ACTransitTripScheduleType.
+
+The predictions are given as columns (dict of NumPy arrays), like the ones read from
+the history log by history.HistoryReader.read_predictions, and all the aggregations
+are sort based and vectorized - the rows are sorted once on (group, delay) and the
+counts, means and percentiles of every group are read off the sorted delays with
+index arithmetic, without looping over the groups or the rows in Python.
+'''
+
+import numpy as np
+
+from api_classes import ACTransitTripScheduleType
+from history import NULL_DELAY
+from history import NULL_TIME
+from timeutils import parse_timestamp
+
+
+
+# The columns the predictions can be grouped by.
+GROUP_COLUMNS = ('route', 'stop', 'hour', 'schedule_type')
+
+__SECONDS_PER_DAY__ = 86400
+
+# The epoch (1970-01-01) was a Thursday, Monday is 0 as per datetime.weekday().
+__EPOCH_WEEKDAY__ = 3
+
+
+
+def _time(datestr):
+  seconds = parse_timestamp(datestr)
+  return NULL_TIME if seconds is None else int(seconds)
+
+
+
+def columns_from_predictions(predictions):
+  '''
+  Builds the prediction columns from a list of ACTransitPrediction objects, the
+  columns are the same as the ones read from the history log (the missing delays
+  and times are NULL_DELAY and NULL_TIME).
+
+  :return: dict
+  '''
+
+  route_codes = {}
+  predictions = list(predictions)
+  size = len(predictions)
+  columns = {
+    'prediction_time': np.fromiter((_time(p.predicted_date_time) for p in predictions), \
+      dtype=np.int64, count=size),
+    'stop_id': np.fromiter((p.stopId for p in predictions), dtype=np.int64, count=size),
+    'route_code': np.fromiter((route_codes.setdefault(p.route_name, len(route_codes)) \
+      for p in predictions), dtype=np.int32, count=size),
+    'predicted_delay': np.fromiter((NULL_DELAY if p.predicted_delay_in_seconds is None \
+      else p.predicted_delay_in_seconds for p in predictions), dtype=np.int64, count=size),
+    'predicted_departure': np.fromiter((_time(p.predicted_departure) for p in predictions), \
+      dtype=np.int64, count=size),
+  }
+  columns['route_names'] = sorted(route_codes, key=route_codes.get)
+  return columns
+
+
+
+def schedule_types(timestamps, holidays=None):
+  '''
+  The ACTransitTripScheduleType values of the days of the timestamps (seconds since
+  the epoch, in the local time of ACTransit). Holidays run on the Sunday schedule,
+  holidays is an iterable of the days (seconds since the epoch of any moment of the day).
+
+  :return: numpy.ndarray
+  '''
+
+  days = np.floor_divide(np.asarray(timestamps, dtype=np.int64), __SECONDS_PER_DAY__)
+  weekdays = (days + __EPOCH_WEEKDAY__) % 7
+  types = np.full(len(days), ACTransitTripScheduleType.WEEKDAY.value, dtype=np.int64)
+  types[weekdays == 5] = ACTransitTripScheduleType.SATURDAY.value
+  types[weekdays == 6] = ACTransitTripScheduleType.SUNDAY.value
+  if holidays is not None:
+    holiday_days = np.floor_divide(np.asarray(list(holidays), dtype=np.int64), __SECONDS_PER_DAY__)
+    types[np.isin(days, holiday_days)] = ACTransitTripScheduleType.SUNDAY.value
+  return types
+
+
+
+def _known_rows(columns, time_columns=()):
+  '''
+  The columns without the rows whose delay is missing (NULL_DELAY), or whose time
+  is missing (NULL_TIME) in one of the time_columns.
+  '''
+
+  keep = np.asarray(columns['predicted_delay']) != NULL_DELAY
+  for name in time_columns:
+    keep &= np.asarray(columns[name]) != NULL_TIME
+  if keep.all():
+    return columns
+  known = dict(columns)
+  for name, column in columns.items():
+    if name != 'route_names':
+      known[name] = np.asarray(column)[keep]
+  return known
+
+
+
+def _departure_columns(by):
+  '''
+  The time columns the groups depend on.
+  '''
+
+  return ('predicted_departure',) if 'hour' in by or 'schedule_type' in by else ()
+
+
+
+def _group_key_columns(columns, by, holidays):
+  '''
+  The integer key arrays of the group columns.
+  '''
+
+  keys = []
+  for name in by:
+    if name == 'route':
+      keys.append(np.asarray(columns['route_code'], dtype=np.int64))
+    elif name == 'stop':
+      keys.append(np.asarray(columns['stop_id'], dtype=np.int64))
+    elif name == 'hour':
+      departure = np.asarray(columns['predicted_departure'], dtype=np.int64)
+      keys.append((departure % __SECONDS_PER_DAY__) // 3600)
+    elif name == 'schedule_type':
+      keys.append(schedule_types(columns['predicted_departure'], holidays))
+    else:
+      raise ValueError('Cannot group the predictions by {}, use one of {}'.format(\
+        repr(name), ', '.join(GROUP_COLUMNS)))
+  return keys
+
+
+
+def _composite_key(keys, size):
+  '''
+  Packs the key arrays into one int64 key (mixed radix), returns None if the
+  packed key would not fit in an int64.
+  '''
+
+  composite = np.zeros(size, dtype=np.int64)
+  capacity = 1
+  for key in keys:
+    if size == 0:
+      break
+    low = int(key.min())
+    radix = int(key.max()) - low + 1
+    capacity *= radix
+    if capacity >= 2 ** 62:
+      return None
+    composite = composite * radix + (key - low)
+  return composite
+
+
+
+def _sort_groups(keys, values):
+  '''
+  Sorts the rows on (keys, values). Returns the order of the rows, the start of
+  every group in the sorted rows, and the count of every group.
+  '''
+
+  size = len(values)
+  composite = None
+  if np.issubdtype(values.dtype, np.integer) and size > 0:
+    # integer values are packed with the keys, a single argsort sorts the rows
+    value_radix = int(values.max()) - int(values.min()) + 1
+    composite = _composite_key(list(keys) + [values], size)
+  if composite is not None:
+    order = np.argsort(composite, kind='stable')
+    sorted_groups = composite[order] // value_radix
+    boundary = np.zeros(size, dtype=bool)
+    boundary[1:] = sorted_groups[1:] != sorted_groups[:-1]
+  else:
+    order = np.lexsort([values] + list(reversed(keys)))
+    boundary = np.zeros(size, dtype=bool)
+    for key in keys:
+      sorted_key = key[order]
+      boundary[1:] |= sorted_key[1:] != sorted_key[:-1]
+  if size > 0:
+    boundary[0] = True
+  starts = np.nonzero(boundary)[0]
+  counts = np.diff(np.append(starts, size))
+  return order, starts, counts
+
+
+
+def _percentile(sorted_values, starts, counts, percentile):
+  '''
+  The percentile (linear interpolation) of every group of the sorted values.
+  '''
+
+  position = starts + (counts - 1) * (percentile / 100.0)
+  low = np.floor(position).astype(np.int64)
+  high = np.ceil(position).astype(np.int64)
+  return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+
+def delay_percentiles(columns, by=('route',), percentiles=(50, 90, 95), holidays=None):
+  '''
+  The predicted delay statistics (in seconds) of the predictions grouped by the
+  columns in by - any of 'route', 'stop', 'hour' (hour of day of the predicted
+  departure) and 'schedule_type' (ACTransitTripScheduleType value of the day). The
+  predictions without a delay (history.NULL_DELAY) are left out, and so are the
+  predictions without a departure when grouping by 'hour' or 'schedule_type'.
+
+  Returns a dict with one array per group column (the route names for 'route'), and
+  the 'count', 'mean', 'min', 'max' and 'p<percentile>' arrays, one entry per group.
+
+  for eg - delay_percentiles(HistoryReader(path).read_predictions(), by=('route', 'hour'))
+
+  :return: dict
+  '''
+
+  columns = _known_rows(columns, _departure_columns(by))
+  delays = np.asarray(columns['predicted_delay'])
+  keys = _group_key_columns(columns, by, holidays)
+  order, starts, counts = _sort_groups(keys, delays)
+  sorted_delays = delays[order].astype(np.float64)
+
+  result = {}
+  first_rows = order[starts]
+  for name, key in zip(by, keys):
+    if name == 'route':
+      result[name] = np.array(columns['route_names'], dtype=object)[key[first_rows]] \
+        if len(first_rows) else np.zeros(0, dtype=object)
+    else:
+      result[name] = key[first_rows]
+
+  result['count'] = counts
+  sums = np.add.reduceat(sorted_delays, starts) if len(starts) else np.zeros(0)
+  result['mean'] = sums / np.maximum(counts, 1)
+  result['min'] = sorted_delays[starts]
+  result['max'] = sorted_delays[starts + counts - 1]
+  for percentile in percentiles:
+    result['p{}'.format(percentile)] = _percentile(sorted_delays, starts, counts, percentile)
+  return result
+
+
+
+def rolling_delay(columns, window, by=('route',), time_column='prediction_time', holidays=None):
+  '''
+  The rolling mean of the predicted delay over the last window seconds (on the
+  time_column), computed for every prediction within its group. The predictions
+  without a delay (history.NULL_DELAY) or without a time (history.NULL_TIME) are
+  left out.
+
+  Returns a dict with the group columns, the 'time', the 'delay', the 'rolling_mean'
+  and the 'rolling_count' arrays, the rows sorted by group and time.
+
+  :return: dict
+  '''
+
+  columns = _known_rows(columns, set(_departure_columns(by) + (time_column,)))
+  delays = np.asarray(columns['predicted_delay'], dtype=np.float64)
+  times = np.asarray(columns[time_column], dtype=np.int64)
+  keys = _group_key_columns(columns, by, holidays)
+  order, starts, counts = _sort_groups(keys, times)
+  size = len(order)
+
+  sorted_times = times[order]
+  sorted_delays = delays[order]
+  group_ids = np.repeat(np.arange(len(starts)), counts)
+
+  # the rows are sorted on (group, time), so the start of the window of every row
+  # is found with a binary search on (group, time - window) over the packed key
+  if size > 0:
+    span = int(sorted_times.max()) - int(sorted_times.min()) + int(window) + 1
+    base = int(sorted_times.min()) - int(window)
+    packed = group_ids * span + (sorted_times - base)
+    window_starts = np.searchsorted(packed, packed - int(window), side='left')
+  else:
+    window_starts = np.zeros(0, dtype=np.int64)
+
+  cumulative = np.concatenate(([0.0], np.cumsum(sorted_delays)))
+  rows = np.arange(size)
+  rolling_count = rows + 1 - window_starts
+  rolling_sum = cumulative[rows + 1] - cumulative[window_starts]
+
+  result = {}
+  for name, key in zip(by, keys):
+    if name == 'route':
+      result[name] = np.array(columns['route_names'], dtype=object)[key[order]] \
+        if size else np.zeros(0, dtype=object)
+    else:
+      result[name] = key[order]
+  result['time'] = sorted_times
+  result['delay'] = sorted_delays
+  result['rolling_count'] = rolling_count
+  result['rolling_mean'] = rolling_sum / np.maximum(rolling_count, 1)
+  return result
@@ -0,0 +1,158 @@
+# departure_board.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the departure board, merging the predictions of several nearby
+stops ordered by their predicted departure.
+
+The board keeps one heap of all the predictions. Refreshing a stop only replaces the
+entries of that stop - the old entries are marked stale (by bumping the generation
+of the stop) and dropped lazily, and the heap is compacted once the stale entries
+outnumber the live ones. Reading the next departures walks the heap best first,
+so it costs O(n log n) for the top n, whatever the size of the board.
+'''
+
+from heapq import heapify
+from heapq import heappop
+from heapq import heappush
+from itertools import count
+from threading import Lock
+
+from actransit_apis import actransit_apis
+
+
+
+# Sorts the predictions without a predicted departure after all the others.
+__NO_DEPARTURE__ = '\uffff'
+
+
+
+class DepartureBoard(object):
+  '''
+  Merges the ACTransitPrediction objects of several stops ordered by their predicted
+  departure, with incremental per stop updates.
+  '''
+
+  def __init__(self, stop_ids=None):
+    '''
+    Initializes the board for the stops (empty until they are refreshed).
+    '''
+
+    self.__heap = []
+    self.__generations = {}
+    self.__live = {}
+    self.__stale = 0
+    self.__sequence = count()
+    # the generations are unique across the stops, so that the stale entries of a
+    # removed stop never come back to life if the stop is added again
+    self.__generation = count()
+    self.__lock = Lock()
+    for stop_id in stop_ids or ():
+      self.__generations[stop_id] = next(self.__generation)
+      self.__live[stop_id] = 0
+
+  @property
+  def stop_ids(self):
+    '''
+    The stops on the board.
+
+    :return: list(int)
+    '''
+
+    return list(self.__generations.keys())
+
+  def update_stop(self, stop_id, predictions):
+    '''
+    Replaces the predictions of the stop on the board with the ACTransitPrediction
+    objects, as returned by get_predictions for the stop.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      generation = next(self.__generation)
+      self.__generations[stop_id] = generation
+      self.__stale += self.__live.get(stop_id, 0)
+
+      live = 0
+      for prediction in predictions:
+        departure = prediction.predicted_departure
+        heappush(self.__heap, (__NO_DEPARTURE__ if departure is None else departure, \
+          next(self.__sequence), stop_id, generation, prediction))
+        live += 1
+      self.__live[stop_id] = live
+      self.__compact()
+    return
+
+  def remove_stop(self, stop_id):
+    '''
+    Removes the stop and its predictions from the board.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      if stop_id not in self.__generations:
+        return
+      self.__stale += self.__live.pop(stop_id)
+      del self.__generations[stop_id]
+      self.__compact()
+    return
+
+  def refresh(self, stop_ids=None):
+    '''
+    Fetches the predictions of the stops (all the stops of the board when None)
+    with get_predictions and updates the board with them.
+
+    :return: None
+    '''
+
+    for stop_id in (self.stop_ids if stop_ids is None else stop_ids):
+      self.update_stop(stop_id, actransit_apis.get_predictions(stop_id))
+    return
+
+  def __is_live(self, entry):
+    return self.__generations.get(entry[2]) == entry[3]
+
+  def __compact(self):
+    '''
+    Drops the stale entries from the top of the heap, and rebuilds the heap once
+    the stale entries outnumber the live ones.
+    '''
+
+    heap = self.__heap
+    while heap and not self.__is_live(heap[0]):
+      heappop(heap)
+      self.__stale -= 1
+    if self.__stale > 64 and self.__stale > len(heap) - self.__stale:
+      self.__heap = [entry for entry in heap if self.__is_live(entry)]
+      heapify(self.__heap)
+      self.__stale = 0
+
+  def top(self, n=10):
+    '''
+    The next n predictions of the board, ordered by their predicted departure.
+
+    :return: list(ACTransitPrediction)
+    '''
+
+    with self.__lock:
+      heap = self.__heap
+      result = []
+      if not heap:
+        return result
+      # best first walk of the heap, the children of an entry are never smaller
+      frontier = [(heap[0], 0)]
+      while frontier and len(result) < n:
+        entry, index = heappop(frontier)
+        if self.__is_live(entry):
+          result.append(entry[4])
+        for child in (2 * index + 1, 2 * index + 2):
+          if child < len(heap):
+            heappush(frontier, (heap[child], child))
+      return result
+
+  def __len__(self):
+    return sum(self.__live.values())
@@ -0,0 +1,192 @@
+# diagnostics.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module reports how much of the heap belongs to the library - the live wrapper
+objects per class, the caches (caching.TTLCache) and, when tracemalloc is tracing,
+the memory allocated from the files of the library.
+
+It also measures the size of the wrapper objects with tracemalloc, to check them
+against memory budgets, so that a change of api_classes.py making every object
+bigger fails the tests (see check_budgets).
+'''
+
+import gc
+import os
+import sys
+import tracemalloc
+from types import BuiltinFunctionType
+from types import FunctionType
+from types import ModuleType
+
+from api_classes import ACTransitObject
+from caching import live_caches
+from interning import ROUTE_TABLE
+
+
+
+# The directory of the library, the allocations of its files are reported.
+__LIBRARY_DIRECTORY__ = os.path.dirname(os.path.abspath(__file__))
+
+# The objects not counted in the sizes - they are shared by the whole program.
+__SHARED_TYPES__ = (type, ModuleType, FunctionType, BuiltinFunctionType)
+
+
+
+class MemoryBudgetError(AssertionError):
+  '''
+  Raised by check_budgets when the objects of a class are bigger than their budget.
+  '''
+
+
+
+def deep_size(obj, seen=None):
+  '''
+  The size in bytes of the object and of all the objects it references, the objects
+  in seen (a set of ids, updated) are not counted again - pass the same set to count
+  the objects shared by several objects only once.
+
+  :return: int
+  '''
+
+  seen = set() if seen is None else seen
+  size = 0
+  pending = [obj]
+  while pending:
+    current = pending.pop()
+    if id(current) in seen or isinstance(current, __SHARED_TYPES__):
+      continue
+    seen.add(id(current))
+    size += sys.getsizeof(current)
+    pending.extend(gc.get_referents(current))
+  return size
+
+
+
+def wrapper_objects():
+  '''
+  The live wrapper objects (of the classes of api_classes) grouped by class name.
+
+  :return: dict(str, list)
+  '''
+
+  objects = {}
+  for obj in gc.get_objects():
+    if isinstance(obj, ACTransitObject):
+      objects.setdefault(type(obj).__name__, []).append(obj)
+  return objects
+
+
+
+def memory_report(include_caches=True):
+  '''
+  The memory held by the library. Returns a dict with -
+
+    'classes' : {class name: {'count': live objects, 'bytes': size of the objects}}
+    'caches'  : {cache name: {'entries': entries, 'bytes': size of the cache}}
+    'traced'  : {file of the library: bytes allocated and still alive}, None when
+                tracemalloc is not tracing
+
+  The strings shared by several objects of a class (interned) are counted once for
+  the class. The objects held by a cache are counted for the class and the cache.
+
+  :return: dict
+  '''
+
+  gc.collect()
+  classes = {}
+  for name, objs in sorted(wrapper_objects().items()):
+    seen = set()
+    classes[name] = {'count': len(objs), 'bytes': sum(deep_size(obj, seen) for obj in objs)}
+
+  caches = {}
+  if include_caches:
+    for index, cache in enumerate(live_caches()):
+      name = cache.name or 'TTLCache#{}'.format(index)
+      caches[name] = {'entries': len(cache), 'bytes': deep_size(cache)}
+    caches['route_table'] = {'entries': len(ROUTE_TABLE), 'bytes': deep_size(ROUTE_TABLE)}
+
+  traced = None
+  if tracemalloc.is_tracing():
+    traced = {}
+    snapshot = tracemalloc.take_snapshot().filter_traces(\
+      [tracemalloc.Filter(True, os.path.join(__LIBRARY_DIRECTORY__, '*'))])
+    for statistic in snapshot.statistics('filename'):
+      filename = os.path.basename(statistic.traceback[0].filename)
+      traced[filename] = traced.get(filename, 0) + statistic.size
+
+  return {'classes': classes, 'caches': caches, 'traced': traced}
+
+
+
+def format_report(report):
+  '''
+  The memory report as a text table.
+
+  :return: str
+  '''
+
+  lines = ['{:<28} {:>10} {:>14}'.format('class', 'count', 'bytes')]
+  for name, row in report['classes'].items():
+    lines.append('{:<28} {:>10} {:>14}'.format(name, row['count'], row['bytes']))
+  if report['caches']:
+    lines.append('{:<28} {:>10} {:>14}'.format('cache', 'entries', 'bytes'))
+    for name, row in report['caches'].items():
+      lines.append('{:<28} {:>10} {:>14}'.format(name, row['entries'], row['bytes']))
+  if report['traced'] is not None:
+    lines.append('{:<28} {:>25}'.format('file (tracemalloc)', 'bytes'))
+    for name, size in sorted(report['traced'].items(), key=lambda item: -item[1]):
+      lines.append('{:<28} {:>25}'.format(name, size))
+  return '\n'.join(lines)
+
+
+
+def object_size(cls, json_objs):
+  '''
+  The mean number of bytes held by an object of the wrapper class, measured with
+  tracemalloc while making the objects from the JSON objects (decoded beforehand,
+  so that only the wrapper objects themselves are measured).
+
+  :return: float
+  '''
+
+  json_objs = list(json_objs)
+  was_tracing = tracemalloc.is_tracing()
+  if not was_tracing:
+    tracemalloc.start()
+  try:
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [cls(json_obj) for json_obj in json_objs]
+    after = tracemalloc.get_traced_memory()[0]
+  finally:
+    if not was_tracing:
+      tracemalloc.stop()
+  # the list holding the objects is not part of their size
+  return (after - before - sys.getsizeof(objs)) / float(max(len(objs), 1))
+
+
+
+def check_budgets(budgets, samples):
+  '''
+  Checks the size of the objects of the wrapper classes against their budgets -
+  budgets maps the classes to bytes per object, samples maps them to the JSON
+  objects to make the objects from. Raises MemoryBudgetError listing the classes
+  over budget, returns the measured sizes otherwise.
+
+  :return: dict
+  '''
+
+  sizes = {}
+  over = []
+  for cls, budget in budgets.items():
+    size = object_size(cls, samples[cls])
+    sizes[cls] = size
+    if size > budget:
+      over.append('{} objects take {:.0f} bytes, the budget is {}'.format(\
+        cls.__name__, size, budget))
+  if over:
+    raise MemoryBudgetError('; '.join(over))
+  return sizes
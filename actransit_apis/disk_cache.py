@@ -0,0 +1,273 @@
+# disk_cache.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the disk cache, a cache with the interface of caching.TTLCache
+kept in a SQLite database, so that it is shared by all the processes using the same
+file and survives them - the cron jobs and the command line calls then reuse the
+responses fetched by each other, see actransit_apis.set_response_cache.
+
+The keys are strings and the values bytes (the raw responses cached by
+fetch_decode_json), stored as they are - nothing read from the file is unpickled,
+and the file can be shared by any Python version.
+
+The database runs in WAL mode, the readers never block the writers. Every thread
+uses its own connection, and the writes of the processes are serialized by SQLite.
+'''
+
+import os
+import sqlite3
+import threading
+from time import time
+
+
+
+# How long a connection waits for the lock of the database held by another process.
+LOCK_TIMEOUT = 30
+
+__SCHEMA__ = '''
+CREATE TABLE IF NOT EXISTS responses (
+  key TEXT PRIMARY KEY,
+  value BLOB NOT NULL,
+  size INTEGER NOT NULL,
+  expires_at REAL,
+  accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);
+
+-- the running total of the sizes of the values, kept by the triggers in the
+-- transactions changing the entries so that no write scans the table
+CREATE TABLE IF NOT EXISTS totals (
+  id INTEGER PRIMARY KEY CHECK (id = 0),
+  size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+  UPDATE totals SET size = size + new.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+  UPDATE totals SET size = size - old.size WHERE id = 0;
+END;
+'''
+
+
+
+def _check_key(key):
+  if not isinstance(key, str):
+    raise TypeError('DiskCache keys must be strings, not {}'.format(type(key).__name__))
+  return key
+
+
+
+class DiskCache(object):
+  '''
+  A cache of bytes values keyed by strings kept in a SQLite database, safe to use
+  from several threads and processes at once. The entries expire after a time to
+  live (TTL).
+
+  When max_bytes is given, the expired and then the least recently used entries are
+  evicted once the values take more than max_bytes.
+  '''
+
+  def __init__(self, path, ttl=None, max_bytes=None, clock=time):
+    '''
+    Initializes the cache in the database at path (~ is expanded), creating it if
+    needed. The ttl is the default time to live of the entries in seconds, None means
+    that the entries never expire. The clock must be shared by the processes (wall
+    clock).
+    '''
+
+    self.__path = os.path.expanduser(path)
+    self.__ttl = ttl
+    self.__max_bytes = max_bytes
+    self.__clock = clock
+    self.__local = threading.local()
+    connection = self.__connection()
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(__SCHEMA__)
+
+  @property
+  def ttl(self):
+    '''
+    The default time to live of the entries in seconds.
+
+    :return: float
+    '''
+
+    return self.__ttl
+
+  @property
+  def path(self):
+    '''
+    The path of the database.
+
+    :return: str
+    '''
+
+    return self.__path
+
+  def __connection(self):
+    connection = getattr(self.__local, 'connection', None)
+    if connection is None:
+      # autocommit mode, the transactions are begun explicitly
+      connection = sqlite3.connect(self.__path, timeout=LOCK_TIMEOUT, isolation_level=None)
+      connection.execute('PRAGMA synchronous=NORMAL')
+      self.__local.connection = connection
+    return connection
+
+  def get(self, key, default=None):
+    '''
+    Gets the value cached for the key, or the default when the key is not cached
+    or its entry has expired.
+
+    :return: bytes
+    '''
+
+    connection = self.__connection()
+    key = _check_key(key)
+    now = self.__clock()
+    row = connection.execute('SELECT value, expires_at FROM responses WHERE key = ?', \
+      (key,)).fetchone()
+    if row is None:
+      return default
+    value, expires_at = row
+    if expires_at is not None and expires_at <= now:
+      connection.execute('DELETE FROM responses WHERE key = ? AND expires_at <= ?', (key, now))
+      return default
+    if self.__max_bytes is not None:
+      # the access time only matters for the eviction
+      connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+    return bytes(value)
+
+  def put(self, key, value, ttl=None):
+    '''
+    Caches the value (bytes) for the key (str). The ttl overrides the default time
+    to live of the cache for this entry.
+
+    :return: None
+    '''
+
+    ttl = self.__ttl if ttl is None else ttl
+    now = self.__clock()
+    expires_at = None if ttl is None else now + ttl
+    key = _check_key(key)
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+      raise TypeError('DiskCache values must be bytes, not {}'.format(type(value).__name__))
+    value = bytes(value)
+    connection = self.__connection()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+      # deleted then inserted rather than replaced, the REPLACE deletions do not run
+      # the trigger keeping the total size
+      connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+      connection.execute('INSERT INTO responses VALUES (?, ?, ?, ?, ?)', \
+        (key, value, len(value), expires_at, now))
+      if self.__max_bytes is not None:
+        self.__evict(connection, now)
+    except BaseException:
+      connection.execute('ROLLBACK')
+      raise
+    connection.execute('COMMIT')
+    return
+
+  def __evict(self, connection, now):
+    '''
+    Evicts the expired entries, then the least recently used ones, until the values
+    fit in max_bytes. The size of the values is read from the running total, the
+    table is only walked (through its indexes) when something must be evicted.
+    '''
+
+    if self.__total(connection) <= self.__max_bytes:
+      return
+    connection.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+    total = self.__total(connection)
+    if total <= self.__max_bytes:
+      return
+    evicted = []
+    for key, size in connection.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+      if total <= self.__max_bytes:
+        break
+      evicted.append((key,))
+      total -= size
+    connection.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+  @staticmethod
+  def __total(connection):
+    total, = connection.execute('SELECT size FROM totals WHERE id = 0').fetchone()
+    return total
+
+  @property
+  def size(self):
+    '''
+    The total size in bytes of the values cached, including the entries that have
+    expired but were not removed yet.
+
+    :return: int
+    '''
+
+    return self.__total(self.__connection())
+
+  def expires_at(self, key):
+    '''
+    The time (as per the clock of the cache) at which the entry for the key expires.
+    None when the key is not cached or its entry never expires.
+
+    :return: float
+    '''
+
+    row = self.__connection().execute('SELECT expires_at FROM responses WHERE key = ?', \
+      (_check_key(key),)).fetchone()
+    return None if row is None else row[0]
+
+  def keys(self):
+    '''
+    The keys cached, including the keys whose entries have expired but were not
+    removed yet.
+
+    :return: list(str)
+    '''
+
+    return [key for key, in self.__connection().execute('SELECT key FROM responses')]
+
+  def invalidate(self, key):
+    '''
+    Removes the entry for the key from the cache.
+
+    :return: None
+    '''
+
+    self.__connection().execute('DELETE FROM responses WHERE key = ?', (_check_key(key),))
+    return
+
+  def clear(self):
+    '''
+    Removes all the entries from the cache.
+
+    :return: None
+    '''
+
+    self.__connection().execute('DELETE FROM responses')
+    return
+
+  def close(self):
+    '''
+    Closes the connection of the current thread to the database.
+
+    :return: None
+    '''
+
+    connection = getattr(self.__local, 'connection', None)
+    if connection is not None:
+      connection.close()
+      self.__local.connection = None
+    return
+
+  def __contains__(self, key):
+    return self.get(key, self) is not self
+
+  def __len__(self):
+    count, = self.__connection().execute('SELECT COUNT(*) FROM responses').fetchone()
+    return count
@@ -0,0 +1,322 @@
+# export.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module exports the stops, the predictions and the recorded history to NDJSON
+or CSV files.
+
+The records are streamed from their source to the output - the JSON objects of the
+responses (or the rows of the history log, block by block) are written one by one
+through a large write buffer, without building the wrapper objects or the whole
+output in memory. The watch mode polls the predictions of stops and appends every
+poll to the output.
+
+for eg -
+  python -m export stops --format csv --output stops.csv
+  python -m export predictions 51303 55555 --watch 30 --output predictions.ndjson
+  python -m export history history.log --kind vehicles --format csv
+'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from actransit_apis import actransit_apis
+from history import HistoryReader
+from history import NULL_DELAY
+from history import NULL_ID
+from history import NULL_TIME
+from history import PREDICTIONS
+from history import VEHICLES
+
+
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+
+# The size of the write buffer of the output files.
+BUFFER_SIZE = 1 << 20
+
+# The fields of the records (as named in the JSON objects of ACTransit's APIs), the
+# columns of the CSV files.
+STOP_FIELDS = ('StopId', 'Name', 'Latitude', 'Longitude', 'ScheduledTime')
+PREDICTION_FIELDS = ('StopId', 'TripId', 'VehicleId', 'RouteName', 'PredictedDelayInSeconds', \
+  'PredictedDeparture', 'PredictionDateTime')
+VEHICLE_FIELDS = ('VehicleId', 'CurrentTripId', 'Latitude', 'Longitude', 'Heading', \
+  'TimeLastReported')
+
+
+
+class RecordWriter(object):
+  '''
+  Writes records (dicts keyed by the fields) to a text stream as NDJSON or CSV.
+  '''
+
+  def __init__(self, out, fields, fmt=NDJSON, header=True):
+    '''
+    Initializes the writer on the text stream out. For CSV, the header row is only
+    written when header is True (not when appending to an existing file).
+    '''
+
+    if fmt not in (NDJSON, CSV):
+      raise ValueError('Unknown export format {}, use {} or {}'.format(repr(fmt), NDJSON, CSV))
+    self.__out = out
+    self.__fields = tuple(fields)
+    self.__format = fmt
+    self.__count = 0
+    self.__csv_writer = None
+    if fmt == CSV:
+      self.__csv_writer = csv.writer(out, lineterminator='\n')
+      if header:
+        self.__csv_writer.writerow(self.__fields)
+
+  @property
+  def count(self):
+    '''
+    The number of records written.
+
+    :return: int
+    '''
+
+    return self.__count
+
+  def write(self, record):
+    '''
+    Writes the record, the keys that are not fields of the writer are left out.
+
+    :return: None
+    '''
+
+    if self.__csv_writer is not None:
+      self.__csv_writer.writerow([record.get(field) for field in self.__fields])
+    else:
+      self.__out.write(json.dumps(dict((field, record.get(field)) for field in self.__fields), \
+        separators=(',', ':')))
+      self.__out.write('\n')
+    self.__count += 1
+    return
+
+  def write_all(self, records):
+    '''
+    Writes all the records of the iterable, consuming it one record at a time.
+    Returns the number of records written.
+
+    :return: int
+    '''
+
+    written = 0
+    for record in records:
+      self.write(record)
+      written += 1
+    return written
+
+  def flush(self):
+    '''
+    Flushes the stream.
+
+    :return: None
+    '''
+
+    self.__out.flush()
+    return
+
+
+
+def open_output(path, append=False):
+  '''
+  Opens the output file with a large write buffer, stdout when path is None or '-'.
+  Returns the stream and whether the file was empty (for the CSV header).
+
+  :return: tuple(file, bool)
+  '''
+
+  if path is None or path == '-':
+    return sys.stdout, True
+  empty = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+  return open(path, 'a' if append else 'w', encoding='utf-8', newline='', \
+    buffering=BUFFER_SIZE), empty
+
+
+
+#
+# Sources of the records
+#
+
+
+def stop_records():
+  '''
+  Yields the JSON objects of all the stops, as decoded from the response (or from \
+  the offline feed when it is set), without building the ACTransitStop objects.
+
+  :return: generator(dict)
+  '''
+
+  feed = actransit_apis.__OFFLINE_FEED__
+  if feed is not None:
+    for obj in feed.stop_records():
+      yield obj
+    return
+  for obj in actransit_apis.fetch_decode_json(actransit_apis._api_url('/stops/')):
+    yield obj
+
+
+
+def prediction_records(stop_ids):
+  '''
+  Yields the JSON objects of the predictions of the stops, one stop at a time.
+
+  :return: generator(dict)
+  '''
+
+  for stop_id in stop_ids:
+    for prediction in actransit_apis.get_predictions(stop_id):
+      yield prediction.__json__
+
+
+
+def _iso_times(seconds):
+  '''
+  The ISO 8601 UTC strings (with the Z suffix) of the times (seconds since the epoch),
+  None for NULL_TIME.
+  '''
+
+  strings = np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s', \
+    timezone='UTC').astype(object)
+  strings[seconds == NULL_TIME] = None
+  return strings
+
+
+
+def _ids(values, null=NULL_ID):
+  ids = values.astype(object)
+  ids[values == null] = None
+  return ids
+
+
+
+def history_records(path, kind=PREDICTIONS, start=None, end=None):
+  '''
+  Yields the records of the kind (history.PREDICTIONS or history.VEHICLES) recorded \
+  in the history log at path, within the time range, one block at a time.
+
+  :return: generator(dict)
+  '''
+
+  for block in HistoryReader(path).blocks(kind, start, end):
+    if kind == PREDICTIONS:
+      route_names = np.array(block['route_names'] or [None], dtype=object)
+      columns = (
+        _ids(block['stop_id']),
+        _ids(block['trip_id']),
+        _ids(block['vehicle_id']),
+        route_names[block['route_code']] if len(block['route_code']) else [],
+        _ids(block['predicted_delay'], NULL_DELAY),
+        _iso_times(block['predicted_departure']),
+        _iso_times(block['prediction_time']),
+      )
+      fields = PREDICTION_FIELDS
+    else:
+      columns = (
+        _ids(block['vehicle_id']),
+        _ids(block['trip_id']),
+        block['latitude'].tolist(),
+        block['longitude'].tolist(),
+        block['heading'].tolist(),
+        _iso_times(block['time_last_reported']),
+      )
+      fields = VEHICLE_FIELDS
+    for row in zip(*columns):
+      yield dict(zip(fields, row))
+
+
+
+def watch_predictions(stop_ids, writer, interval, polls=None, sleep=time.sleep):
+  '''
+  Polls the predictions of the stops every interval seconds and appends them to the \
+  writer (RecordWriter), flushing it after every poll. Runs polls times, forever \
+  when polls is None. Returns the number of records written.
+
+  A poll that fails (network error, bad response) is reported on stderr and skipped
+  as a whole, nothing of it is written, and the watch goes on with the next poll.
+
+  :return: int
+  '''
+
+  written = 0
+  poll = 0
+  while polls is None or poll < polls:
+    if poll > 0:
+      sleep(interval)
+    poll += 1
+    try:
+      records = list(prediction_records(stop_ids))
+    except Exception as e:
+      print('poll {} failed, skipped: {!r}'.format(poll, e), file=sys.stderr)
+      continue
+    written += writer.write_all(records)
+    writer.flush()
+  return written
+
+
+
+def main(argv=None):
+  '''
+  Runs the export as per the command line arguments.
+  '''
+
+  parser = argparse.ArgumentParser(description='Exports ACTransit data to NDJSON or CSV')
+  parser.add_argument('source', choices=('stops', 'predictions', 'history'))
+  parser.add_argument('arguments', nargs='*', help='stop IDs for predictions, the log for history')
+  parser.add_argument('--format', '-f', choices=(NDJSON, CSV), default=NDJSON)
+  parser.add_argument('--output', '-o', default=None, help='output file, stdout by default')
+  parser.add_argument('--api-key', default=os.environ.get('ACTRANSIT_API_KEY'))
+  parser.add_argument('--watch', type=float, default=None, \
+    help='polls the predictions every WATCH seconds, appending to the output')
+  parser.add_argument('--polls', type=int, default=None, help='number of polls in watch mode')
+  parser.add_argument('--kind', choices=('predictions', 'vehicles'), default='predictions')
+  parser.add_argument('--start', type=float, default=None, help='seconds since the epoch')
+  parser.add_argument('--end', type=float, default=None, help='seconds since the epoch')
+  args = parser.parse_args(argv)
+
+  if args.api_key is not None:
+    actransit_apis.set_api_key(args.api_key)
+
+  out, empty = open_output(args.output, append=args.watch is not None)
+  try:
+    if args.source == 'stops':
+      writer = RecordWriter(out, STOP_FIELDS, args.format)
+      writer.write_all(stop_records())
+    elif args.source == 'predictions':
+      writer = RecordWriter(out, PREDICTION_FIELDS, args.format, header=empty)
+      stop_ids = [int(stop_id) for stop_id in args.arguments]
+      if args.watch is not None:
+        watch_predictions(stop_ids, writer, args.watch, args.polls)
+      else:
+        writer.write_all(prediction_records(stop_ids))
+    else:
+      if len(args.arguments) != 1:
+        parser.error('history needs the path of the history log')
+      kind = PREDICTIONS if args.kind == 'predictions' else VEHICLES
+      writer = RecordWriter(out, PREDICTION_FIELDS if kind == PREDICTIONS else VEHICLE_FIELDS, \
+        args.format)
+      writer.write_all(history_records(args.arguments[0], kind, args.start, args.end))
+    writer.flush()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    if out is not sys.stdout:
+      out.close()
+  return 0
+
+
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,275 @@
+# fleet_analytics.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module estimates the speed of the whole fleet from successive polls of the
+vehicles, and detects the bunching of the buses - two vehicles of the same route,
+heading the same way, closer than a threshold headway.
+
+The polls are array snapshots - dicts of NumPy columns like the vehicle columns of
+the history log (see history.py): 'time_last_reported' (seconds since the epoch,
+NULL_TIME when missing), 'vehicle_id', 'trip_id', 'latitude', 'longitude' and
+'heading'. The vehicles of a poll are matched with the previous positions by a
+sorted search on their IDs and the pairs of vehicles of the same route are
+enumerated with index arithmetic, so a poll of the whole fleet takes a few
+milliseconds, without looping over the vehicles in Python.
+
+The distance between two buses is the straight-line (haversine) distance, the
+headway is that distance divided by their speed.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from history import NULL_ID
+from history import NULL_TIME
+from timeutils import parse_timestamp
+from trip_paths import haversine_meters
+
+
+
+# The speed in meters per second assumed for the vehicles without an estimate, about
+# the mean speed of a city bus between the stops.
+DEFAULT_SPEED = 5.0
+
+# The speeds below this (meters per second) are taken as this for the headways, so
+# that two buses waiting at the same light are not infinitely far apart in time.
+MIN_SPEED = 1.0
+
+# The speeds above this (meters per second) are GPS jumps, they are not estimates.
+MAX_SPEED = 40.0
+
+# The default headway in seconds under which two buses are bunched.
+BUNCHING_HEADWAY = 120
+
+# The default largest difference of headings in degrees of two buses going the same way.
+MAX_HEADING_DIFFERENCE = 60
+
+# The speed estimates of a poll, arrays with one entry per vehicle of the poll -
+# the speed in meters per second (NaN when there is no estimate), the distance in
+# meters from the previous report and the seconds elapsed since it.
+SpeedEstimates = namedtuple('SpeedEstimates', ['vehicle_id', 'speed', 'distance', 'elapsed'])
+
+# The bunched pairs of vehicles, arrays with one entry per pair - the vehicles,
+# the route code, the distance in meters between them and the headway in seconds.
+BunchedPairs = namedtuple('BunchedPairs', \
+  ['vehicle_a', 'vehicle_b', 'route_code', 'distance', 'headway'])
+
+
+
+def vehicle_snapshot(vehicles):
+  '''
+  The array snapshot of a poll of ACTransitVehicle objects.
+
+  :return: dict
+  '''
+
+  vehicles = list(vehicles)
+  size = len(vehicles)
+
+  def ids(values):
+    return np.fromiter((NULL_ID if value is None else value for value in values), \
+      dtype=np.int64, count=size)
+
+  def seconds(datestr):
+    value = parse_timestamp(datestr)
+    return NULL_TIME if value is None else int(value)
+
+  return {
+    'time_last_reported': np.fromiter((seconds(v.time_last_reported) for v in vehicles), \
+      dtype=np.int64, count=size),
+    'vehicle_id': ids(v.vehicle_id for v in vehicles),
+    'trip_id': ids(v.current_trip_id for v in vehicles),
+    'latitude': np.fromiter((v.latitude for v in vehicles), dtype=np.float64, count=size),
+    'longitude': np.fromiter((v.longitude for v in vehicles), dtype=np.float64, count=size),
+    'heading': ids(v.heading for v in vehicles),
+  }
+
+
+
+def trip_route_codes(trip_ids, trips):
+  '''
+  The route code of every trip ID (-1 for the unknown trips) and the route names
+  indexed by the codes, from the ACTransitTrip objects.
+
+  :return: tuple(numpy.ndarray, list(str))
+  '''
+
+  route_codes = {}
+  known_ids = []
+  known_codes = []
+  for trip in trips:
+    known_ids.append(trip.trip_id)
+    known_codes.append(route_codes.setdefault(trip.route_name, len(route_codes)))
+  known_ids = np.array(known_ids, dtype=np.int64)
+  known_codes = np.array(known_codes, dtype=np.int32)
+  order = np.argsort(known_ids, kind='stable')
+  known_ids = known_ids[order]
+  known_codes = known_codes[order]
+
+  trip_ids = np.asarray(trip_ids, dtype=np.int64)
+  codes = np.full(len(trip_ids), -1, dtype=np.int32)
+  if len(known_ids):
+    positions = np.minimum(np.searchsorted(known_ids, trip_ids), len(known_ids) - 1)
+    found = known_ids[positions] == trip_ids
+    codes[found] = known_codes[positions[found]]
+  return codes, sorted(route_codes, key=route_codes.get)
+
+
+
+class FleetSpeedTracker(object):
+  '''
+  Keeps the last report of every vehicle and estimates the speeds of the vehicles
+  of each new poll from it.
+  '''
+
+  def __init__(self, max_gap=300, max_speed=MAX_SPEED):
+    '''
+    Initializes the tracker without any report. The reports more than max_gap
+    seconds apart do not give an estimate, nor the speeds above max_speed (meters
+    per second).
+    '''
+
+    self.__max_gap = max_gap
+    self.__max_speed = max_speed
+    self.__ids = np.zeros(0, dtype=np.int64)
+    self.__times = np.zeros(0, dtype=np.int64)
+    self.__latitudes = np.zeros(0, dtype=np.float64)
+    self.__longitudes = np.zeros(0, dtype=np.float64)
+
+  def __len__(self):
+    return len(self.__ids)
+
+  def update(self, snapshot):
+    '''
+    Estimates the speeds of the vehicles of the poll (an array snapshot) from their
+    previous reports, then keeps the reports of the poll that are newer. A vehicle
+    whose report did not change since the previous poll keeps its previous report
+    and gets no estimate.
+
+    :return: SpeedEstimates
+    '''
+
+    ids = np.asarray(snapshot['vehicle_id'], dtype=np.int64)
+    times = np.asarray(snapshot['time_last_reported'], dtype=np.int64)
+    latitudes = np.asarray(snapshot['latitude'], dtype=np.float64)
+    longitudes = np.asarray(snapshot['longitude'], dtype=np.float64)
+    size = len(ids)
+
+    speed = np.full(size, np.nan)
+    distance = np.full(size, np.nan)
+    elapsed = np.full(size, np.nan)
+
+    known = np.zeros(size, dtype=bool)
+    positions = np.zeros(size, dtype=np.intp)
+    if len(self.__ids):
+      positions = np.minimum(np.searchsorted(self.__ids, ids), len(self.__ids) - 1)
+      known = (self.__ids[positions] == ids) & (self.__times[positions] != NULL_TIME)
+    valid = (times != NULL_TIME) & (ids != NULL_ID)
+    matched = np.flatnonzero(known & valid)
+    previous = positions[matched]
+
+    gaps = (times[matched] - self.__times[previous]).astype(np.float64)
+    moved = haversine_meters(self.__latitudes[previous], self.__longitudes[previous], \
+      latitudes[matched], longitudes[matched])
+    with np.errstate(invalid='ignore', divide='ignore'):
+      speeds = moved / gaps
+    good = (gaps > 0) & (gaps <= self.__max_gap) & (speeds <= self.__max_speed)
+    speed[matched[good]] = speeds[good]
+    distance[matched[good]] = moved[good]
+    elapsed[matched[good]] = gaps[good]
+
+    # merge the newer reports into the last reports, one report per vehicle
+    previous_times = np.full(size, NULL_TIME, dtype=np.int64)
+    previous_times[known] = self.__times[positions[known]]
+    newer = valid & (times > previous_times)
+    all_ids = np.concatenate([self.__ids, ids[newer]])
+    all_times = np.concatenate([self.__times, times[newer]])
+    all_latitudes = np.concatenate([self.__latitudes, latitudes[newer]])
+    all_longitudes = np.concatenate([self.__longitudes, longitudes[newer]])
+    # the latest report of each vehicle is the last one of its ID once sorted on (ID, time)
+    order = np.lexsort((all_times, all_ids))
+    all_ids = all_ids[order]
+    last = np.ones(len(all_ids), dtype=bool)
+    last[:-1] = all_ids[1:] != all_ids[:-1]
+    keep = order[last]
+    self.__ids = all_ids[last]
+    self.__times = all_times[keep]
+    self.__latitudes = all_latitudes[keep]
+    self.__longitudes = all_longitudes[keep]
+
+    return SpeedEstimates(ids, speed, distance, elapsed)
+
+
+
+def _route_pairs(route_codes):
+  '''
+  The pairs (i, j) of the rows of the same route (the rows with a negative route
+  code are left out), each pair once.
+
+  :return: tuple(numpy.ndarray, numpy.ndarray)
+  '''
+
+  rows = np.flatnonzero(route_codes >= 0)
+  rows = rows[np.argsort(route_codes[rows], kind='stable')]
+  codes = route_codes[rows]
+  if not len(rows):
+    return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+  starts = np.flatnonzero(np.concatenate([[True], codes[1:] != codes[:-1]]))
+  sizes = np.diff(np.append(starts, len(rows)))
+  group_end = np.repeat(starts + sizes, sizes)
+  positions = np.arange(len(rows))
+  # every row is paired with the rows after it in its route
+  partners = group_end - positions - 1
+  first = np.repeat(positions, partners)
+  pair_starts = np.cumsum(partners) - partners
+  second = first + 1 + (np.arange(partners.sum()) - np.repeat(pair_starts, partners))
+  return rows[first], rows[second]
+
+
+
+def detect_bunching(snapshot, route_codes, speeds=None, headway=BUNCHING_HEADWAY, \
+  max_heading_difference=MAX_HEADING_DIFFERENCE, default_speed=DEFAULT_SPEED):
+  '''
+  The pairs of vehicles of the poll (an array snapshot) bunched on their route -
+  with the same route code (route_codes, one per vehicle, -1 for an unknown route),
+  headings at most max_heading_difference degrees apart and a headway under headway
+  seconds. The headway is the distance between the two vehicles divided by their
+  mean speed (speeds, one per vehicle, typically FleetSpeedTracker.update(...).speed),
+  default_speed standing in for the unknown speeds. The vehicles that never reported
+  (time_last_reported is NULL_TIME) have no known position and are left out.
+
+  :return: BunchedPairs
+  '''
+
+  route_codes = np.asarray(route_codes, dtype=np.int32)
+  reported = np.asarray(snapshot['time_last_reported'], dtype=np.int64) != NULL_TIME
+  first, second = _route_pairs(np.where(reported, route_codes, -1))
+
+  headings = np.asarray(snapshot['heading'], dtype=np.float64)
+  difference = np.abs(headings[first] - headings[second]) % 360.0
+  difference = np.minimum(difference, 360.0 - difference)
+  same_way = (difference <= max_heading_difference) & \
+    (headings[first] != NULL_ID) & (headings[second] != NULL_ID)
+  first = first[same_way]
+  second = second[same_way]
+
+  latitudes = np.asarray(snapshot['latitude'], dtype=np.float64)
+  longitudes = np.asarray(snapshot['longitude'], dtype=np.float64)
+  distance = haversine_meters(latitudes[first], longitudes[first], \
+    latitudes[second], longitudes[second])
+
+  if speeds is None:
+    pair_speed = np.full(len(first), float(default_speed))
+  else:
+    speeds = np.where(np.isnan(speeds), default_speed, speeds)
+    pair_speed = (speeds[first] + speeds[second]) / 2.0
+  pair_headway = distance / np.maximum(pair_speed, MIN_SPEED)
+
+  bunched = pair_headway < headway
+  vehicle_ids = np.asarray(snapshot['vehicle_id'], dtype=np.int64)
+  return BunchedPairs(vehicle_ids[first[bunched]], vehicle_ids[second[bunched]], \
+    route_codes[first[bunched]], distance[bunched], pair_headway[bunched])
@@ -0,0 +1,355 @@
+# gateway.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the caching gateway, a small HTTP server exposing the same
+routes as ACTransit's APIs wrapped by the get_* functions. The services using the
+library point their base URL at the gateway (see actransit_apis.set_base_url), and
+only the gateway calls ACTransit.
+
+The responses are served from a cache shared by all the clients. The concurrent
+requests for the same uncached response are coalesced into one upstream call, and
+the upstream calls are rate limited, so that the load on ACTransit stays flat
+however many clients use the gateway.
+
+for eg - python -m gateway --api-key <key> --port 8080
+'''
+
+import argparse
+import gzip
+import http.client
+import re
+import struct
+import zlib
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from threading import Event
+from threading import Lock
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.error import URLError
+from urllib.request import Request
+from urllib.request import urlopen
+
+from actransit_apis import actransit_apis
+from caching import TTLCache
+from compression import accept_encoding
+from compression import read_body
+from ratelimit import RateLimiter
+
+
+
+# The base URL of ACTransit's APIs.
+UPSTREAM_URL = 'https://api.actransit.org/transit'
+
+# The time to live (in seconds) of the responses of the routes, the same as the
+# response cache of the library (see actransit_apis.response_ttl).
+STATIC_TTL = actransit_apis.STATIC_TTL
+PREDICTIONS_TTL = actransit_apis.PREDICTIONS_TTL
+TRIP_ESTIMATE_TTL = actransit_apis.TRIP_ESTIMATE_TTL
+SERVICE_NOTICES_TTL = actransit_apis.SERVICE_NOTICES_TTL
+SCHEDULE_INFO_TTL = actransit_apis.SCHEDULE_INFO_TTL
+
+# A segment of the paths - IDs, route names and coordinates, never . or .. (nor
+# their percent-encoded variants) that would reach other upstream paths with the
+# API key of the gateway.
+__SEGMENT__ = r'(?!\.\.?(?:/|$))[A-Za-z0-9_.-]+'
+
+# The routes served by the gateway - (pattern of the path, time to live), the same
+# routes as the get_* functions of actransit_apis.
+__ROUTES__ = [
+  (re.compile(r'^/stops/?$'), STATIC_TTL),
+  (re.compile(r'^/stops/{0}/{0}/{0}/{0}/?$'.format(__SEGMENT__)), STATIC_TTL),
+  (re.compile(r'^/stops/{0}/{0}/?$'.format(__SEGMENT__)), STATIC_TTL),
+  (re.compile(r'^/stops/{0}/predictions/?$'.format(__SEGMENT__)), PREDICTIONS_TTL),
+  (re.compile(r'^/route/{0}/tripestimate/?$'.format(__SEGMENT__)), TRIP_ESTIMATE_TTL),
+  (re.compile(r'^/route/{0}/trips/?$'.format(__SEGMENT__)), STATIC_TTL),
+  (re.compile(r'^/routes/?$'), STATIC_TTL),
+  (re.compile(r'^/servicenotices/?$'), SERVICE_NOTICES_TTL),
+  (re.compile(r'^/gtfs/scheduleinfo/?$'), SCHEDULE_INFO_TTL),
+]
+
+# The length of the body heading the cached responses, see _pack.
+__BODY_LENGTH__ = struct.Struct('<Q')
+
+
+
+class UpstreamError(Exception):
+  '''
+  The error returned by ACTransit's APIs (or the failure to reach them), passed on
+  to the clients of the gateway.
+  '''
+
+  def __init__(self, status, body=b''):
+    super(UpstreamError, self).__init__('Upstream error {}'.format(status))
+    self.status = status
+    self.body = body
+
+
+
+class _Flight(object):
+  '''
+  An upstream call in progress, the requests for the same response wait for it.
+  '''
+
+  def __init__(self):
+    self.done = Event()
+    self.response = None
+    self.error = None
+
+
+
+def _pack(body, gzipped):
+  '''
+  The body and its gzipped copy packed into the bytes cached for a response, so
+  that the gateway can share a disk_cache.DiskCache (which holds bytes).
+  '''
+
+  return __BODY_LENGTH__.pack(len(body)) + body + gzipped
+
+
+
+def _unpack(packed):
+  '''
+  The body and its gzipped copy of the bytes cached for a response.
+  '''
+
+  length, = __BODY_LENGTH__.unpack_from(packed)
+  start = __BODY_LENGTH__.size
+  return packed[start:start + length], packed[start + length:]
+
+
+
+def route_ttl(path):
+  '''
+  The time to live of the responses of the path, None when the gateway does not
+  serve the path.
+
+  :return: int
+  '''
+
+  for pattern, ttl in __ROUTES__:
+    if pattern.match(path):
+      return ttl
+  return None
+
+
+
+class Gateway(object):
+  '''
+  Serves the routes of ACTransit's APIs from a shared cache, calling ACTransit with
+  its own API key for the cache misses only.
+  '''
+
+  def __init__(self, api_key, upstream_url=UPSTREAM_URL, cache=None, rate_limiter=None):
+    '''
+    Initializes the gateway. The cache (caching.TTLCache or disk_cache.DiskCache)
+    holds the responses, rate_limiter (ratelimit.RateLimiter) limits the upstream calls.
+    '''
+
+    self.__api_key = api_key
+    self.__upstream_url = upstream_url.rstrip('/')
+    self.__cache = TTLCache(max_entries=10000, name='gateway') if cache is None else cache
+    self.__rate_limiter = RateLimiter(rate=10, burst=10) if rate_limiter is None else rate_limiter
+    self.__flights = {}
+    self.__lock = Lock()
+    self.__stats = {'requests': 0, 'hits': 0, 'coalesced': 0, 'upstream': 0}
+    self.__server = None
+    self.__thread = None
+
+  @property
+  def stats(self):
+    '''
+    The counts of the requests served, of the cache hits, of the requests coalesced
+    with an upstream call in progress and of the upstream calls.
+
+    :return: dict
+    '''
+
+    with self.__lock:
+      return dict(self.__stats)
+
+  def __count(self, name):
+    with self.__lock:
+      self.__stats[name] += 1
+
+  def fetch(self, path_and_query):
+    '''
+    The response (JSON bytes, gzip compressed JSON bytes) for the path and query of
+    a request (the token of the request is ignored). Raises UpstreamError when
+    ACTransit fails, and KeyError when the gateway does not serve the path.
+
+    :return: tuple(bytes, bytes)
+    '''
+
+    key = actransit_apis.response_cache_key(path_and_query)
+    ttl = route_ttl(key.split('?', 1)[0])
+    if ttl is None:
+      raise KeyError(path_and_query)
+
+    self.__count('requests')
+    response = self.__cache.get(key)
+    if response is not None:
+      self.__count('hits')
+      return _unpack(response)
+
+    with self.__lock:
+      flight = self.__flights.get(key)
+      leader = flight is None
+      if leader:
+        flight = _Flight()
+        self.__flights[key] = flight
+      else:
+        self.__stats['coalesced'] += 1
+
+    if not leader:
+      flight.done.wait()
+      if flight.error is not None:
+        raise flight.error
+      return flight.response
+
+    try:
+      packed = self.__cache.get(key)
+      if packed is None:
+        body = self.__call_upstream(key)
+        packed = _pack(body, gzip.compress(body, compresslevel=6))
+        self.__cache.put(key, packed, ttl)
+      response = flight.response = _unpack(packed)
+      return response
+    except Exception as e:
+      flight.error = e
+      raise
+    finally:
+      with self.__lock:
+        del self.__flights[key]
+      flight.done.set()
+
+  def __call_upstream(self, key):
+    self.__rate_limiter.acquire()
+    self.__count('upstream')
+    separator = '&' if '?' in key else '?'
+    url = '{}{}{}token={}'.format(self.__upstream_url, key, separator, self.__api_key)
+    request = Request(url, headers={'Accept-Encoding': accept_encoding()})
+    try:
+      with urlopen(request) as res:
+        body = read_body(res)
+        if res.length:
+          # the connection was closed before the end of the body
+          raise http.client.IncompleteRead(body, res.length)
+        return body
+    except HTTPError as e:
+      raise UpstreamError(e.code, e.read())
+    except URLError as e:
+      raise UpstreamError(502, str(e.reason).encode('utf-8'))
+    except (OSError, http.client.HTTPException, zlib.error, ValueError) as e:
+      # timeouts, connections dropped mid-body and bodies that do not decompress
+      raise UpstreamError(502, repr(e).encode('utf-8'))
+
+  def serve(self, host='127.0.0.1', port=8080):
+    '''
+    Creates the HTTP server of the gateway, call serve_forever() on it to serve
+    the requests.
+
+    :return: http.server.ThreadingHTTPServer
+    '''
+
+    handler = type('GatewayHandler', (_GatewayHandler,), {'gateway': self})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+  def start(self, host='127.0.0.1', port=8080):
+    '''
+    Serves the requests in a background thread. Returns the base URL of the gateway,
+    to pass to actransit_apis.set_base_url.
+
+    :return: str
+    '''
+
+    self.__server = self.serve(host, port)
+    self.__thread = Thread(target=self.__server.serve_forever, daemon=True)
+    self.__thread.start()
+    return 'http://{}:{}'.format(*self.__server.server_address[:2])
+
+  def stop(self):
+    '''
+    Stops the server started by start().
+
+    :return: None
+    '''
+
+    if self.__server is not None:
+      self.__server.shutdown()
+      self.__server.server_close()
+      self.__thread.join()
+      self.__server = None
+      self.__thread = None
+    return
+
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+  '''
+  The request handler of the gateway server.
+  '''
+
+  gateway = None
+  protocol_version = 'HTTP/1.1'
+
+  def do_GET(self):
+    try:
+      body, gzipped = self.gateway.fetch(self.path)
+    except KeyError:
+      self.__send(404, b'{"Message": "Not found"}')
+      return
+    except UpstreamError as e:
+      self.__send(e.status, e.body)
+      return
+    if 'gzip' in self.headers.get('Accept-Encoding', ''):
+      self.__send(200, gzipped, 'gzip')
+    else:
+      self.__send(200, body)
+
+  def __send(self, status, body, content_encoding=None):
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    if content_encoding is not None:
+      self.send_header('Content-Encoding', content_encoding)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+
+def main(argv=None):
+  '''
+  Runs the gateway server till it is interrupted.
+  '''
+
+  parser = argparse.ArgumentParser(description='Caching gateway for the ACTransit APIs')
+  parser.add_argument('--api-key', required=True, help='API key used for ACTransit')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8080)
+  parser.add_argument('--upstream', default=UPSTREAM_URL, help='base URL of ACTransit\'s APIs')
+  parser.add_argument('--rate', type=float, default=10, help='upstream calls per second')
+  args = parser.parse_args(argv)
+
+  gateway = Gateway(args.api_key, args.upstream, rate_limiter=RateLimiter(args.rate, max(1, args.rate)))
+  server = gateway.serve(args.host, args.port)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+
+
+if __name__ == '__main__':
+  main()
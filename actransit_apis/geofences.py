@@ -0,0 +1,247 @@
+# geofences.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the geofence engine, it tells when the buses enter and exit
+the zones around the stops of the riders.
+
+The fences are circles (a center and a radius in meters). They are projected onto
+a local flat-earth plane and indexed by a uniform grid - every fence is listed in
+the cells its bounding box overlaps. A fleet update looks up the cell of every
+vehicle, expands the candidate fences of the cells and tests the distances in one
+vectorized pass, then compares the (vehicle, fence) pairs inside with the pairs of
+the previous update, so that only the transitions are reported.
+'''
+
+from collections import namedtuple
+from threading import Lock
+
+import numpy as np
+
+from trip_paths import EARTH_RADIUS_METERS
+
+
+
+# The default size of the cells of the grid in meters, about the radius of the fences.
+CELL_SIZE_METERS = 250
+
+# The reference latitude of the projection, the center of ACTransit's service area.
+REFERENCE_LATITUDE = 37.8
+
+# The transitions of a fleet update - lists of (vehicle_id, fence_id) pairs.
+GeofenceTransitions = namedtuple('GeofenceTransitions', ['entered', 'exited'])
+
+__CELL_OFFSET__ = 1 << 31
+
+
+
+class GeofenceEngine(object):
+  '''
+  Evaluates the positions of the fleet against many circular geofences, and reports
+  the vehicles entering and exiting the fences.
+  '''
+
+  def __init__(self, cell_size=CELL_SIZE_METERS, reference_latitude=REFERENCE_LATITUDE):
+    '''
+    Initializes the engine without fences. cell_size is the size of the cells of
+    the grid in meters.
+    '''
+
+    self.__cell_size = float(cell_size)
+    self.__x_scale = EARTH_RADIUS_METERS * np.cos(np.radians(reference_latitude)) * np.pi / 180.0
+    self.__y_scale = EARTH_RADIUS_METERS * np.pi / 180.0
+    self.__fences = {}
+    self.__index = None
+    # the (vehicle, fence) pairs inside after the last update, and the index their
+    # fence slots refer to
+    self.__inside = np.zeros(0, dtype=np.int64)
+    self.__inside_index = None
+    self.__lock = Lock()
+
+  def __project(self, latitudes, longitudes):
+    return np.asarray(longitudes, dtype=np.float64) * self.__x_scale, \
+      np.asarray(latitudes, dtype=np.float64) * self.__y_scale
+
+  def add_fence(self, fence_id, latitude, longitude, radius):
+    '''
+    Adds the fence (radius in meters around the point), replacing the fence with
+    the same ID. The vehicles already inside the fence are reported as entering it
+    on the next update.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      self.__fences[fence_id] = (float(latitude), float(longitude), float(radius))
+      self.__index = None
+    return
+
+  def remove_fence(self, fence_id):
+    '''
+    Removes the fence, without reporting the vehicles inside it as exiting.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      if self.__fences.pop(fence_id, None) is not None:
+        self.__index = None
+    return
+
+  @property
+  def fence_ids(self):
+    '''
+    The IDs of the fences.
+
+    :return: list
+    '''
+
+    return list(self.__fences.keys())
+
+  def __len__(self):
+    return len(self.__fences)
+
+  def __build_index(self):
+    '''
+    Builds the arrays of the fences and the grid, a CSR list of the fences of every
+    cell with the cells sorted by their key.
+    '''
+
+    fence_ids = list(self.__fences.keys())
+    values = np.array([self.__fences[fence_id] for fence_id in fence_ids], \
+      dtype=np.float64).reshape(-1, 3)
+    x, y = self.__project(values[:, 0], values[:, 1])
+    radius = values[:, 2]
+
+    low_x = np.floor((x - radius) / self.__cell_size).astype(np.int64)
+    high_x = np.floor((x + radius) / self.__cell_size).astype(np.int64)
+    low_y = np.floor((y - radius) / self.__cell_size).astype(np.int64)
+    high_y = np.floor((y + radius) / self.__cell_size).astype(np.int64)
+    widths = high_x - low_x + 1
+    counts = widths * (high_y - low_y + 1)
+
+    # one entry per (fence, overlapped cell)
+    fences = np.repeat(np.arange(len(fence_ids)), counts)
+    offsets = np.arange(len(fences)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell_x = low_x[fences] + offsets % widths[fences]
+    cell_y = low_y[fences] + offsets // widths[fences]
+    keys = self.__cell_keys(cell_x, cell_y)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) \
+      if len(keys) else np.zeros(0, dtype=np.int64)
+
+    self.__index = {
+      'fence_ids': fence_ids,
+      'slots': dict((fence_id, slot) for slot, fence_id in enumerate(fence_ids)),
+      'x': x,
+      'y': y,
+      'radius_squared': radius * radius,
+      'cell_keys': keys[starts],
+      'cell_starts': np.append(starts, len(keys)),
+      'cell_fences': fences[order],
+    }
+
+  def __cell_keys(self, cell_x, cell_y):
+    return ((cell_x + __CELL_OFFSET__) << 32) | (cell_y + __CELL_OFFSET__)
+
+  def inside(self, latitudes, longitudes):
+    '''
+    The (position, fence) pairs of the positions inside the fences, as two arrays -
+    the indices of the positions and the indices of the fences in fence_ids order.
+
+    :return: tuple(numpy.ndarray, numpy.ndarray)
+    '''
+
+    positions, fences, _ = self.__evaluate(latitudes, longitudes)
+    return positions, fences
+
+  def __evaluate(self, latitudes, longitudes):
+    with self.__lock:
+      if self.__index is None:
+        self.__build_index()
+      index = self.__index
+    x, y = self.__project(latitudes, longitudes)
+    keys = self.__cell_keys(np.floor(x / self.__cell_size).astype(np.int64), \
+      np.floor(y / self.__cell_size).astype(np.int64))
+
+    if len(index['cell_keys']) == 0:
+      return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), index
+    cells = np.minimum(np.searchsorted(index['cell_keys'], keys), len(index['cell_keys']) - 1)
+    found = index['cell_keys'][cells] == keys
+    positions = np.flatnonzero(found)
+    starts = index['cell_starts'][cells[positions]]
+    counts = index['cell_starts'][cells[positions] + 1] - starts
+
+    # expand the candidate fences of the cells of the positions
+    candidates = np.repeat(positions, counts)
+    entries = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    fences = index['cell_fences'][entries]
+
+    dx = x[candidates] - index['x'][fences]
+    dy = y[candidates] - index['y'][fences]
+    hit = dx * dx + dy * dy <= index['radius_squared'][fences]
+    return candidates[hit], fences[hit], index
+
+  def update(self, vehicles, partial=False):
+    '''
+    Evaluates the positions of the ACTransitVehicle objects against the fences.
+    See update_positions.
+
+    :return: GeofenceTransitions
+    '''
+
+    vehicles = [vehicle for vehicle in vehicles \
+      if vehicle.latitude is not None and vehicle.longitude is not None]
+    return self.update_positions([vehicle.vehicle_id for vehicle in vehicles], \
+      [vehicle.latitude for vehicle in vehicles], [vehicle.longitude for vehicle in vehicles], \
+      partial)
+
+  def update_positions(self, vehicle_ids, latitudes, longitudes, partial=False):
+    '''
+    Evaluates the positions of the vehicles (integer IDs) against the fences, and
+    returns the transitions since the previous update. The update is the whole fleet
+    unless partial is True - the vehicles missing from a full update exit all their
+    fences, while a partial update leaves the other vehicles as they are.
+
+    :return: GeofenceTransitions
+    '''
+
+    vehicle_ids = np.asarray(vehicle_ids, dtype=np.int64)
+    positions, fences, index = self.__evaluate(latitudes, longitudes)
+    with self.__lock:
+      # the pairs inside are packed into int64 keys - vehicle ID, fence slot
+      inside = np.unique((vehicle_ids[positions] << 32) | fences)
+      previous = self.__remap(self.__inside, self.__inside_index, index)
+      if partial:
+        updated = np.isin(previous >> 32, vehicle_ids)
+        kept = previous[~updated]
+        previous = previous[updated]
+        self.__inside = np.union1d(kept, inside)
+      else:
+        self.__inside = inside
+      entered = np.setdiff1d(inside, previous, assume_unique=True)
+      exited = np.setdiff1d(previous, inside, assume_unique=True)
+      self.__inside_index = index
+      return GeofenceTransitions(self.__pairs(entered, index), self.__pairs(exited, index))
+
+  def __remap(self, keys, old_index, new_index):
+    '''
+    Remaps the fence slots of the keys from the old index to the new one, after
+    fences were added or removed. The pairs of the removed fences are dropped.
+    '''
+
+    if old_index is None or old_index is new_index or len(keys) == 0:
+      return keys
+    slots = new_index['slots']
+    remap = np.array([slots.get(fence_id, -1) for fence_id in old_index['fence_ids']], \
+      dtype=np.int64)
+    new_slots = remap[keys & 0xffffffff]
+    keep = new_slots >= 0
+    return np.sort(((keys[keep] >> 32) << 32) | new_slots[keep])
+
+  def __pairs(self, keys, index):
+    fence_ids = index['fence_ids']
+    return [(int(key >> 32), fence_ids[key & 0xffffffff]) for key in keys.tolist()]
@@ -0,0 +1,457 @@
+# gtfs_feed.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module ingests ACTransit's static GTFS feed (the GTFS zip file) into compact
+columnar stores, so that the static data (stops, routes, trips and timepoints) can
+be served offline, without calling ACTransit's APIs.
+
+The CSV files are streamed out of the zip file without extracting it, and read in
+chunks, the numeric columns are kept as NumPy arrays and the string columns are
+dictionary coded, the IDs referencing each other across the files (stop_id, route_id,
+trip_id, service_id) share one dictionary per kind of ID so that the files can be
+joined on the codes.
+
+The trips are served in the format of the live API - the StartTime is the date and
+local time ("2017-02-12T07:00:00", without an UTC offset) of the departure from the
+first stop on a service date, and the Direction is the bound ("Northbound",
+"Eastbound"...) of the trip from its first to its last stop, as GTFS only has a
+direction_id (0 or 1) without meaning of its own.
+'''
+
+import csv
+import io
+import zipfile
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from itertools import islice
+from math import cos
+from math import radians
+
+import numpy as np
+
+from api_classes import ACTransitRoute
+from api_classes import ACTransitStop
+from api_classes import ACTransitTimePoint
+from api_classes import ACTransitTrip
+from api_classes import ACTransitTripScheduleType
+from trip_paths import FEET_PER_METER
+from trip_paths import haversine_meters
+
+
+
+# The number of rows converted to arrays at a time while reading a CSV file.
+CHUNK_SIZE = 65536
+
+
+
+
+class StringPool(object):
+  '''
+  The dictionary of a dictionary coded string column, maps the strings to their codes.
+  '''
+
+  def __init__(self):
+    self.__codes = {}
+    self.__values = []
+
+  def code(self, value):
+    '''
+    The code of the string, the string is added to the pool if it is not there yet.
+
+    :return: int
+    '''
+
+    code = self.__codes.get(value)
+    if code is None:
+      code = self.__codes[value] = len(self.__values)
+      self.__values.append(value)
+    return code
+
+  def find(self, value):
+    '''
+    The code of the string, -1 if the string is not in the pool.
+
+    :return: int
+    '''
+
+    return self.__codes.get(value, -1)
+
+  @property
+  def values(self):
+    '''
+    The strings in the pool, indexed by their codes.
+
+    :return: list(str)
+    '''
+
+    return self.__values
+
+  def __len__(self):
+    return len(self.__values)
+
+
+
+def _parse_gtfs_time(value):
+  '''
+  Parses a GTFS time ("HH:MM:SS", the hours can go past 24) into seconds after midnight.
+  '''
+
+  if not value:
+    return -1
+  hours, minutes, seconds = value.strip().split(':')
+  return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+
+def _format_service_time(service_date, seconds):
+  '''
+  Formats the seconds after midnight (a GTFS time, past 24 hours for the trips running
+  after midnight) of the service date as an ACTransit date string without an offset.
+  '''
+
+  if seconds < 0:
+    return None
+  start = datetime(service_date.year, service_date.month, service_date.day)
+  return (start + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+
+def _bound(latitude1, longitude1, latitude2, longitude2):
+  '''
+  The bound ("Northbound", "Southbound", "Eastbound" or "Westbound") of a trip going
+  from the first point to the second, by its larger move. None when the points are
+  the same or unknown.
+  '''
+
+  north = latitude2 - latitude1
+  east = (longitude2 - longitude1) * cos(radians((latitude1 + latitude2) / 2.0))
+  if not (abs(north) > 0.0 or abs(east) > 0.0):
+    return None
+  if abs(north) >= abs(east):
+    return 'Northbound' if north > 0.0 else 'Southbound'
+  return 'Eastbound' if east > 0.0 else 'Westbound'
+
+
+
+def _as_id(value):
+  '''
+  The ID as an int when it is numeric (as ACTransit's APIs have them), else as it is.
+  '''
+
+  return int(value) if value.isdigit() else value
+
+
+
+def _converter(kind, pools):
+  '''
+  The function converting a chunk of strings of a column into an array.
+  '''
+
+  if kind == 'int':
+    return lambda chunk: np.fromiter(\
+      (int(value) if value else -1 for value in chunk), dtype=np.int32, count=len(chunk))
+  if kind == 'float':
+    return lambda chunk: np.fromiter(\
+      (float(value) if value else np.nan for value in chunk), dtype=np.float64, count=len(chunk))
+  if kind == 'time':
+    return lambda chunk: np.fromiter(\
+      (_parse_gtfs_time(value) for value in chunk), dtype=np.int32, count=len(chunk))
+  code = pools[kind].code
+  return lambda chunk: np.fromiter(\
+    (code(value.strip()) for value in chunk), dtype=np.int32, count=len(chunk))
+
+
+
+def _read_table(archive, name, columns, pools):
+  '''
+  Streams the CSV file out of the zip archive and reads the columns into arrays.
+  columns maps the column names to their kinds - 'int', 'float', 'time' or the name
+  of the string pool of the column. Missing columns are read as empty values.
+
+  :return: dict(str, numpy.ndarray)
+  '''
+
+  names = list(columns.keys())
+  converters = [_converter(columns[column], pools) for column in names]
+  chunks = [[] for _ in names]
+  with archive.open(name) as raw:
+    reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+    header = [column.strip() for column in next(reader)]
+    indices = [header.index(column) if column in header else None for column in names]
+    while True:
+      rows = [row for row in islice(reader, CHUNK_SIZE) if row]
+      if not rows:
+        break
+      for position, index in enumerate(indices):
+        if index is None:
+          values = [''] * len(rows)
+        else:
+          values = [row[index] if index < len(row) else '' for row in rows]
+        chunks[position].append(converters[position](values))
+
+  for position in range(len(names)):
+    if not chunks[position]:
+      chunks[position].append(converters[position]([]))
+  return dict((column, np.concatenate(chunks[position])) for position, column in enumerate(names))
+
+
+
+class GtfsFeed(object):
+  '''
+  The static data of ACTransit's GTFS feed kept in compact columnar stores.
+
+  Serves the stops, routes, trips and timepoints as the wrapper objects returned by
+  the APIs. The stop IDs are the public stop codes of the feed (the StopId used by
+  the APIs) when the feed has them.
+  '''
+
+  def __init__(self, tables, pools):
+    '''
+    Initializes the feed from the columnar tables read by `from_zip`.
+    '''
+
+    self.__pools = pools
+    self.__stops = tables['stops.txt']
+    self.__routes = tables['routes.txt']
+    self.__trips = tables['trips.txt']
+    self.__stop_times = tables['stop_times.txt']
+    self.__schedule_types = self.__service_schedule_types(tables.get('calendar.txt'))
+
+    # the stop times sorted by (trip, sequence), with the first row of each trip
+    stop_times = self.__stop_times
+    order = np.lexsort((stop_times['stop_sequence'], stop_times['trip_id']))
+    for column in list(stop_times.keys()):
+      stop_times[column] = stop_times[column][order]
+    trip_codes = stop_times['trip_id']
+    self.__trip_starts = np.searchsorted(trip_codes, np.arange(len(pools['trip_id']) + 1))
+
+    # the rows of the stops and routes indexed by their codes
+    self.__stop_rows = np.full(len(pools['stop_id']), -1, dtype=np.int64)
+    self.__stop_rows[self.__stops['stop_id']] = np.arange(len(self.__stops['stop_id']))
+    self.__route_rows = np.full(len(pools['route_id']), -1, dtype=np.int64)
+    self.__route_rows[self.__routes['route_id']] = np.arange(len(self.__routes['route_id']))
+
+  @classmethod
+  def from_zip(cls, path):
+    '''
+    Ingests the GTFS zip file (path or file object) into a feed, without extracting it.
+
+    :return: GtfsFeed
+    '''
+
+    pools = dict((kind, StringPool()) for kind in \
+      ('stop_id', 'route_id', 'trip_id', 'service_id', 'text'))
+    tables = {}
+    with zipfile.ZipFile(path) as archive:
+      names = set(archive.namelist())
+      tables['stops.txt'] = _read_table(archive, 'stops.txt', {'stop_id': 'stop_id', \
+        'stop_code': 'text', 'stop_name': 'text', 'stop_lat': 'float', 'stop_lon': 'float'}, pools)
+      tables['routes.txt'] = _read_table(archive, 'routes.txt', {'route_id': 'route_id', \
+        'route_short_name': 'text', 'route_long_name': 'text'}, pools)
+      tables['trips.txt'] = _read_table(archive, 'trips.txt', {'trip_id': 'trip_id', \
+        'route_id': 'route_id', 'service_id': 'service_id'}, pools)
+      tables['stop_times.txt'] = _read_table(archive, 'stop_times.txt', {'trip_id': 'trip_id', \
+        'stop_sequence': 'int', 'stop_id': 'stop_id', 'departure_time': 'time', \
+        'timepoint': 'int'}, pools)
+      if 'calendar.txt' in names:
+        tables['calendar.txt'] = _read_table(archive, 'calendar.txt', {'service_id': 'service_id', \
+          'monday': 'int', 'tuesday': 'int', 'wednesday': 'int', 'thursday': 'int', \
+          'friday': 'int', 'saturday': 'int', 'sunday': 'int'}, pools)
+    return cls(tables, pools)
+
+  def __service_schedule_types(self, calendar):
+    '''
+    The ACTransitTripScheduleType value of every service, weekday for the services
+    that are not in the calendar.
+    '''
+
+    schedule_types = np.full(len(self.__pools['service_id']), \
+      ACTransitTripScheduleType.WEEKDAY.value, dtype=np.int32)
+    if calendar is None:
+      return schedule_types
+    weekdays = sum(calendar[day] > 0 for day in \
+      ('monday', 'tuesday', 'wednesday', 'thursday', 'friday'))
+    saturday_only = (weekdays == 0) & (calendar['saturday'] > 0)
+    sunday_only = (weekdays == 0) & (calendar['saturday'] <= 0) & (calendar['sunday'] > 0)
+    codes = calendar['service_id']
+    schedule_types[codes[saturday_only]] = ACTransitTripScheduleType.SATURDAY.value
+    schedule_types[codes[sunday_only]] = ACTransitTripScheduleType.SUNDAY.value
+    return schedule_types
+
+  def __text(self, code):
+    return self.__pools['text'].values[code] if code >= 0 else None
+
+  def __stop_json(self, row):
+    stops = self.__stops
+    stop_code = self.__text(stops['stop_code'][row])
+    stop_id = stop_code if stop_code else self.__pools['stop_id'].values[stops['stop_id'][row]]
+    return {
+      'StopId': _as_id(stop_id),
+      'Name': self.__text(stops['stop_name'][row]),
+      'Latitude': float(stops['stop_lat'][row]),
+      'Longitude': float(stops['stop_lon'][row]),
+      'ScheduledTime': None,
+    }
+
+  def __route_name(self, route_code):
+    row = self.__route_rows[route_code]
+    if row < 0:
+      return None
+    name = self.__text(self.__routes['route_short_name'][row])
+    return name if name else self.__pools['route_id'].values[route_code]
+
+  @property
+  def stop_count(self):
+    '''
+    The number of stops in the feed.
+
+    :return: int
+    '''
+
+    return len(self.__stops['stop_id'])
+
+  @property
+  def trip_count(self):
+    '''
+    The number of trips in the feed.
+
+    :return: int
+    '''
+
+    return len(self.__trips['trip_id'])
+
+  @property
+  def stop_time_count(self):
+    '''
+    The number of stop times in the feed.
+
+    :return: int
+    '''
+
+    return len(self.__stop_times['trip_id'])
+
+  def stops(self):
+    '''
+    All the stops of the feed.
+
+    :return: list(ACTransitStop)
+    '''
+
+    return [ACTransitStop(obj) for obj in self.stop_records()]
+
+  def stop_records(self):
+    '''
+    Yields the JSON objects of all the stops of the feed, as the APIs send them,
+    without building the ACTransitStop objects.
+
+    :return: generator(dict)
+    '''
+
+    for row in range(self.stop_count):
+      yield self.__stop_json(row)
+
+  def active_stops(self, latitude, longitude, route_name, search_radius=500):
+    '''
+    The stops of the route within the search radius (in feet) of the given point,
+    like actransit_apis.get_active_stops.
+
+    :return: list(ACTransitStop)
+    '''
+
+    route_codes = [code for code in range(len(self.__pools['route_id'])) \
+      if self.__route_name(code) == str(route_name)]
+    trip_codes = self.__trips['trip_id'][np.isin(self.__trips['route_id'], route_codes)]
+    stop_codes = np.unique(self.__stop_times['stop_id'][\
+      np.isin(self.__stop_times['trip_id'], trip_codes)])
+    rows = self.__stop_rows[stop_codes]
+    rows = rows[rows >= 0]
+
+    feet = haversine_meters(latitude, longitude, self.__stops['stop_lat'][rows], \
+      self.__stops['stop_lon'][rows]) * FEET_PER_METER
+    return [ACTransitStop(self.__stop_json(row)) for row in rows[feet <= search_radius]]
+
+  def routes(self):
+    '''
+    All the routes of the feed.
+
+    :return: list(ACTransitRoute)
+    '''
+
+    routes = self.__routes
+    return [ACTransitRoute({
+      'RouteId': self.__pools['route_id'].values[routes['route_id'][row]],
+      'Name': self.__route_name(routes['route_id'][row]),
+      'Description': self.__text(routes['route_long_name'][row]),
+    }) for row in range(len(routes['route_id']))]
+
+  def __trip_bound(self, trip_code):
+    '''
+    The bound of the trip from its first to its last stop, None when it is unknown.
+    '''
+
+    start, end = self.__trip_starts[trip_code], self.__trip_starts[trip_code + 1]
+    if end - start < 2:
+      return None
+    first, last = self.__stop_rows[self.__stop_times['stop_id'][[start, end - 1]]]
+    if first < 0 or last < 0:
+      return None
+    latitudes, longitudes = self.__stops['stop_lat'], self.__stops['stop_lon']
+    return _bound(float(latitudes[first]), float(longitudes[first]), \
+      float(latitudes[last]), float(longitudes[last]))
+
+  def trips(self, route_name=None, service_date=None):
+    '''
+    The trips of the route, or all the trips of the feed when route_name is None,
+    in the format of the live API. The start time of the trips is their departure
+    from their first stop on the service date (datetime.date, today by default), and
+    their direction their bound, see the module docstring.
+
+    :return: list(ACTransitTrip)
+    '''
+
+    service_date = date.today() if service_date is None else service_date
+    trips = self.__trips
+    ac_transit_trips = []
+    for row in range(len(trips['trip_id'])):
+      trip_route_name = self.__route_name(trips['route_id'][row])
+      if route_name is not None and trip_route_name != str(route_name):
+        continue
+      trip_code = trips['trip_id'][row]
+      start = self.__trip_starts[trip_code]
+      start_time = self.__stop_times['departure_time'][start] \
+        if start < self.__trip_starts[trip_code + 1] else -1
+      ac_transit_trips.append(ACTransitTrip({
+        'TripId': _as_id(self.__pools['trip_id'].values[trip_code]),
+        'RouteName': trip_route_name,
+        'ScheduleType': int(self.__schedule_types[trips['service_id'][row]]),
+        'StartTime': _format_service_time(service_date, int(start_time)),
+        'Direction': self.__trip_bound(trip_code),
+      }))
+    return ac_transit_trips
+
+  def timepoints(self, trip_id):
+    '''
+    The timepoints of the trip, ordered by their sequence. When the feed marks the
+    timepoints of the trips (timepoint column), only those stops are returned.
+
+    :return: list(ACTransitTimePoint)
+    '''
+
+    trip_code = self.__pools['trip_id'].find(str(trip_id))
+    if trip_code < 0:
+      return []
+    rows = np.arange(self.__trip_starts[trip_code], self.__trip_starts[trip_code + 1])
+    timepoint = self.__stop_times['timepoint'][rows]
+    rows = rows[timepoint != 0]
+    stop_rows = self.__stop_rows[self.__stop_times['stop_id'][rows]]
+    return [ACTransitTimePoint({
+      'TripId': _as_id(str(trip_id)),
+      'Sequence': int(sequence),
+      'Latitude': float(self.__stops['stop_lat'][stop_row]),
+      'Longitude': float(self.__stops['stop_lon'][stop_row]),
+    }) for sequence, stop_row in zip(self.__stop_times['stop_sequence'][rows], stop_rows) \
+      if stop_row >= 0]
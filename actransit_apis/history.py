@@ -0,0 +1,338 @@
+# history.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module records the polled predictions and vehicle positions into an append-only
+history log, and reads them back.
+
+The rows are batched into blocks, each block is column oriented - the timestamps
+are integer encoded (seconds since the epoch), the route names are dictionary coded
+and the columns are compressed together with zlib. Every block starts with a small
+header holding its row count and time range, so that a reader can skip the blocks
+outside of the time range it is interested in without decompressing them.
+
+Layout of a block -
+
+  header  : magic (b'ACTH'), kind (b'P' or b'V'), rows (uint32), min time (int64),
+            max time (int64), payload length (uint32)
+  payload : zlib(columns, in the order of the kind, followed by the route names
+            separated by newlines, a NUL character for a missing route name)
+'''
+
+import struct
+import zlib
+from threading import Lock
+
+import numpy as np
+
+from timeutils import parse_timestamp
+
+
+
+# The value stored for the missing timestamps.
+NULL_TIME = np.iinfo(np.int64).min
+
+# The value stored for the missing IDs.
+NULL_ID = -1
+
+# The value stored for the missing delays, -1 is a real delay (a second early).
+NULL_DELAY = np.iinfo(np.int32).min
+
+# The name stored for the missing route names, no route is named by a NUL character.
+__NULL_ROUTE_NAME__ = '\x00'
+
+PREDICTIONS = b'P'
+VEHICLES = b'V'
+
+__BLOCK_MAGIC__ = b'ACTH'
+__BLOCK_HEADER__ = struct.Struct('<4scIqqI')
+
+# The columns of each kind of block, in the order they are stored. The column named
+# by __TIME_COLUMN__ gives the time range of the block.
+__COLUMNS__ = {
+  PREDICTIONS: [
+    ('prediction_time', np.int64),
+    ('stop_id', np.int32),
+    ('trip_id', np.int32),
+    ('vehicle_id', np.int32),
+    ('route_code', np.int32),
+    ('predicted_delay', np.int32),
+    ('predicted_departure', np.int64),
+  ],
+  VEHICLES: [
+    ('time_last_reported', np.int64),
+    ('vehicle_id', np.int32),
+    ('trip_id', np.int32),
+    ('latitude', np.float64),
+    ('longitude', np.float64),
+    ('heading', np.int16),
+  ],
+}
+
+__TIME_COLUMN__ = {
+  PREDICTIONS: 'prediction_time',
+  VEHICLES: 'time_last_reported',
+}
+
+
+
+def _time(datestr):
+  seconds = parse_timestamp(datestr)
+  return NULL_TIME if seconds is None else int(seconds)
+
+
+
+def _id(value):
+  return NULL_ID if value is None else value
+
+
+
+def _delay(value):
+  return NULL_DELAY if value is None else value
+
+
+
+def _prediction_row(prediction, route_codes):
+  return (
+    _time(prediction.predicted_date_time),
+    _id(prediction.stopId),
+    _id(prediction.tripId),
+    _id(prediction.vehicleId),
+    route_codes.setdefault(prediction.route_name, len(route_codes)),
+    _delay(prediction.predicted_delay_in_seconds),
+    _time(prediction.predicted_departure),
+  )
+
+
+
+def _vehicle_row(vehicle, route_codes):
+  return (
+    _time(vehicle.time_last_reported),
+    _id(vehicle.vehicle_id),
+    _id(vehicle.current_trip_id),
+    vehicle.latitude,
+    vehicle.longitude,
+    _id(vehicle.heading),
+  )
+
+
+
+class HistoryRecorder(object):
+  '''
+  Appends the predictions and the vehicle positions to a history log file.
+
+  The rows are buffered and written as one compressed block every block_rows rows
+  (per kind), call flush() or close() to write the rows still buffered.
+  '''
+
+  def __init__(self, path, block_rows=8192, compression_level=6):
+    '''
+    Opens the history log at path for appending, the file is created if needed.
+    '''
+
+    self.__file = open(path, 'ab')
+    self.__block_rows = block_rows
+    self.__compression_level = compression_level
+    self.__buffers = {PREDICTIONS: [], VEHICLES: []}
+    self.__route_codes = {PREDICTIONS: {}, VEHICLES: {}}
+    self.__lock = Lock()
+
+  def record_predictions(self, predictions):
+    '''
+    Records the ACTransitPrediction objects.
+
+    :return: None
+    '''
+
+    self.__record(PREDICTIONS, predictions, _prediction_row)
+    return
+
+  def record_vehicles(self, vehicles):
+    '''
+    Records the positions of the ACTransitVehicle objects.
+
+    :return: None
+    '''
+
+    self.__record(VEHICLES, vehicles, _vehicle_row)
+    return
+
+  def __record(self, kind, objs, make_row):
+    with self.__lock:
+      buffer = self.__buffers[kind]
+      route_codes = self.__route_codes[kind]
+      for obj in objs:
+        buffer.append(make_row(obj, route_codes))
+        if len(buffer) >= self.__block_rows:
+          self.__write_block(kind)
+          buffer = self.__buffers[kind]
+          route_codes = self.__route_codes[kind]
+
+  def __write_block(self, kind):
+    rows = self.__buffers[kind]
+    if not rows:
+      return
+    route_codes = self.__route_codes[kind]
+    self.__buffers[kind] = []
+    self.__route_codes[kind] = {}
+
+    columns = list(zip(*rows))
+    parts = []
+    times = None
+    for index, (name, dtype) in enumerate(__COLUMNS__[kind]):
+      column = np.array(columns[index], dtype=dtype)
+      if name == __TIME_COLUMN__[kind]:
+        times = column
+      parts.append(column.tobytes())
+    route_names = sorted(route_codes, key=route_codes.get)
+    parts.append('\n'.join(__NULL_ROUTE_NAME__ if name is None else name \
+      for name in route_names).encode('utf-8'))
+    payload = zlib.compress(b''.join(parts), self.__compression_level)
+
+    known = times[times != NULL_TIME]
+    min_time = int(known.min()) if len(known) else NULL_TIME
+    max_time = int(known.max()) if len(known) else NULL_TIME
+    self.__file.write(__BLOCK_HEADER__.pack(\
+      __BLOCK_MAGIC__, kind, len(rows), min_time, max_time, len(payload)))
+    self.__file.write(payload)
+
+  def flush(self):
+    '''
+    Writes the buffered rows as blocks and flushes the file.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      self.__write_block(PREDICTIONS)
+      self.__write_block(VEHICLES)
+      self.__file.flush()
+    return
+
+  def close(self):
+    '''
+    Writes the buffered rows and closes the file.
+
+    :return: None
+    '''
+
+    self.flush()
+    self.__file.close()
+    return
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+
+class HistoryReader(object):
+  '''
+  Reads the blocks of a history log file sequentially.
+  '''
+
+  def __init__(self, path):
+    '''
+    Initializes the reader of the history log at path.
+    '''
+
+    self.__path = path
+
+  def blocks(self, kind, start=None, end=None):
+    '''
+    Yields the blocks of the kind (PREDICTIONS or VEHICLES) as dicts of column arrays,
+    the route names of a block are under 'route_names' (indexed by 'route_code').
+
+    When start and/or end (seconds since the epoch) are given, the blocks entirely
+    outside of [start, end] are skipped without being decompressed, and the rows of
+    the other blocks are filtered on their time.
+
+    :return: generator(dict)
+    '''
+
+    time_column = __TIME_COLUMN__[kind]
+    with open(self.__path, 'rb') as history:
+      while True:
+        header = history.read(__BLOCK_HEADER__.size)
+        if len(header) < __BLOCK_HEADER__.size:
+          return
+        magic, block_kind, rows, min_time, max_time, length = __BLOCK_HEADER__.unpack(header)
+        if magic != __BLOCK_MAGIC__:
+          raise ValueError('Corrupted history log {} at offset {}'.format(\
+            repr(self.__path), history.tell() - __BLOCK_HEADER__.size))
+        if block_kind != kind or \
+          (start is not None and max_time < start) or \
+          (end is not None and min_time != NULL_TIME and min_time > end):
+          history.seek(length, 1)
+          continue
+
+        payload = zlib.decompress(history.read(length))
+        block = {}
+        offset = 0
+        for name, dtype in __COLUMNS__[kind]:
+          size = rows * np.dtype(dtype).itemsize
+          block[name] = np.frombuffer(payload, dtype=dtype, count=rows, offset=offset)
+          offset += size
+        names = payload[offset:].decode('utf-8')
+        block['route_names'] = [None if name == __NULL_ROUTE_NAME__ else name \
+          for name in names.split('\n')] if kind == PREDICTIONS and rows else []
+
+        if start is not None or end is not None:
+          times = block[time_column]
+          keep = np.ones(rows, dtype=bool)
+          if start is not None:
+            keep &= times >= start
+          if end is not None:
+            keep &= times <= end
+          if not keep.all():
+            for name, _ in __COLUMNS__[kind]:
+              block[name] = block[name][keep]
+        yield block
+
+  def read(self, kind, start=None, end=None):
+    '''
+    Reads all the rows of the kind (within the time range) into one dict of column
+    arrays. The route codes are remapped to a single list of route names, under
+    'route_names'.
+
+    :return: dict
+    '''
+
+    columns = dict((name, []) for name, _ in __COLUMNS__[kind])
+    route_codes = {}
+    for block in self.blocks(kind, start, end):
+      for name, _ in __COLUMNS__[kind]:
+        if name == 'route_code':
+          remap = np.array([route_codes.setdefault(route_name, len(route_codes)) \
+            for route_name in block['route_names']], dtype=np.int32)
+          columns[name].append(remap[block[name]] if len(remap) else block[name])
+        else:
+          columns[name].append(block[name])
+
+    result = {}
+    for name, dtype in __COLUMNS__[kind]:
+      result[name] = np.concatenate(columns[name]) if columns[name] else np.zeros(0, dtype=dtype)
+    result['route_names'] = sorted(route_codes, key=route_codes.get)
+    return result
+
+  def read_predictions(self, start=None, end=None):
+    '''
+    Reads the recorded predictions within the time range (on the prediction time).
+
+    :return: dict
+    '''
+
+    return self.read(PREDICTIONS, start, end)
+
+  def read_vehicles(self, start=None, end=None):
+    '''
+    Reads the recorded vehicle positions within the time range (on the time last reported).
+
+    :return: dict
+    '''
+
+    return self.read(VEHICLES, start, end)
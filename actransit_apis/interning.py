@@ -0,0 +1,153 @@
+# interning.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the string interning used while decoding the JSON responses
+from ACTransit, and the route table shared by the wrapper objects.
+
+Fields like RouteName, Direction and the stop names have very few distinct values,
+but the JSON decoder makes a new string for every occurrence of them. Interning
+them makes all the wrapper objects share one copy of each of these strings.
+'''
+
+from sys import intern
+from threading import Lock
+
+
+
+# The low cardinality string fields of ACTransit's JSON objects.
+INTERNED_FIELDS = frozenset([
+  'RouteName',
+  'Direction',
+  'Name',
+  'RouteId',
+  'Description',
+  'Title',
+  # the timestamps are at minute (or second) resolution, so they repeat a lot too
+  'PredictedDeparture',
+  'PredictionDateTime',
+  'ScheduledTime',
+  'StartTime',
+])
+
+# The fields holding lists of low cardinality strings.
+INTERNED_LIST_FIELDS = frozenset([
+  'ImpactedRoutes',
+])
+
+
+
+def intern_fields(json_obj):
+  '''
+  Interns the strings of the low cardinality fields of the JSON object (decoded
+  to python dict) in place. Can be used as the object_hook of a JSONDecoder.
+
+  :return: dict
+  '''
+
+  for key, value in json_obj.items():
+    if key in INTERNED_FIELDS:
+      if type(value) is str:
+        json_obj[key] = intern(value)
+    elif key in INTERNED_LIST_FIELDS and type(value) is list:
+      value[:] = [intern(item) if type(item) is str else item for item in value]
+  return json_obj
+
+
+
+def intern_json(json_obj):
+  '''
+  Interns the strings of the low cardinality fields of all the JSON objects nested
+  in the decoded JSON, for the decoders that do not support an object_hook.
+
+  :return: object
+  '''
+
+  # iterative walk, the responses are mostly long lists of flat objects
+  pending = [json_obj]
+  while pending:
+    container = pending.pop()
+    if type(container) is list:
+      for value in container:
+        if type(value) is dict or type(value) is list:
+          pending.append(value)
+      continue
+    for key, value in container.items():
+      kind = type(value)
+      if kind is str:
+        if key in INTERNED_FIELDS:
+          container[key] = intern(value)
+      elif kind is list:
+        if key in INTERNED_LIST_FIELDS:
+          value[:] = [intern(item) if type(item) is str else item for item in value]
+        pending.append(value)
+      elif kind is dict:
+        pending.append(value)
+  return json_obj
+
+
+
+class RouteTable(object):
+  '''
+  A table of the routes shared by all the wrapper objects, keyed by the route name.
+
+  The wrapper objects having a route name (predictions, trips and trip estimates)
+  look their route up in this table instead of holding the route information
+  themselves.
+  '''
+
+  def __init__(self, routes=None):
+    '''
+    Initializes the table, optionally with a list of ACTransitRoute objects.
+    '''
+
+    self.__routes = {}
+    self.__lock = Lock()
+    if routes is not None:
+      self.register(routes)
+
+  def register(self, routes):
+    '''
+    Adds the ACTransitRoute objects to the table, replacing the routes with the
+    same names.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      for route in routes:
+        self.__routes[intern(route.name)] = route
+    return
+
+  def get(self, route_name):
+    '''
+    The route with the name, None when the route is not in the table.
+
+    :return: ACTransitRoute
+    '''
+
+    return self.__routes.get(route_name)
+
+  def clear(self):
+    '''
+    Removes all the routes from the table.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      self.__routes.clear()
+    return
+
+  def __contains__(self, route_name):
+    return route_name in self.__routes
+
+  def __len__(self):
+    return len(self.__routes)
+
+
+
+# The route table referenced by the wrapper objects.
+ROUTE_TABLE = RouteTable()
@@ -0,0 +1,184 @@
+# joins.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module joins the predictions with the vehicles running them and their trips -
+where is the bus of this prediction, and which trip (direction) is it on.
+
+The vehicles and the trips of a snapshot are indexed in hash tables once, so that
+the join costs O(1) per prediction instead of a scan of the fleet. The trips that
+are not in the snapshot are fetched with get_trips, one call per route for all the
+missing trips of the route, and kept in a cache shared by the snapshots.
+'''
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from actransit_apis import actransit_apis
+from caching import TTLCache
+
+
+
+# The trips only change with the GTFS schedule.
+TRIP_TTL = 3600
+
+# The trips fetched for the joins, keyed by trip ID. The routes whose trips were
+# fetched are keyed by ('route', route name), so that a trip missing from its route
+# does not trigger the same fetch over and over.
+__TRIP_CACHE__ = TTLCache(ttl=TRIP_TTL, name='joined_trips')
+
+# A prediction with the vehicle running it and its trip, None when they are unknown.
+EnrichedPrediction = namedtuple('EnrichedPrediction', ['prediction', 'vehicle', 'trip'])
+
+
+
+class SnapshotJoin(object):
+  '''
+  The join of a snapshot of ACTransitPrediction objects with the ACTransitVehicle
+  and ACTransitTrip objects, indexed by vehicle ID and trip ID.
+  '''
+
+  def __init__(self, predictions, vehicles=(), trips=(), fetch_missing_trips=True, \
+    max_workers=4, cache=None):
+    '''
+    Indexes the snapshot. When fetch_missing_trips is True, the trips of the
+    predictions that are not in trips are fetched per route (at most max_workers
+    routes at once) and cached in cache (the shared trip cache by default). The trips
+    of the routes whose fetch fails are left unknown, see errors.
+    '''
+
+    global __TRIP_CACHE__
+
+    self.__predictions = list(predictions)
+    self.__cache = __TRIP_CACHE__ if cache is None else cache
+    self.__vehicles = {}
+    for vehicle in vehicles:
+      self.__vehicles[vehicle.vehicle_id] = vehicle
+    self.__errors = {}
+    self.__trips = {}
+    for trip in trips:
+      self.__trips[trip.trip_id] = trip
+
+    self.__predictions_by_vehicle = {}
+    self.__predictions_by_trip = {}
+    for prediction in self.__predictions:
+      self.__predictions_by_vehicle.setdefault(prediction.vehicleId, []).append(prediction)
+      self.__predictions_by_trip.setdefault(prediction.tripId, []).append(prediction)
+
+    self.__resolve_trips(fetch_missing_trips, max_workers)
+
+  def __resolve_trips(self, fetch_missing_trips, max_workers):
+    '''
+    Adds the trips of the predictions that are missing from the snapshot, from the
+    cache or else fetched per route.
+    '''
+
+    cache = self.__cache
+    missing_routes = {}
+    for trip_id, predictions in self.__predictions_by_trip.items():
+      if trip_id is None or trip_id in self.__trips:
+        continue
+      trip = cache.get(trip_id)
+      if trip is not None:
+        self.__trips[trip_id] = trip
+        continue
+      route_name = predictions[0].route_name
+      if cache.get(('route', route_name)) is None:
+        missing_routes.setdefault(route_name, set()).add(trip_id)
+
+    if not fetch_missing_trips or not missing_routes:
+      return
+
+    def fetch(route_name):
+      try:
+        return route_name, actransit_apis.get_trips(route_name), None
+      except Exception as error:
+        return route_name, None, error
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing_routes)))) as executor:
+      for route_name, trips, error in executor.map(fetch, missing_routes):
+        if error is not None:
+          # the route is not marked as fetched, the next join tries it again
+          self.__errors[route_name] = error
+          continue
+        for trip in trips:
+          cache.put(trip.trip_id, trip)
+        cache.put(('route', route_name), True)
+        for trip in trips:
+          if trip.trip_id in missing_routes[route_name]:
+            self.__trips[trip.trip_id] = trip
+
+  @property
+  def errors(self):
+    '''
+    The exceptions raised while fetching the missing trips, keyed by route name.
+
+    :return: dict
+    '''
+
+    return self.__errors
+
+  def vehicle(self, prediction):
+    '''
+    The vehicle running the prediction, None when it is not in the snapshot.
+
+    :return: ACTransitVehicle
+    '''
+
+    return self.__vehicles.get(prediction.vehicleId)
+
+  def trip(self, prediction):
+    '''
+    The trip of the prediction, None when it is unknown.
+
+    :return: ACTransitTrip
+    '''
+
+    return self.__trips.get(prediction.tripId)
+
+  def predictions_for_vehicle(self, vehicle_id):
+    '''
+    The predictions of the snapshot run by the vehicle.
+
+    :return: list(ACTransitPrediction)
+    '''
+
+    return list(self.__predictions_by_vehicle.get(vehicle_id, ()))
+
+  def predictions_for_trip(self, trip_id):
+    '''
+    The predictions of the snapshot for the trip.
+
+    :return: list(ACTransitPrediction)
+    '''
+
+    return list(self.__predictions_by_trip.get(trip_id, ()))
+
+  def records(self):
+    '''
+    The predictions of the snapshot with their vehicle and trip, in the order of
+    the predictions.
+
+    :return: list(EnrichedPrediction)
+    '''
+
+    vehicles = self.__vehicles
+    trips = self.__trips
+    return [EnrichedPrediction(prediction, vehicles.get(prediction.vehicleId), \
+      trips.get(prediction.tripId)) for prediction in self.__predictions]
+
+  def __len__(self):
+    return len(self.__predictions)
+
+
+
+def join_predictions(predictions, vehicles=(), trips=(), fetch_missing_trips=True):
+  '''
+  The predictions with the vehicle running them and their trip, see SnapshotJoin.
+
+  :return: list(EnrichedPrediction)
+  '''
+
+  return SnapshotJoin(predictions, vehicles, trips, fetch_missing_trips).records()
@@ -0,0 +1,171 @@
+# json_backends.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the JSON decoding backends used for the responses of ACTransit's
+APIs.
+
+The fastest backend installed is used - orjson, then ujson, and the standard library
+json module as the fallback. orjson and ujson decode straight from the bytes of the
+response, without first making a str copy of it.
+
+Whatever the backend, an invalid document raises json.JSONDecodeError, as the
+standard library decoder always did for fetch_decode_json.
+'''
+
+from json import JSONDecodeError
+from json import JSONDecoder
+
+from interning import intern_fields
+from interning import intern_json
+
+
+
+class JsonBackend(object):
+  '''
+  A JSON decoding backend.
+  '''
+
+  def __init__(self, name, loads, loads_interned):
+    '''
+    Initializes the backend. loads decodes bytes into python objects, and
+    loads_interned does the same while interning the low cardinality strings.
+    '''
+
+    self.__name = name
+    self.__loads = loads
+    self.__loads_interned = loads_interned
+
+  @property
+  def name(self):
+    '''
+    The name of the backend.
+
+    :return: str
+    '''
+
+    return self.__name
+
+  def decode(self, data, intern=True):
+    '''
+    Decodes the JSON document in data (bytes). Raises json.JSONDecodeError when
+    the document is invalid.
+
+    :return: JSON object
+    '''
+
+    try:
+      return self.__loads_interned(data) if intern else self.__loads(data)
+    except JSONDecodeError:
+      raise
+    except ValueError as e:
+      # the errors of the other backends, and the invalid utf-8 of the bytes
+      document = data.decode('utf-8', 'replace') if isinstance(data, bytes) else data
+      raise JSONDecodeError(str(e), document, getattr(e, 'pos', 0) or 0) from e
+
+  def __repr__(self):
+    return 'JsonBackend({})'.format(repr(self.__name))
+
+
+
+def _stdlib_backend():
+  plain = JSONDecoder()
+  interned = JSONDecoder(object_hook=intern_fields)
+  # the standard library decoder only works on str, so this backend still pays for
+  # the one utf-8 decoding of the bytes
+  return JsonBackend('json', \
+    lambda data: plain.decode(data.decode('utf-8') if isinstance(data, bytes) else data), \
+    lambda data: interned.decode(data.decode('utf-8') if isinstance(data, bytes) else data))
+
+
+
+def _orjson_backend():
+  import orjson
+  return JsonBackend('orjson', orjson.loads, lambda data: intern_json(orjson.loads(data)))
+
+
+
+def _ujson_backend():
+  import ujson
+  return JsonBackend('ujson', ujson.loads, lambda data: intern_json(ujson.loads(data)))
+
+
+
+# The backends by name, in the order of preference.
+__BACKEND_FACTORIES__ = [
+  ('orjson', _orjson_backend),
+  ('ujson', _ujson_backend),
+  ('json', _stdlib_backend),
+]
+
+# The backend in use, chosen on first use.
+__BACKEND__ = None
+
+
+
+def available_backends():
+  '''
+  The names of the backends that are installed, in the order of preference.
+
+  :return: list(str)
+  '''
+
+  names = []
+  for name, factory in __BACKEND_FACTORIES__:
+    try:
+      factory()
+    except ImportError:
+      continue
+    names.append(name)
+  return names
+
+
+
+def get_backend(name=None):
+  '''
+  The backend with the name, or the backend in use when name is None (the fastest
+  installed backend, unless set_backend was called).
+
+  :return: JsonBackend
+  '''
+
+  global __BACKEND__
+
+  if name is None:
+    if __BACKEND__ is None:
+      __BACKEND__ = get_backend(available_backends()[0])
+    return __BACKEND__
+
+  for backend_name, factory in __BACKEND_FACTORIES__:
+    if backend_name == name:
+      return factory()
+  raise ValueError('Unknown JSON backend {}, use one of {}'.format(\
+    repr(name), ', '.join(backend_name for backend_name, _ in __BACKEND_FACTORIES__)))
+
+
+
+def set_backend(name):
+  '''
+  Sets the backend used to decode the responses. Raises ImportError when the
+  backend is not installed.
+
+  :return: None
+  '''
+
+  global __BACKEND__
+
+  __BACKEND__ = get_backend(name)
+  return
+
+
+
+def decode_json(data, intern=True):
+  '''
+  Decodes the JSON document in data (bytes) with the backend in use.
+
+  :return: JSON object
+  '''
+
+  return get_backend().decode(data, intern)
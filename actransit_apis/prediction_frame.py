@@ -0,0 +1,336 @@
+# prediction_frame.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module stores predictions as NumPy columns, so that filtering the predictions
+of many stops by route, delay or departure window is a vectorized expression over
+arrays instead of a Python loop over ACTransitPrediction objects.
+
+The columns are the ones of the history log (see history.py) - the IDs, the delay
+(NULL_DELAY when missing, select the delays with delay_mask), the timestamps in
+seconds since the epoch (NULL_TIME when missing) and the route names
+dictionary-coded in route_code, indexing route_names. So a frame can be made
+from the columns read from the history log, and its columns given to the functions
+of delay_analytics.
+
+for eg -
+  frame = PredictionFrame.from_json(json_objs)
+  late = frame.filter(frame.route_mask('51B', '72') & frame.delay_mask(minimum=300))
+  late = late.sort('predicted_departure')
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+import numpy as np
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitPrediction
+from history import NULL_DELAY
+from history import NULL_ID
+from history import NULL_TIME
+from timeutils import parse_timestamp
+
+
+
+# The columns of a frame and their types, route_code indexes the route names.
+COLUMNS = (
+  ('prediction_time', np.int64),
+  ('stop_id', np.int64),
+  ('trip_id', np.int64),
+  ('vehicle_id', np.int64),
+  ('route_code', np.int32),
+  ('predicted_delay', np.int64),
+  ('predicted_departure', np.int64),
+)
+
+# The column sorting the rows by route name rather than by route code.
+ROUTE = 'route'
+
+__GET_FIELDS__ = itemgetter(*ACTransitPrediction.FIELDS)
+
+
+
+def _ids(values, size):
+  return np.fromiter((NULL_ID if value is None else value for value in values), \
+    dtype=np.int64, count=size)
+
+
+
+def _delays(values, size):
+  return np.fromiter((NULL_DELAY if value is None else value for value in values), \
+    dtype=np.int64, count=size)
+
+
+
+def _times(values, size):
+  # the predictions of a poll share a handful of timestamps, each is parsed once
+  parsed = {None: NULL_TIME}
+  times = np.empty(size, dtype=np.int64)
+  for index, value in enumerate(values):
+    seconds = parsed.get(value)
+    if seconds is None:
+      seconds = parsed[value] = int(parse_timestamp(value))
+    times[index] = seconds
+  return times
+
+
+
+class PredictionFrame(object):
+  '''
+  A set of predictions stored as NumPy columns, see COLUMNS. The frames are
+  immutable, filter, sort and concat return new frames.
+  '''
+
+  def __init__(self, columns, route_names):
+    '''
+    Makes the frame from the dict of its columns (all the columns of COLUMNS, of the
+    same length) and the route names indexed by the route codes.
+    '''
+
+    self.__columns = {}
+    for name, dtype in COLUMNS:
+      self.__columns[name] = np.asarray(columns[name], dtype=dtype)
+    self.__route_names = list(route_names)
+    self.__route_codes = dict((route_name, code) for code, route_name in enumerate(self.__route_names))
+
+  @classmethod
+  def from_rows(cls, rows):
+    '''
+    Makes the frame from the tuples of the fields of the predictions, in the order of
+    ACTransitPrediction.FIELDS.
+
+    :return: PredictionFrame
+    '''
+
+    rows = list(rows)
+    size = len(rows)
+    if not size:
+      return cls.empty()
+    stop_ids, trip_ids, vehicle_ids, route_names, delays, departures, times = zip(*rows)
+    route_codes = {}
+    codes = np.fromiter((route_codes.setdefault(route_name, len(route_codes)) \
+      for route_name in route_names), dtype=np.int32, count=size)
+    return cls({
+      'prediction_time': _times(times, size),
+      'stop_id': _ids(stop_ids, size),
+      'trip_id': _ids(trip_ids, size),
+      'vehicle_id': _ids(vehicle_ids, size),
+      'route_code': codes,
+      'predicted_delay': _delays(delays, size),
+      'predicted_departure': _times(departures, size),
+    }, sorted(route_codes, key=route_codes.get))
+
+  @classmethod
+  def from_json(cls, json_objs):
+    '''
+    Makes the frame from the decoded JSON objects of the predictions (as returned by
+    actransit_apis.fetch_decode_json), without making ACTransitPrediction objects.
+
+    :return: PredictionFrame
+    '''
+
+    return cls.from_rows(__GET_FIELDS__(json_obj) for json_obj in json_objs)
+
+  @classmethod
+  def from_predictions(cls, predictions):
+    '''
+    Makes the frame from ACTransitPrediction objects.
+
+    :return: PredictionFrame
+    '''
+
+    return cls.from_rows(prediction.to_tuple() for prediction in predictions)
+
+  @classmethod
+  def from_columns(cls, columns):
+    '''
+    Makes the frame from a dict of columns with their 'route_names', like the ones
+    read from the history log by history.HistoryReader.read_predictions.
+
+    :return: PredictionFrame
+    '''
+
+    return cls(columns, columns['route_names'])
+
+  @classmethod
+  def empty(cls):
+    '''
+    A frame without any prediction.
+
+    :return: PredictionFrame
+    '''
+
+    return cls(dict((name, np.zeros(0, dtype=dtype)) for name, dtype in COLUMNS), [])
+
+  @staticmethod
+  def concat(frames):
+    '''
+    The predictions of all the frames in one frame, in order. The route codes of the
+    frames are remapped to a single list of route names.
+
+    :return: PredictionFrame
+    '''
+
+    frames = list(frames)
+    if not frames:
+      return PredictionFrame.empty()
+    route_codes = {}
+    route_code_columns = []
+    for frame in frames:
+      remap = np.array([route_codes.setdefault(route_name, len(route_codes)) \
+        for route_name in frame.route_names], dtype=np.int32)
+      route_code_columns.append(remap[frame['route_code']] if len(remap) else frame['route_code'])
+    columns = {'route_code': np.concatenate(route_code_columns)}
+    for name, _ in COLUMNS:
+      if name != 'route_code':
+        columns[name] = np.concatenate([frame[name] for frame in frames])
+    return PredictionFrame(columns, sorted(route_codes, key=route_codes.get))
+
+  @property
+  def route_names(self):
+    '''
+    The route names, indexed by the route codes.
+
+    :return: list(str)
+    '''
+
+    return list(self.__route_names)
+
+  def route_name_column(self):
+    '''
+    The route name of every prediction, decoded from the route codes.
+
+    :return: numpy.ndarray
+    '''
+
+    return np.array(self.__route_names, dtype=object)[self.__columns['route_code']]
+
+  def columns(self):
+    '''
+    The columns of the frame with the 'route_names', as taken by the functions of
+    delay_analytics.
+
+    :return: dict
+    '''
+
+    columns = dict(self.__columns)
+    columns['route_names'] = self.route_names
+    return columns
+
+  def route_mask(self, *route_names):
+    '''
+    The mask of the predictions of the routes.
+
+    :return: numpy.ndarray
+    '''
+
+    codes = [self.__route_codes[route_name] for route_name in route_names \
+      if route_name in self.__route_codes]
+    return np.isin(self.__columns['route_code'], np.array(codes, dtype=np.int32))
+
+  def stop_mask(self, *stop_ids):
+    '''
+    The mask of the predictions for the stops.
+
+    :return: numpy.ndarray
+    '''
+
+    return np.isin(self.__columns['stop_id'], np.array(stop_ids, dtype=np.int64))
+
+  def delay_mask(self, minimum=None, maximum=None):
+    '''
+    The mask of the predictions with a delay within [minimum, maximum] (seconds), a
+    missing bound is not checked. The predictions without a delay are left out.
+
+    :return: numpy.ndarray
+    '''
+
+    delays = self.__columns['predicted_delay']
+    mask = delays != NULL_DELAY
+    if minimum is not None:
+      mask &= delays >= minimum
+    if maximum is not None:
+      mask &= delays <= maximum
+    return mask
+
+  def departure_mask(self, start=None, end=None):
+    '''
+    The mask of the predictions departing within [start, end) (seconds since the
+    epoch), a missing bound is not checked. The predictions without a departure are
+    left out.
+
+    :return: numpy.ndarray
+    '''
+
+    departures = self.__columns['predicted_departure']
+    mask = departures != NULL_TIME
+    if start is not None:
+      mask &= departures >= start
+    if end is not None:
+      mask &= departures < end
+    return mask
+
+  def filter(self, mask):
+    '''
+    The predictions selected by the boolean mask, or by an array of row indexes.
+
+    :return: PredictionFrame
+    '''
+
+    mask = np.asarray(mask)
+    return PredictionFrame(dict((name, column[mask]) for name, column in self.__columns.items()), \
+      self.__route_names)
+
+  def sort(self, by, descending=False):
+    '''
+    The predictions sorted on the column, or on the columns of a tuple (the first
+    column first). The ROUTE column sorts on the route names. The sort is stable.
+
+    :return: PredictionFrame
+    '''
+
+    by = (by,) if isinstance(by, str) else tuple(by)
+    keys = []
+    for name in by:
+      if name == ROUTE:
+        ranks = np.empty(len(self.__route_names), dtype=np.int32)
+        # the missing route names sort first
+        names = np.array(['' if name is None else name for name in self.__route_names], dtype=object)
+        ranks[np.argsort(names, kind='stable')] = \
+          np.arange(len(self.__route_names), dtype=np.int32)
+        keys.append(ranks[self.__columns['route_code']] if len(ranks) else self.__columns['route_code'])
+      else:
+        keys.append(self.__columns[name])
+    if descending:
+      # negating the ranks of the values keeps the sort stable, unlike reversing it,
+      # and does not overflow on NULL_TIME
+      keys = [-np.unique(key, return_inverse=True)[1].reshape(-1) for key in keys]
+    # np.lexsort sorts on the last key first
+    return self.filter(np.lexsort(keys[::-1]))
+
+  def __getitem__(self, name):
+    return self.__columns[name]
+
+  def __len__(self):
+    return len(self.__columns['stop_id'])
+
+
+
+def predictions_frame(stop_ids, max_workers=4):
+  '''
+  The predictions of all the stops in one frame, fetched with get_predictions (at
+  most max_workers stops at once).
+
+  :return: PredictionFrame
+  '''
+
+  stop_ids = list(stop_ids)
+  if not stop_ids:
+    return PredictionFrame.empty()
+  with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(stop_ids)))) as executor:
+    predictions = list(executor.map(actransit_apis.get_predictions, stop_ids))
+  return PredictionFrame.from_rows(prediction.to_tuple() \
+    for stop_predictions in predictions for prediction in stop_predictions)
@@ -0,0 +1,238 @@
+# prefetch.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module prefetches the predictions of the busy stops.
+
+The calls for predictions are heavily skewed towards a few hundred stops. The
+prefetcher counts the calls per stop with counters decaying over time, and a
+background thread refreshes the predictions of the hot stops in the prediction
+cache of the library just before they expire, so that the calls for those stops
+are served from the cache instead of waiting on the network. The refreshes are
+taken from a rate limiter, the budget of the background calls.
+'''
+
+from threading import Event
+from threading import Lock
+from threading import Thread
+from time import monotonic
+
+from actransit_apis import actransit_apis
+from caching import TTLCache
+from ratelimit import RateLimiter
+
+
+
+# The default number of seconds after which a count has lost half of its weight.
+ACCESS_HALF_LIFE = 300
+
+# The default number of seconds before the expiry of the predictions of a hot stop
+# at which they are refreshed.
+REFRESH_LEAD = 3
+
+# The score under which a key is forgotten by the decaying counters.
+FORGET_SCORE = 1e-3
+
+
+
+class DecayingCounter(object):
+  '''
+  Counts the hits per key, every hit loses half of its weight every half_life seconds.
+  '''
+
+  def __init__(self, half_life=ACCESS_HALF_LIFE, clock=monotonic):
+    '''
+    Initializes the counter without any hits.
+    '''
+
+    self.__half_life = float(half_life)
+    self.__clock = clock
+    self.__counts = {}
+    self.__lock = Lock()
+
+  def __decayed(self, count, updated, now):
+    return count * 0.5 ** ((now - updated) / self.__half_life)
+
+  def hit(self, key, weight=1.0):
+    '''
+    Counts a hit for the key.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      now = self.__clock()
+      count, updated = self.__counts.get(key, (0.0, now))
+      self.__counts[key] = (self.__decayed(count, updated, now) + weight, now)
+    return
+
+  def score(self, key):
+    '''
+    The decayed count of the hits of the key.
+
+    :return: float
+    '''
+
+    with self.__lock:
+      count, updated = self.__counts.get(key, (0.0, 0.0))
+      return self.__decayed(count, updated, self.__clock()) if count else 0.0
+
+  def top(self, n, threshold=0.0):
+    '''
+    The n keys with the highest scores of at least threshold, best first. The keys
+    whose scores decayed to about nothing (under FORGET_SCORE) are forgotten, the
+    others keep counting whatever the threshold.
+
+    :return: list
+    '''
+
+    with self.__lock:
+      now = self.__clock()
+      scores = []
+      for key, (count, updated) in list(self.__counts.items()):
+        score = self.__decayed(count, updated, now)
+        if score < FORGET_SCORE:
+          del self.__counts[key]
+        elif score >= threshold:
+          scores.append((score, key))
+    scores.sort(key=lambda item: item[0], reverse=True)
+    return [key for _, key in scores[:n]]
+
+  def __len__(self):
+    return len(self.__counts)
+
+
+
+class PredictionPrefetcher(object):
+  '''
+  Refreshes the predictions of the most requested stops in the prediction cache of
+  the library before they expire. The calls must go through get_predictions of the
+  prefetcher to be counted.
+  '''
+
+  def __init__(self, budget=None, half_life=ACCESS_HALF_LIFE, hot_threshold=2.0, \
+    max_hot_stops=500, lead=REFRESH_LEAD, interval=1.0, clock=monotonic):
+    '''
+    Initializes the prefetcher. budget (ratelimit.RateLimiter) caps the background
+    refreshes, 2 per second by default. The stops with a score of at least
+    hot_threshold are hot, at most max_hot_stops of them are kept fresh. The
+    background thread looks for the predictions expiring within lead seconds every
+    interval seconds.
+
+    If the library has no prediction cache yet, the prefetcher sets one up. The
+    clock must be the clock of the prediction cache.
+    '''
+
+    self.__budget = RateLimiter(rate=2, burst=5) if budget is None else budget
+    self.__counter = DecayingCounter(half_life, clock)
+    self.__hot_threshold = hot_threshold
+    self.__max_hot_stops = max_hot_stops
+    self.__lead = lead
+    self.__interval = interval
+    self.__clock = clock
+    self.__stats = {'refreshed': 0, 'skipped': 0, 'errors': 0}
+    self.__lock = Lock()
+    self.__stopped = Event()
+    self.__thread = None
+
+    if actransit_apis.__PREDICTION_CACHE__ is None:
+      actransit_apis.set_prediction_cache(TTLCache(name='predictions', clock=clock))
+
+  @property
+  def stats(self):
+    '''
+    The counts of the predictions refreshed in the background, of the refreshes
+    skipped for lack of budget and of the refreshes that failed.
+
+    :return: dict
+    '''
+
+    with self.__lock:
+      return dict(self.__stats)
+
+  def get_predictions(self, stop_id):
+    '''
+    Counts the call for the stop and gets its predictions (see \
+    actransit_apis.get_predictions).
+
+    :return: list(ACTransitPrediction)
+    '''
+
+    self.__counter.hit(stop_id)
+    return actransit_apis.get_predictions(stop_id)
+
+  def hot_stops(self):
+    '''
+    The hot stops, most requested first.
+
+    :return: list(int)
+    '''
+
+    return self.__counter.top(self.__max_hot_stops, self.__hot_threshold)
+
+  def refresh_due(self):
+    '''
+    Refreshes the predictions of the hot stops that are not cached or expire within
+    lead seconds, as long as the budget allows. Returns the number of stops refreshed.
+
+    :return: int
+    '''
+
+    cache = actransit_apis.__PREDICTION_CACHE__
+    if cache is None:
+      return 0
+    refreshed = 0
+    for stop_id in self.hot_stops():
+      expires_at = cache.expires_at(stop_id)
+      if expires_at is not None and expires_at - self.__clock() > self.__lead:
+        continue
+      if not self.__budget.acquire(blocking=False):
+        with self.__lock:
+          self.__stats['skipped'] += 1
+        break
+      try:
+        actransit_apis.cache_predictions(stop_id, actransit_apis._fetch_predictions(stop_id))
+      except Exception:
+        # the stop is tried again on the next pass, the calls fetch it meanwhile
+        with self.__lock:
+          self.__stats['errors'] += 1
+        continue
+      refreshed += 1
+    with self.__lock:
+      self.__stats['refreshed'] += refreshed
+    return refreshed
+
+  def start(self):
+    '''
+    Starts refreshing the hot stops in a background (daemon) thread.
+
+    :return: None
+    '''
+
+    if self.__thread is not None:
+      return
+    self.__stopped.clear()
+    self.__thread = Thread(target=self.__run, name='actransit-prediction-prefetcher')
+    self.__thread.daemon = True
+    self.__thread.start()
+    return
+
+  def stop(self):
+    '''
+    Stops the background thread.
+
+    :return: None
+    '''
+
+    self.__stopped.set()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+    return
+
+  def __run(self):
+    while not self.__stopped.is_set():
+      self.refresh_due()
+      self.__stopped.wait(self.__interval)
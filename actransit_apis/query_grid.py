@@ -0,0 +1,86 @@
+# query_grid.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module snaps coordinates to a grid of square cells, so that the queries made
+from points close to each other share the same query (and its cached response).
+
+The cells are cell_size feet high. Every row of cells is cut in cells cell_size
+feet wide at the center of the row, so the cells stay roughly square at any
+latitude. A query of radius r from any point of a cell is answered by the query of
+radius r + half_diagonal(cell) from the center of the cell, filtered by distance.
+'''
+
+from collections import namedtuple
+from math import ceil
+from math import cos
+from math import floor
+from math import radians
+
+from trip_paths import EARTH_RADIUS_METERS
+from trip_paths import FEET_PER_METER
+from trip_paths import haversine_meters
+
+
+
+# The feet per degree of latitude.
+FEET_PER_DEGREE = radians(1.0) * EARTH_RADIUS_METERS * FEET_PER_METER
+
+# The number of decimals of the coordinates of the centers of the cells, enough for
+# a few centimeters and stable in the URLs.
+CENTER_DECIMALS = 6
+
+# A cell of the grid - its row and column, the coordinates of its center and the
+# distance in feet from the center to the farthest point of the cell.
+GridCell = namedtuple('GridCell', ['row', 'column', 'latitude', 'longitude', 'half_diagonal'])
+
+
+
+def distance_feet(latitude1, longitude1, latitude2, longitude2):
+  '''
+  The haversine distance in feet between the two points.
+
+  :return: float
+  '''
+
+  return float(haversine_meters(latitude1, longitude1, latitude2, longitude2)) * FEET_PER_METER
+
+
+
+def stops_within(latitude, longitude, stops, search_radius):
+  '''
+  The stops (ACTransitStop) within the search radius (in feet) of the point, in order.
+
+  :return: list(ACTransitStop)
+  '''
+
+  if not stops:
+    return []
+  feet = haversine_meters(latitude, longitude, [stop.latitude for stop in stops], \
+    [stop.longitude for stop in stops]) * FEET_PER_METER
+  return [stop for stop, distance in zip(stops, feet.tolist()) if distance <= search_radius]
+
+
+
+def snap_to_grid(latitude, longitude, cell_size):
+  '''
+  The cell of the grid of cell_size feet containing the point.
+
+  :return: GridCell
+  '''
+
+  lat_step = cell_size / FEET_PER_DEGREE
+  row = int(floor(latitude / lat_step))
+  center_lat = (row + 0.5) * lat_step
+  lon_step = lat_step / max(cos(radians(center_lat)), 1e-6)
+  column = int(floor(longitude / lon_step))
+  center_lon = (column + 0.5) * lon_step
+
+  # the edge of the row closer to the equator is the widest
+  south, north = row * lat_step, (row + 1) * lat_step
+  corner_lat = south if abs(south) < abs(north) else north
+  half_diagonal = distance_feet(center_lat, center_lon, corner_lat, center_lon + lon_step / 2.0)
+  return GridCell(row, column, round(center_lat, CENTER_DECIMALS), \
+    round(center_lon, CENTER_DECIMALS), int(ceil(half_diagonal)) + 1)
@@ -0,0 +1,74 @@
+# ratelimit.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the rate limiter used by the library to keep the number of
+calls made to ACTransit's APIs within their limits.
+'''
+
+from threading import Lock
+from time import monotonic
+from time import sleep
+
+
+
+class RateLimiter(object):
+  '''
+  A thread safe token bucket. Every call takes a token, the tokens are refilled at
+  `rate` tokens per second and at most `burst` tokens are kept in the bucket.
+  '''
+
+  def __init__(self, rate, burst=1, clock=monotonic):
+    '''
+    Initializes the rate limiter with a full bucket.
+    '''
+
+    self.__rate = float(rate)
+    self.__burst = float(burst)
+    self.__clock = clock
+    self.__tokens = float(burst)
+    self.__updated = clock()
+    self.__lock = Lock()
+
+  @property
+  def rate(self):
+    '''
+    The number of tokens refilled per second.
+
+    :return: float
+    '''
+
+    return self.__rate
+
+  def __take(self):
+    '''
+    Takes a token if there is one. Returns the number of seconds to wait for the
+    next token otherwise.
+    '''
+
+    with self.__lock:
+      now = self.__clock()
+      self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+      self.__updated = now
+      if self.__tokens >= 1.0:
+        self.__tokens -= 1.0
+        return 0.0
+      return (1.0 - self.__tokens) / self.__rate
+
+  def acquire(self, blocking=True):
+    '''
+    Takes a token from the bucket. When blocking, waits till a token is available,
+    otherwise returns False right away if the bucket is empty.
+
+    :return: bool
+    '''
+
+    wait = self.__take()
+    while wait > 0.0:
+      if not blocking:
+        return False
+      sleep(wait)
+      wait = self.__take()
+    return True
@@ -0,0 +1,142 @@
+# schedule_watcher.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module watches the version of ACTransit's GTFS schedule.
+
+The static data (stops, routes and trips) only changes when a new GTFS schedule
+is published, so instead of refreshing it on a timer the watcher polls the cheap
+gtfs/scheduleinfo endpoint and invalidates (or reloads) the static cache only when
+the UpdatedDate of the schedule changes.
+'''
+
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+from actransit_apis import actransit_apis
+
+
+
+# The default number of seconds between two polls of the schedule info.
+SCHEDULE_POLL_INTERVAL = 300
+
+
+
+class ScheduleWatcher(object):
+  '''
+  Polls the GTFS schedule info and invalidates the static cache (stops, routes and
+  trips) of the library when the UpdatedDate of the schedule changes.
+
+  The static cache is the one set up with actransit_apis.set_static_cache, the
+  watcher leaves the configuration of the library as it is.
+  '''
+
+  def __init__(self, interval=SCHEDULE_POLL_INTERVAL, reload=False, on_change=None):
+    '''
+    Initializes the watcher. When reload is True the static data that was cached
+    is fetched again right after an invalidation, instead of on its next use.
+    on_change is called with the new ACTransitGtfsScheduleInfo after every change.
+    '''
+
+    self.__interval = interval
+    self.__reload = reload
+    self.__on_change = on_change
+    self.__schedule_info = None
+    self.__lock = Lock()
+    self.__stopped = Event()
+    self.__thread = None
+
+  @property
+  def schedule_info(self):
+    '''
+    The schedule info seen by the last poll, None before the first poll.
+
+    :return: ACTransitGtfsScheduleInfo
+    '''
+
+    return self.__schedule_info
+
+  def check(self):
+    '''
+    Polls the schedule info once. The first poll only records the version of the
+    schedule, the following polls invalidate the static cache when the version
+    has changed.
+
+    Returns True when the schedule has changed.
+
+    :return: bool
+    '''
+
+    schedule_info = actransit_apis.get_gtfs_schedule_info()
+    with self.__lock:
+      previous = self.__schedule_info
+      self.__schedule_info = schedule_info
+      if previous is None or previous.updated_date == schedule_info.updated_date:
+        return False
+
+      cache = actransit_apis.__STATIC_CACHE__
+      cached_keys = [] if cache is None else cache.keys()
+      actransit_apis.invalidate_static_cache()
+      if self.__reload:
+        _reload(cached_keys)
+
+    if self.__on_change is not None:
+      self.__on_change(schedule_info)
+    return True
+
+  def start(self):
+    '''
+    Starts polling the schedule info in a background (daemon) thread.
+
+    :return: None
+    '''
+
+    if self.__thread is not None:
+      return
+    self.__stopped.clear()
+    self.__thread = Thread(target=self.__run, name='actransit-schedule-watcher')
+    self.__thread.daemon = True
+    self.__thread.start()
+    return
+
+  def stop(self):
+    '''
+    Stops the background thread.
+
+    :return: None
+    '''
+
+    self.__stopped.set()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+    return
+
+  def __run(self):
+    while not self.__stopped.is_set():
+      try:
+        self.check()
+      except Exception:
+        # the schedule info is polled again on the next interval, the static cache
+        # keeps serving the data of the last known schedule meanwhile
+        pass
+      self.__stopped.wait(self.__interval)
+
+
+
+def _reload(cached_keys):
+  '''
+  Fetches the static data for the keys that were cached before the invalidation.
+  '''
+
+  for key in cached_keys:
+    if key == 'stops':
+      actransit_apis.get_stops()
+    elif key == 'routes':
+      actransit_apis.get_routes()
+    elif isinstance(key, tuple) and key[0] == 'trips':
+      actransit_apis.get_trips(key[1])
+  return
@@ -0,0 +1,137 @@
+# service_notices.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module holds the active service notices of ACTransit indexed by the routes
+they impact, so that the notices impacting a route can be looked up without
+scanning all the notices.
+'''
+
+from threading import Lock
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitServiceNotice
+
+
+
+def _notice_key(json_obj):
+  '''
+  The identity of a service notice, its post date and its URL.
+  '''
+
+  return (json_obj['PostDate'], json_obj['Url'])
+
+
+
+class ServiceNoticeStore(object):
+  '''
+  Holds the active ACTransitServiceNotice objects with an inverted index from the
+  route names to the notices impacting them.
+
+  The store is refreshed incrementally, the notices are identified by their post
+  date and URL, and only the notices that were not in the store before are built.
+  '''
+
+  def __init__(self):
+    '''
+    Initializes an empty store.
+    '''
+
+    self.__notices = {}
+    self.__route_index = {}
+    self.__route_notices = {}
+    self.__lock = Lock()
+
+  def refresh(self, json_objs):
+    '''
+    Replaces the notices in the store with the notices in the JSON objects
+    (decoded to python dicts), as returned by the servicenotices endpoint.
+    Notices already in the store are kept as they are.
+
+    Returns the notices that were added and the notices that were removed.
+
+    :return: tuple(list(ACTransitServiceNotice), list(ACTransitServiceNotice))
+    '''
+
+    with self.__lock:
+      current = {}
+      added = []
+      for json_obj in json_objs:
+        key = _notice_key(json_obj)
+        if key in current:
+          continue
+        notice = self.__notices.get(key)
+        if notice is None:
+          notice = ACTransitServiceNotice(json_obj)
+          added.append((key, notice))
+        current[key] = notice
+
+      removed = [(key, notice) for key, notice in self.__notices.items() if key not in current]
+
+      touched = set()
+      for key, notice in removed:
+        for route_name in notice.impacted_routes or ():
+          self.__route_index[route_name].pop(key, None)
+          touched.add(route_name)
+      for key, notice in added:
+        for route_name in notice.impacted_routes or ():
+          self.__route_index.setdefault(route_name, {})[key] = notice
+          touched.add(route_name)
+
+      # rebuild the lookup tuples of the touched routes only
+      for route_name in touched:
+        notices = self.__route_index.get(route_name)
+        if notices:
+          self.__route_notices[route_name] = tuple(notices.values())
+        else:
+          self.__route_index.pop(route_name, None)
+          self.__route_notices.pop(route_name, None)
+
+      self.__notices = current
+
+    return [notice for _, notice in added], [notice for _, notice in removed]
+
+  def refresh_from_api(self):
+    '''
+    Refreshes the store with the service notices currently active at ACTransit.
+
+    :return: tuple(list(ACTransitServiceNotice), list(ACTransitServiceNotice))
+    '''
+
+    return self.refresh(actransit_apis.fetch_decode_json(actransit_apis._api_url('/servicenotices')))
+
+  def notices_for_route(self, route_name):
+    '''
+    The notices impacting the route.
+
+    for eg - store.notices_for_route("51B")
+
+    :return: tuple(ACTransitServiceNotice)
+    '''
+
+    return self.__route_notices.get(route_name, ())
+
+  @property
+  def route_names(self):
+    '''
+    The names of the routes impacted by at least one notice.
+
+    :return: list(str)
+    '''
+
+    return list(self.__route_notices.keys())
+
+  @property
+  def notices(self):
+    '''
+    All the notices in the store.
+
+    :return: list(ACTransitServiceNotice)
+    '''
+
+    return list(self.__notices.values())
+
+  def __len__(self):
+    return len(self.__notices)
@@ -0,0 +1,455 @@
+# shared_tables.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module shares the stop and route tables between the worker processes of a
+server through multiprocessing.shared_memory, instead of every worker holding its
+own copy of the get_stops (and get_routes) results as python objects.
+
+One loader process publishes the tables as columnar arrays with a
+SharedTablePublisher, the workers attach to them read-only with a SharedTableReader
+and get ACTransitStop (and ACTransitRoute) compatible views of the rows.
+
+Every publication is written to a new shared memory segment (<name>_<version>), and
+made current by storing its version in a small control segment (<name>). The readers
+check the control segment and move to the new segment, so that they always see a
+complete table - the swap is atomic. The previous segment is unlinked right after
+the swap, the readers still mapping it keep it alive till they move on.
+'''
+
+import json
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from threading import Lock
+
+import numpy as np
+
+
+
+STOPS = 'stops'
+ROUTES = 'routes'
+
+# The columns of the tables - (attribute of the wrapper objects, kind), the kind
+# is a NumPy dtype or 'str' for the strings. The first column is the key.
+__TABLE_COLUMNS__ = {
+  STOPS: [
+    ('stopId', 'int64'),
+    ('latitude', 'float64'),
+    ('longitude', 'float64'),
+    ('name', 'str'),
+    ('scheduled_time', 'str'),
+  ],
+  ROUTES: [
+    ('route_id', 'str'),
+    ('name', 'str'),
+    ('description', 'str'),
+  ],
+}
+
+__HEADER_SIZE__ = struct.Struct('<Q')
+__CONTROL_SIZE__ = 8
+__ALIGNMENT__ = 8
+
+# The segments created by the publishers of this process, the resource tracker is
+# per process so the readers must not unregister those.
+__PUBLISHED__ = set()
+
+
+
+def _segment_name(name, version):
+  return '{}_{}'.format(name, version)
+
+
+
+def _attach(name):
+  '''
+  Attaches to an existing shared memory segment without letting the resource
+  tracker of this process unlink it when the process exits.
+  '''
+
+  try:
+    return shared_memory.SharedMemory(name=name, track=False)
+  except TypeError:
+    segment = shared_memory.SharedMemory(name=name)
+    if name in __PUBLISHED__:
+      return segment
+    try:
+      resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+      pass
+    return segment
+
+
+
+def _aligned(offset):
+  return (offset + __ALIGNMENT__ - 1) // __ALIGNMENT__ * __ALIGNMENT__
+
+
+
+def _pack_columns(kind, objs):
+  '''
+  The arrays of the columns of the table, the string columns are stored as an utf-8
+  blob, the offsets of the strings in the blob and a mask of the missing strings.
+  '''
+
+  arrays = []
+  for attribute, column_kind in __TABLE_COLUMNS__[kind]:
+    values = [getattr(obj, attribute) for obj in objs]
+    if column_kind != 'str':
+      arrays.append((attribute, 'values', np.array(values, dtype=column_kind)))
+      continue
+    encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    arrays.append((attribute, 'offsets', offsets))
+    arrays.append((attribute, 'nulls', np.array([value is None for value in values], dtype=np.uint8)))
+    arrays.append((attribute, 'blob', np.frombuffer(b''.join(encoded), dtype=np.uint8)))
+  return arrays
+
+
+
+class SharedTablePublisher(object):
+  '''
+  Publishes versions of the stop (or route) table into shared memory, used by the
+  loader process.
+  '''
+
+  def __init__(self, name, kind=STOPS):
+    '''
+    Initializes the publisher of the table under the name, creating the control
+    segment. kind is STOPS or ROUTES.
+    '''
+
+    if kind not in __TABLE_COLUMNS__:
+      raise ValueError('Unknown table kind {}'.format(repr(kind)))
+    self.__name = name
+    self.__kind = kind
+    self.__version = 0
+    self.__segment = None
+    self.__lock = Lock()
+    self.__control = shared_memory.SharedMemory(name=name, create=True, size=__CONTROL_SIZE__)
+    __PUBLISHED__.add(name)
+    self.__control.buf[:__CONTROL_SIZE__] = bytes(__CONTROL_SIZE__)
+
+  @property
+  def version(self):
+    '''
+    The version of the table currently published, 0 before the first publication.
+
+    :return: int
+    '''
+
+    return self.__version
+
+  def publish(self, objs):
+    '''
+    Publishes the ACTransitStop (or ACTransitRoute) objects as the new version of
+    the table, the rows are sorted on their key.
+
+    :return: int (the version published)
+    '''
+
+    key = __TABLE_COLUMNS__[self.__kind][0][0]
+    objs = sorted(objs, key=lambda obj: getattr(obj, key))
+    arrays = _pack_columns(self.__kind, objs)
+
+    with self.__lock:
+      version = self.__version + 1
+      layout = []
+      offset = 0
+      for attribute, part, array in arrays:
+        layout.append({'column': attribute, 'part': part, 'dtype': array.dtype.str, \
+          'offset': offset, 'count': len(array)})
+        offset = _aligned(offset + array.nbytes)
+      header = json.dumps({'kind': self.__kind, 'version': version, 'rows': len(objs), \
+        'columns': layout}).encode('utf-8')
+      data_start = _aligned(__HEADER_SIZE__.size + len(header))
+
+      segment = shared_memory.SharedMemory(name=_segment_name(self.__name, version), \
+        create=True, size=max(1, data_start + offset))
+      __PUBLISHED__.add(segment.name)
+      __HEADER_SIZE__.pack_into(segment.buf, 0, len(header))
+      segment.buf[__HEADER_SIZE__.size:__HEADER_SIZE__.size + len(header)] = header
+      for (attribute, part, array), spec in zip(arrays, layout):
+        start = data_start + spec['offset']
+        segment.buf[start:start + array.nbytes] = array.tobytes()
+
+      # the swap, the readers see the new version only once it is complete
+      np.frombuffer(self.__control.buf, dtype=np.uint64, count=1)[0] = version
+      previous = self.__segment
+      self.__segment = segment
+      self.__version = version
+      if previous is not None:
+        previous.close()
+        previous.unlink()
+        __PUBLISHED__.discard(previous.name)
+    return version
+
+  def close(self):
+    '''
+    Unlinks the table and the control segment, the readers still attached keep
+    their current version.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      if self.__segment is not None:
+        self.__segment.close()
+        self.__segment.unlink()
+        __PUBLISHED__.discard(self.__segment.name)
+        self.__segment = None
+      if self.__control is not None:
+        self.__control.close()
+        self.__control.unlink()
+        __PUBLISHED__.discard(self.__control.name)
+        self.__control = None
+    return
+
+
+
+class _SharedTable(object):
+  '''
+  One version of a table mapped from shared memory, read-only.
+  '''
+
+  def __init__(self, segment):
+    # the arrays go before the segment when the table is freed, the segment can
+    # only be unmapped once nothing references its buffer
+    self.columns = {}
+    self.segment = segment
+    header_size, = __HEADER_SIZE__.unpack_from(segment.buf, 0)
+    header = json.loads(bytes(segment.buf[__HEADER_SIZE__.size:__HEADER_SIZE__.size + header_size]))
+    data_start = _aligned(__HEADER_SIZE__.size + header_size)
+    self.kind = header['kind']
+    self.version = header['version']
+    self.rows = header['rows']
+    # the arrays are mapped through a read-only view of the segment, so they can
+    # not be made writeable again
+    buffer = segment.buf.toreadonly()
+    for spec in header['columns']:
+      self.columns[(spec['column'], spec['part'])] = np.frombuffer(buffer, \
+        dtype=np.dtype(spec['dtype']), count=spec['count'], offset=data_start + spec['offset'])
+    self.key_column = __TABLE_COLUMNS__[self.kind][0]
+
+  def value(self, attribute, row):
+    values = self.columns.get((attribute, 'values'))
+    if values is not None:
+      return values[row].item()
+    if self.columns[(attribute, 'nulls')][row]:
+      return None
+    offsets = self.columns[(attribute, 'offsets')]
+    return self.columns[(attribute, 'blob')][offsets[row]:offsets[row + 1]].tobytes().decode('utf-8')
+
+  def find(self, key):
+    attribute, kind = self.key_column
+    if kind == 'str':
+      # binary search over the sorted string keys
+      low, high = 0, self.rows
+      while low < high:
+        middle = (low + high) // 2
+        if self.value(attribute, middle) < key:
+          low = middle + 1
+        else:
+          high = middle
+    else:
+      values = self.columns[(attribute, 'values')]
+      low = int(np.searchsorted(values, key))
+    if low < self.rows and self.value(attribute, low) == key:
+      return low
+    return -1
+
+  def release(self):
+    try:
+      self.segment.close()
+    except BufferError:
+      # the arrays (or views of the rows still in use) reference the mapping, it
+      # is unmapped once they are garbage collected
+      pass
+
+
+
+class SharedStop(object):
+  '''
+  ACTransitStop compatible read-only view of a row of a shared stop table.
+  '''
+
+  __slots__ = ('__table', '__row')
+
+  def __init__(self, table, row):
+    self.__table = table
+    self.__row = row
+
+  @property
+  def stopId(self):
+    return self.__table.value('stopId', self.__row)
+
+  @property
+  def name(self):
+    return self.__table.value('name', self.__row)
+
+  @property
+  def latitude(self):
+    return self.__table.value('latitude', self.__row)
+
+  @property
+  def longitude(self):
+    return self.__table.value('longitude', self.__row)
+
+  @property
+  def scheduled_time(self):
+    return self.__table.value('scheduled_time', self.__row)
+
+  def __repr__(self):
+    return 'SharedStop({})'.format(repr({'StopId': self.stopId, 'Name': self.name, \
+      'Latitude': self.latitude, 'Longitude': self.longitude, \
+      'ScheduledTime': self.scheduled_time}))
+
+
+
+class SharedRoute(object):
+  '''
+  ACTransitRoute compatible read-only view of a row of a shared route table.
+  '''
+
+  __slots__ = ('__table', '__row')
+
+  def __init__(self, table, row):
+    self.__table = table
+    self.__row = row
+
+  @property
+  def route_id(self):
+    return self.__table.value('route_id', self.__row)
+
+  @property
+  def name(self):
+    return self.__table.value('name', self.__row)
+
+  @property
+  def description(self):
+    return self.__table.value('description', self.__row)
+
+  def __repr__(self):
+    return 'SharedRoute({})'.format(repr({'RouteId': self.route_id, 'Name': self.name, \
+      'Description': self.description}))
+
+
+
+__VIEWS__ = {
+  STOPS: SharedStop,
+  ROUTES: SharedRoute,
+}
+
+
+
+class SharedTableReader(object):
+  '''
+  Attaches read-only to a table published by a SharedTablePublisher, used by the
+  worker processes. Moves to the new version of the table on refresh().
+  '''
+
+  def __init__(self, name):
+    '''
+    Attaches to the control segment of the table under the name.
+    '''
+
+    self.__name = name
+    self.__control = _attach(name)
+    self.__version_cell = np.frombuffer(self.__control.buf.toreadonly(), dtype=np.uint64, count=1)
+    self.__table = None
+    self.__lock = Lock()
+    self.refresh()
+
+  @property
+  def version(self):
+    '''
+    The version of the table this reader is attached to, 0 when nothing is published yet.
+
+    :return: int
+    '''
+
+    return 0 if self.__table is None else self.__table.version
+
+  def refresh(self):
+    '''
+    Attaches to the latest version of the table if it has changed.
+    Returns True when the reader has moved to a new version.
+
+    :return: bool
+    '''
+
+    with self.__lock:
+      while True:
+        version = int(self.__version_cell[0])
+        if version == 0 or version == self.version:
+          return False
+        try:
+          segment = _attach(_segment_name(self.__name, version))
+        except FileNotFoundError:
+          # the version was replaced meanwhile, read the control segment again
+          continue
+        previous = self.__table
+        self.__table = _SharedTable(segment)
+        if previous is not None:
+          previous.release()
+        return True
+
+  def __view(self, row):
+    return __VIEWS__[self.__table.kind](self.__table, row)
+
+  def rows(self):
+    '''
+    The views of all the rows of the table, sorted on their key (stopId or route_id).
+
+    :return: list(SharedStop) or list(SharedRoute)
+    '''
+
+    if self.__table is None:
+      return []
+    return [self.__view(row) for row in range(self.__table.rows)]
+
+  def find(self, key):
+    '''
+    The view of the row with the key (stopId or route_id), None when there is no such row.
+
+    :return: SharedStop or SharedRoute
+    '''
+
+    if self.__table is None:
+      return None
+    row = self.__table.find(key)
+    return None if row < 0 else self.__view(row)
+
+  def column(self, attribute):
+    '''
+    The read-only array of a numeric column (stopId, latitude or longitude of the stops).
+
+    :return: numpy.ndarray
+    '''
+
+    return self.__table.columns[(attribute, 'values')]
+
+  def __len__(self):
+    return 0 if self.__table is None else self.__table.rows
+
+  def close(self):
+    '''
+    Detaches from the table.
+
+    :return: None
+    '''
+
+    with self.__lock:
+      if self.__table is not None:
+        self.__table.release()
+        self.__table = None
+      self.__version_cell = None
+      try:
+        self.__control.close()
+      except BufferError:
+        pass
+    return
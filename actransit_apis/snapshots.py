@@ -0,0 +1,75 @@
+# snapshots.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module diffs the snapshots of the wrapper objects - two consecutive results of
+get_predictions, two polls of the vehicle positions, ... - so that only the deltas
+need to be pushed to the clients.
+
+The objects of the snapshots are matched on their natural identity (key(), for eg -
+(StopId, TripId) for the predictions) and compared on all their fields, in linear
+time.
+'''
+
+from collections import namedtuple
+
+
+
+# The difference between two snapshots - the objects added and removed, and the
+# (old, new) pairs of the objects whose fields have changed.
+SnapshotDiff = namedtuple('SnapshotDiff', ['added', 'removed', 'changed'])
+
+
+
+def _by_key(snapshot):
+  objs = {}
+  for obj in snapshot:
+    objs[(type(obj), obj.key())] = obj
+  return objs
+
+
+
+def diff_snapshots(old, new):
+  '''
+  The difference between the old and the new snapshots (lists of wrapper objects).
+  When a snapshot holds several objects with the same identity, the last one counts.
+
+  The added, removed and changed objects are in the order of the snapshots.
+
+  :return: SnapshotDiff
+  '''
+
+  old_objs = _by_key(old)
+  new_objs = _by_key(new)
+
+  added = []
+  changed = []
+  for key, obj in new_objs.items():
+    previous = old_objs.get(key)
+    if previous is None:
+      added.append(obj)
+    elif previous != obj:
+      changed.append((previous, obj))
+  removed = [obj for key, obj in old_objs.items() if key not in new_objs]
+  return SnapshotDiff(added, removed, changed)
+
+
+
+def apply_diff(snapshot, diff):
+  '''
+  Applies the diff to the snapshot, the result holds the same objects as the new
+  snapshot the diff was made from (in a different order).
+
+  :return: list
+  '''
+
+  objs = _by_key(snapshot)
+  for obj in diff.removed:
+    objs.pop((type(obj), obj.key()), None)
+  for _, obj in diff.changed:
+    objs[(type(obj), obj.key())] = obj
+  for obj in diff.added:
+    objs[(type(obj), obj.key())] = obj
+  return list(objs.values())
@@ -0,0 +1,82 @@
+# timeutils.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module contains the utilities for parsing the date and time strings used by
+ACTransit's APIs into numbers that can be stored in arrays.
+
+ACTransit sends dates like "2017-02-14T09:15:53.5418487-08:00" (7 digits for the
+fraction of the second and an UTC offset), or "2017-01-11T17:31:00" without an offset,
+and durations like "00:00:00.1234567" (.NET TimeSpan format).
+'''
+
+import re
+from calendar import timegm
+
+
+
+__DATETIME_PATTERN__ = re.compile(\
+  r'^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$')
+
+__DURATION_PATTERN__ = re.compile(\
+  r'^(-)?(?:(\d+)\.)?(\d+):(\d{2}):(\d{2})(?:\.(\d+))?$')
+
+
+
+def parse_timestamp(datestr):
+  '''
+  Parses the date string sent by ACTransit into seconds since the epoch.
+  Dates with an UTC offset are converted to UTC, dates without an offset are
+  taken as they are, as if they were in UTC.
+
+  Returns None when the datestr is None.
+
+  for eg - "2017-02-14T09:15:53.5418487-08:00" -> 1487092553.5418487
+
+  :return: float
+  '''
+
+  if datestr is None:
+    return None
+
+  match = __DATETIME_PATTERN__.match(datestr)
+  if match is None:
+    raise ValueError('Invalid ACTransit date string: {}'.format(repr(datestr)))
+
+  year, month, day, hour, minute, second, fraction, offset = match.groups()
+  seconds = timegm((int(year), int(month), int(day), int(hour), int(minute), int(second)))
+  if fraction:
+    seconds += int(fraction) / (10.0 ** len(fraction))
+  if offset and offset != 'Z':
+    sign = -1 if offset[0] == '-' else 1
+    offset = offset[1:].replace(':', '')
+    seconds -= sign * (int(offset[:2]) * 3600 + int(offset[2:]) * 60)
+  return seconds
+
+
+
+def parse_duration(timestr):
+  '''
+  Parses the duration string sent by ACTransit (TimeSpan format) into seconds.
+
+  Returns None when the timestr is None.
+
+  for eg - "00:12:30.5000000" -> 750.5
+
+  :return: float
+  '''
+
+  if timestr is None:
+    return None
+
+  match = __DURATION_PATTERN__.match(timestr)
+  if match is None:
+    raise ValueError('Invalid ACTransit duration string: {}'.format(repr(timestr)))
+
+  negative, days, hours, minutes, seconds, fraction = match.groups()
+  duration = int(days or 0) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+  if fraction:
+    duration += int(fraction) / (10.0 ** len(fraction))
+  return -duration if negative else float(duration)
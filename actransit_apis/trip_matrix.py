@@ -0,0 +1,213 @@
+# trip_matrix.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module builds origin-destination matrices of ACTransitTripEstimate values.
+
+The estimates for the distinct (origin, destination) stop pairs are fetched
+concurrently, within the rate limits, and cached by (route, origin, destination)
+for a short time so that the journey planners asking for overlapping matrices do
+not fetch the same estimates again.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from actransit_apis import actransit_apis
+from caching import TTLCache
+from ratelimit import RateLimiter
+from timeutils import parse_duration
+from timeutils import parse_timestamp
+
+
+
+# The trip estimates change with the traffic, so they are only cached for a short time.
+TRIP_ESTIMATE_TTL = 30
+
+# The cache shared by all the matrices, keyed by (route, origin, destination).
+__TRIP_ESTIMATE_CACHE__ = TTLCache(ttl=TRIP_ESTIMATE_TTL, name='trip_estimates')
+
+# The rate limiter shared by all the matrices, in calls per second.
+__TRIP_ESTIMATE_RATE_LIMITER__ = RateLimiter(rate=10, burst=10)
+
+
+
+class TripEstimateMatrix(object):
+  '''
+  Dense matrix of the trip estimates between the origin stops (rows) and the
+  destination stops (columns) of a route.
+
+  The expected departure times are in seconds since the epoch and the trip
+  durations are in seconds, pairs without an estimate are NaN.
+  '''
+
+  def __init__(self, route_name, origin_stop_ids, destination_stop_ids, estimates, errors):
+    '''
+    Initializes the matrix from the estimates fetched for the (origin, destination) pairs.
+    '''
+
+    self.__route_name = route_name
+    self.__origin_stop_ids = list(origin_stop_ids)
+    self.__destination_stop_ids = list(destination_stop_ids)
+    self.__estimates = estimates
+    self.__errors = errors
+
+    shape = (len(self.__origin_stop_ids), len(self.__destination_stop_ids))
+    self.__departure_times = np.full(shape, np.nan)
+    self.__trip_durations = np.full(shape, np.nan)
+    for row, origin in enumerate(self.__origin_stop_ids):
+      for column, destination in enumerate(self.__destination_stop_ids):
+        estimate = estimates.get((origin, destination))
+        if estimate is None:
+          continue
+        departure_time = parse_timestamp(estimate.expected_departure_time)
+        trip_duration = parse_duration(estimate.trip_duration)
+        self.__departure_times[row, column] = np.nan if departure_time is None else departure_time
+        self.__trip_durations[row, column] = np.nan if trip_duration is None else trip_duration
+
+  @property
+  def route_name(self):
+    '''
+    The name of the route of the estimates.
+
+    :return: str
+    '''
+
+    return self.__route_name
+
+  @property
+  def origin_stop_ids(self):
+    '''
+    The stop IDs of the rows of the matrix.
+
+    :return: list(int)
+    '''
+
+    return self.__origin_stop_ids
+
+  @property
+  def destination_stop_ids(self):
+    '''
+    The stop IDs of the columns of the matrix.
+
+    :return: list(int)
+    '''
+
+    return self.__destination_stop_ids
+
+  @property
+  def departure_times(self):
+    '''
+    The expected departure times from the origin stops, in seconds since the epoch.
+
+    :return: numpy.ndarray
+    '''
+
+    return self.__departure_times
+
+  @property
+  def trip_durations(self):
+    '''
+    The trip durations between the origin and destination stops, in seconds.
+
+    :return: numpy.ndarray
+    '''
+
+    return self.__trip_durations
+
+  @property
+  def errors(self):
+    '''
+    The exceptions raised while fetching the estimates, keyed by (origin, destination).
+
+    :return: dict
+    '''
+
+    return self.__errors
+
+  def estimate(self, origin_stop_id, destination_stop_id):
+    '''
+    The trip estimate between the stops, None if there is no estimate.
+
+    :return: ACTransitTripEstimate
+    '''
+
+    return self.__estimates.get((origin_stop_id, destination_stop_id))
+
+  def __repr__(self):
+    '''
+    called by the repr()
+
+    :return: str
+    '''
+
+    return 'TripEstimateMatrix({}, {} x {})'.format(repr(self.__route_name), \
+      len(self.__origin_stop_ids), len(self.__destination_stop_ids))
+
+
+
+def _unique(stop_ids):
+  '''
+  The stop IDs without the duplicates, in the order they were given.
+  '''
+
+  seen = set()
+  return [stop_id for stop_id in stop_ids if not (stop_id in seen or seen.add(stop_id))]
+
+
+
+def get_trip_estimate_matrix(route_name, origin_stop_ids, destination_stop_ids, \
+  max_workers=8, rate_limiter=None, cache=None):
+  '''
+  Retrieve the trip estimates of the route between every origin and every \
+  destination stop.
+
+  The stop IDs are deduplicated, the pairs with the same origin and destination are
+  skipped and the remaining pairs are fetched concurrently by at most max_workers
+  threads, all of them taking their turn from the rate limiter. The estimates are
+  cached by (route, origin, destination).
+
+  :return: TripEstimateMatrix
+  '''
+
+  global __TRIP_ESTIMATE_CACHE__, __TRIP_ESTIMATE_RATE_LIMITER__
+
+  rate_limiter = __TRIP_ESTIMATE_RATE_LIMITER__ if rate_limiter is None else rate_limiter
+  cache = __TRIP_ESTIMATE_CACHE__ if cache is None else cache
+
+  origin_stop_ids = _unique(origin_stop_ids)
+  destination_stop_ids = _unique(destination_stop_ids)
+
+  estimates = {}
+  errors = {}
+  missing = []
+  for origin in origin_stop_ids:
+    for destination in destination_stop_ids:
+      if origin == destination:
+        continue
+      cached = cache.get((route_name, origin, destination), missing)
+      if cached is missing:
+        missing.append((origin, destination))
+      else:
+        estimates[(origin, destination)] = cached
+
+  def fetch(pair):
+    rate_limiter.acquire()
+    return actransit_apis.get_trip_estimate(route_name, pair[0], pair[1])
+
+  if missing:
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+      futures = [(pair, executor.submit(fetch, pair)) for pair in missing]
+      for pair, future in futures:
+        try:
+          estimate = future.result()
+        except Exception as error:
+          errors[pair] = error
+          continue
+        cache.put((route_name, pair[0], pair[1]), estimate)
+        estimates[pair] = estimate
+
+  return TripEstimateMatrix(route_name, origin_stop_ids, destination_stop_ids, estimates, errors)
@@ -0,0 +1,286 @@
+# trip_paths.py
+# -*- coding: utf-8 -*-
+
+
+
+'''
+This module holds the path (ordered TimePoints) of the trips run by ACTransit.
+
+The ACTransitTimePoint objects returned by the APIs are loose objects, this module
+groups them by their trip, orders them by their sequence and keeps the coordinates
+of every trip as sorted arrays so that the positions of a lot of vehicles can be
+projected onto their trip paths in one go, without looping over the vehicles in Python.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from history import NULL_ID
+
+
+
+# Mean radius of the earth in meters, used for the local flat-earth projection.
+EARTH_RADIUS_METERS = 6371008.8
+
+# Feet in a meter, the APIs measure the search radius in feet.
+FEET_PER_METER = 3.28084
+
+
+
+# TripProgress
+# The result of projecting vehicles onto their trip paths, every field is
+# an array with one entry per projected vehicle.
+TripProgress = namedtuple('TripProgress', ['fraction', 'distance_to_next', 'next_sequence'])
+
+
+
+class TripPathStore(object):
+  '''
+  Stores the path of each trip as sorted coordinate arrays.
+
+  The timepoints of a trip are sorted by their sequence, and the coordinates
+  of all the trips are packed together in flat arrays so that the projection
+  of the vehicles can be vectorized.
+  '''
+
+  def __init__(self, timepoints=None):
+    '''
+    Initializes the store, optionally with an iterable of ACTransitTimePoint objects.
+    '''
+
+    self.__paths = {}
+    self.__packed = None
+    if timepoints is not None:
+      self.add_timepoints(timepoints)
+
+  def add_timepoints(self, timepoints):
+    '''
+    Adds the ACTransitTimePoint objects to the store. The timepoints are grouped by
+    their trip_id and the path of every trip present in the input replaces the path
+    already stored for that trip.
+
+    :return: None
+    '''
+
+    grouped = {}
+    for timepoint in timepoints:
+      grouped.setdefault(timepoint.trip_id, []).append(\
+        (timepoint.sequence, timepoint.latitude, timepoint.longitude))
+
+    for trip_id, points in grouped.items():
+      points.sort()
+      self.__paths[trip_id] = (\
+        np.array([point[0] for point in points], dtype=np.int64), \
+        np.array([point[1] for point in points], dtype=np.float64), \
+        np.array([point[2] for point in points], dtype=np.float64))
+
+    self.__packed = None
+    return
+
+  def remove_trip(self, trip_id):
+    '''
+    Removes the path of the trip from the store.
+
+    :return: None
+    '''
+
+    if self.__paths.pop(trip_id, None) is not None:
+      self.__packed = None
+    return
+
+  @property
+  def trip_ids(self):
+    '''
+    The IDs of the trips whose paths are in the store.
+
+    :return: list(int)
+    '''
+
+    return list(self.__paths.keys())
+
+  def path(self, trip_id):
+    '''
+    The path of the trip, as the sequences, latitudes and longitudes of its
+    timepoints sorted by their sequence.
+
+    :return: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    '''
+
+    return self.__paths[trip_id]
+
+  def path_length(self, trip_id):
+    '''
+    The length of the path of the trip in meters.
+
+    :return: float
+    '''
+
+    _, latitudes, longitudes = self.__paths[trip_id]
+    return float(_segment_lengths(latitudes, longitudes).sum())
+
+  def __contains__(self, trip_id):
+    return trip_id in self.__paths
+
+  def __len__(self):
+    return len(self.__paths)
+
+  def __pack(self):
+    '''
+    Packs the paths of all the trips into flat arrays, indexed by the offset of
+    each trip. The packed arrays are cached till the store is modified.
+    '''
+
+    if self.__packed is not None:
+      return self.__packed
+
+    trip_keys = np.array(sorted(self.__paths.keys()), dtype=np.int64)
+    sequences, latitudes, longitudes, cumulative = [], [], [], []
+    counts = np.zeros(len(trip_keys), dtype=np.int64)
+    for index, trip_id in enumerate(trip_keys.tolist()):
+      trip_sequences, trip_latitudes, trip_longitudes = self.__paths[trip_id]
+      sequences.append(trip_sequences)
+      latitudes.append(trip_latitudes)
+      longitudes.append(trip_longitudes)
+      cumulative.append(np.concatenate(\
+        ([0.0], np.cumsum(_segment_lengths(trip_latitudes, trip_longitudes)))))
+      counts[index] = len(trip_sequences)
+
+    offsets = np.zeros(len(trip_keys), dtype=np.int64)
+    if len(counts) > 0:
+      offsets[1:] = np.cumsum(counts)[:-1]
+
+    def concat(arrays, dtype):
+      return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    self.__packed = (trip_keys, offsets, counts, \
+      concat(sequences, np.int64), concat(latitudes, np.float64), \
+      concat(longitudes, np.float64), concat(cumulative, np.float64))
+    return self.__packed
+
+  def project(self, vehicles):
+    '''
+    Projects the positions of the ACTransitVehicle objects onto the paths of the
+    trips they are currently servicing. The vehicles out of service (without a
+    current trip) are projected as on an unknown trip.
+
+    See `project_positions` for the result.
+
+    :return: TripProgress
+    '''
+
+    vehicles = list(vehicles)
+    trip_ids = np.fromiter((NULL_ID if vehicle.current_trip_id is None else vehicle.current_trip_id \
+      for vehicle in vehicles), dtype=np.int64, count=len(vehicles))
+    latitudes = np.array([vehicle.latitude for vehicle in vehicles], dtype=np.float64)
+    longitudes = np.array([vehicle.longitude for vehicle in vehicles], dtype=np.float64)
+    return self.project_positions(trip_ids, latitudes, longitudes)
+
+  def project_positions(self, trip_ids, latitudes, longitudes):
+    '''
+    Projects the positions given as arrays of trip IDs, latitudes and longitudes
+    onto the paths of the trips.
+
+    For every position the result holds the fraction of the trip path travelled
+    (between 0.0 and 1.0), the distance in meters along the path to the next
+    timepoint and the sequence of that next timepoint. Positions whose trip is
+    not in the store get NaN fractions and distances and a next sequence of -1.
+
+    :return: TripProgress
+    '''
+
+    trip_ids = np.asarray(trip_ids, dtype=np.int64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+
+    size = len(trip_ids)
+    fraction = np.full(size, np.nan)
+    distance_to_next = np.full(size, np.nan)
+    next_sequence = np.full(size, -1, dtype=np.int64)
+
+    trip_keys, offsets, counts, sequences, path_lats, path_lons, cumulative = self.__pack()
+    if size == 0 or len(trip_keys) == 0:
+      return TripProgress(fraction, distance_to_next, next_sequence)
+
+    # look up the packed path of each position
+    path_index = np.searchsorted(trip_keys, trip_ids)
+    path_index[path_index >= len(trip_keys)] = 0
+    found = trip_keys[path_index] == trip_ids
+    positions = np.nonzero(found)[0]
+    if len(positions) == 0:
+      return TripProgress(fraction, distance_to_next, next_sequence)
+    path_index = path_index[positions]
+
+    # expand every position into one row per segment of its path, a path with a
+    # single timepoint is treated as one segment of zero length
+    segment_counts = np.maximum(counts[path_index] - 1, 1)
+    rows = np.repeat(np.arange(len(positions)), segment_counts)
+    row_starts = np.cumsum(segment_counts) - segment_counts
+    segment_offset = np.arange(len(rows)) - np.repeat(row_starts, segment_counts)
+    start = offsets[path_index][rows] + segment_offset
+    last = (offsets[path_index] + counts[path_index] - 1)[rows]
+    end = np.minimum(start + 1, last)
+
+    # project onto the segments in a flat plane centered on each position
+    origin_lat = np.radians(latitudes[positions])[rows]
+    origin_lon = np.radians(longitudes[positions])[rows]
+    scale_x = np.cos(origin_lat) * EARTH_RADIUS_METERS
+    ax = (np.radians(path_lons[start]) - origin_lon) * scale_x
+    ay = (np.radians(path_lats[start]) - origin_lat) * EARTH_RADIUS_METERS
+    dx = (np.radians(path_lons[end]) - origin_lon) * scale_x - ax
+    dy = (np.radians(path_lats[end]) - origin_lat) * EARTH_RADIUS_METERS - ay
+    squared_length = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+      t = np.where(squared_length > 0.0, -(ax * dx + ay * dy) / squared_length, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    cx = ax + t * dx
+    cy = ay + t * dy
+    squared_distance = cx * cx + cy * cy
+
+    # the closest segment for every position, the rows are grouped by position
+    # so the first row after sorting on (position, distance) is the closest one
+    order = np.lexsort((squared_distance, rows))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = rows[order][1:] != rows[order][:-1]
+    best = order[first]
+
+    best_start = start[best]
+    best_end = end[best]
+    best_t = t[best]
+    segment_length = cumulative[best_end] - cumulative[best_start]
+    travelled = cumulative[best_start] + best_t * segment_length
+    total = cumulative[last[best]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+      fraction[positions] = np.where(total > 0.0, travelled / total, 0.0)
+    distance_to_next[positions] = (1.0 - best_t) * segment_length
+    next_sequence[positions] = sequences[best_end]
+    return TripProgress(fraction, distance_to_next, next_sequence)
+
+
+
+def haversine_meters(latitudes1, longitudes1, latitudes2, longitudes2):
+  '''
+  The haversine distances in meters between the points, element wise (arrays or
+  scalars).
+
+  :return: numpy.ndarray
+  '''
+
+  lat1 = np.radians(latitudes1)
+  lat2 = np.radians(latitudes2)
+  dlon = np.radians(np.subtract(longitudes2, longitudes1))
+  a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+  return 2.0 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+
+def _segment_lengths(latitudes, longitudes):
+  '''
+  The haversine lengths in meters of the segments between consecutive coordinates.
+
+  :return: numpy.ndarray
+  '''
+
+  latitudes = np.asarray(latitudes)
+  longitudes = np.asarray(longitudes)
+  return haversine_meters(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
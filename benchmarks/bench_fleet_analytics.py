@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_fleet_analytics
+----------------------------------
+
+Benchmark of the per-poll fleet analytics - the speed estimates of FleetSpeedTracker
+and the bunching detection, on synthetic polls of the whole fleet.
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_fleet_analytics.py [vehicles] [routes]
+"""
+
+
+import sys
+import time
+
+import numpy as np
+
+from fleet_analytics import FleetSpeedTracker
+from fleet_analytics import detect_bunching
+
+
+def make_poll(rng, vehicles, time_offset, previous=None):
+    if previous is None:
+        latitude = 37.8 + rng.uniform(-0.1, 0.1, vehicles)
+        longitude = -122.27 + rng.uniform(-0.1, 0.1, vehicles)
+    else:
+        latitude = previous['latitude'] + rng.normal(0, 0.0005, vehicles)
+        longitude = previous['longitude'] + rng.normal(0, 0.0005, vehicles)
+    return {
+        'time_last_reported': np.full(vehicles, 1487000000 + time_offset, dtype=np.int64),
+        'vehicle_id': np.arange(1000, 1000 + vehicles, dtype=np.int64),
+        'trip_id': np.arange(vehicles, dtype=np.int64),
+        'latitude': latitude,
+        'longitude': longitude,
+        'heading': rng.integers(0, 360, vehicles),
+    }
+
+
+def main():
+    vehicles = int(sys.argv[1]) if len(sys.argv) > 1 else 700
+    routes = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    rng = np.random.default_rng(42)
+    route_codes = rng.integers(0, routes, vehicles).astype(np.int32)
+    tracker = FleetSpeedTracker()
+    poll = make_poll(rng, vehicles, 0)
+    tracker.update(poll)
+
+    polls = 200
+    speed_time = bunching_time = 0.0
+    bunched = 0
+    for index in range(1, polls + 1):
+        poll = make_poll(rng, vehicles, index * 15, poll)
+        start = time.perf_counter()
+        estimates = tracker.update(poll)
+        speed_time += time.perf_counter() - start
+        start = time.perf_counter()
+        bunched += len(detect_bunching(poll, route_codes, estimates.speed).headway)
+        bunching_time += time.perf_counter() - start
+
+    print('{} vehicles on {} routes, {} polls'.format(vehicles, routes, polls))
+    print('speeds   {:>8.3f} ms/poll'.format(speed_time * 1000 / polls))
+    print('bunching {:>8.3f} ms/poll ({:.1f} bunched pairs/poll)'.format(
+        bunching_time * 1000 / polls, bunched / float(polls)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_gtfs_ingest
+----------------------------------
+
+Benchmark for the ingestion of the GTFS feed into the columnar stores.
+
+Ingests the GTFS zip given on the command line (e.g. AC Transit's google_transit.zip),
+or a synthetic feed of about the same size when no path is given, and reports the
+time taken and the memory held by the feed.
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_gtfs_ingest.py [gtfs.zip]
+"""
+
+
+import io
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+
+from gtfs_feed import GtfsFeed
+
+
+def make_feed(stops=5500, routes=150, trips=25000, stops_per_trip=45):
+    random.seed(42)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('stops.txt', 'stop_id,stop_code,stop_name,stop_lat,stop_lon\n' + ''.join(
+            '{0},{1},Stop {0}:Main St,{2:.7f},{3:.7f}\n'.format(
+                stop, 50000 + stop, 37.6 + random.random() * 0.4, -122.4 + random.random() * 0.4)
+            for stop in range(stops)))
+        archive.writestr('routes.txt', 'route_id,route_short_name,route_long_name\n' + ''.join(
+            '{0}-141,{0},Route {0}\n'.format(route) for route in range(routes)))
+        archive.writestr('trips.txt', 'route_id,service_id,trip_id,trip_headsign,direction_id\n' + ''.join(
+            '{}-141,WKDY,{},Downtown,{}\n'.format(trip % routes, 5000000 + trip, trip % 2)
+            for trip in range(trips)))
+        lines = ['trip_id,arrival_time,departure_time,stop_id,stop_sequence,timepoint\n']
+        for trip in range(trips):
+            start = random.randrange(5 * 3600, 23 * 3600)
+            for sequence in range(stops_per_trip):
+                departure = start + sequence * 90
+                clock = '{:02d}:{:02d}:{:02d}'.format(
+                    departure // 3600, (departure // 60) % 60, departure % 60)
+                lines.append('{},{},{},{},{},{}\n'.format(
+                    5000000 + trip, clock, clock, random.randrange(stops), sequence + 1,
+                    int(sequence % 5 == 0)))
+        archive.writestr('stop_times.txt', ''.join(lines))
+    buffer.seek(0)
+    return buffer
+
+
+def main(path):
+    source = path if path else make_feed()
+    started = time.perf_counter()
+    feed = GtfsFeed.from_zip(source)
+    elapsed = time.perf_counter() - started
+    if not path:
+        source.seek(0)
+    tracemalloc.start()
+    feed = GtfsFeed.from_zip(source)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('feed:          {}'.format(path if path else 'synthetic'))
+    print('stops:         {}'.format(feed.stop_count))
+    print('trips:         {}'.format(feed.trip_count))
+    print('stop times:    {}'.format(feed.stop_time_count))
+    print('ingest:        {:.2f} s ({:.0f} stop times/s)'.format(
+        elapsed, feed.stop_time_count / elapsed))
+    print('memory:        {:.1f} MiB held, {:.1f} MiB peak'.format(
+        current / 2.0 ** 20, peak / 2.0 ** 20))
+    started = time.perf_counter()
+    stops = feed.stops()
+    print('stops():       {:.3f} s for {} ACTransitStop'.format(
+        time.perf_counter() - started, len(stops)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
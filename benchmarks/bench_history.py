@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_history
+----------------------------------
+
+Benchmark for the prediction history log.
+
+Records synthetic polls of predictions and compares the size on disk with JSON
+lines, then measures a full scan and a time range scan of the log.
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_history.py [rows]
+"""
+
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from api_classes import ACTransitPrediction
+from history import HistoryReader
+from history import HistoryRecorder
+from timeutils import parse_timestamp
+
+
+ROUTES = ['1', '1R', '6', '12', '18', '19', '51A', '51B', '52', '72', '72M', '72R', 'NL', 'O', 'F']
+
+
+def make_predictions(rows):
+    random.seed(42)
+    for row in range(rows):
+        # one poll of ~200 predictions every 30 seconds
+        polled = 1484150400 + (row // 200) * 30
+        clock = time.gmtime(polled)
+        departure = time.gmtime(polled + random.randrange(60, 3600) // 60 * 60)
+        yield ACTransitPrediction({
+            'StopId': 50000 + random.randrange(5000),
+            'TripId': 5000000 + random.randrange(20000),
+            'VehicleId': 1000 + random.randrange(600),
+            'RouteName': random.choice(ROUTES),
+            'PredictedDelayInSeconds': random.randrange(-120, 900),
+            'PredictedDeparture': time.strftime('%Y-%m-%dT%H:%M:%S', departure),
+            'PredictionDateTime': time.strftime('%Y-%m-%dT%H:%M:%S', clock),
+        })
+
+
+def main(rows):
+    directory = tempfile.mkdtemp()
+    log_path = os.path.join(directory, 'history.log')
+    json_path = os.path.join(directory, 'history.jsonl')
+
+    started = time.perf_counter()
+    with HistoryRecorder(log_path) as recorder, open(json_path, 'w') as json_lines:
+        for prediction in make_predictions(rows):
+            recorder.record_predictions([prediction])
+            json_lines.write(json.dumps(prediction.__json__) + '\n')
+    elapsed = time.perf_counter() - started
+
+    log_size = os.path.getsize(log_path)
+    json_size = os.path.getsize(json_path)
+    print('rows:          {}'.format(rows))
+    print('json lines:    {:.1f} MiB ({:.1f} bytes/row)'.format(json_size / 2.0 ** 20, json_size / rows))
+    print('history log:   {:.1f} MiB ({:.1f} bytes/row, {:.0f}x smaller)'.format(
+        log_size / 2.0 ** 20, log_size / rows, json_size / float(log_size)))
+    print('record+json:   {:.2f} s'.format(elapsed))
+
+    reader = HistoryReader(log_path)
+    started = time.perf_counter()
+    scanned = len(reader.read_predictions()['stop_id'])
+    elapsed = time.perf_counter() - started
+    print('full scan:     {:.3f} s ({:.1f} M rows/s)'.format(elapsed, scanned / elapsed / 1e6))
+
+    start = parse_timestamp('2017-01-11T16:00:00')
+    started = time.perf_counter()
+    scanned = len(reader.read_predictions(start, start + 3600)['stop_id'])
+    print('1 hour scan:   {:.3f} s ({} rows)'.format(time.perf_counter() - started, scanned))
+
+    os.remove(log_path)
+    os.remove(json_path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
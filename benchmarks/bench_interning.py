@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_interning
+----------------------------------
+
+Memory benchmark for the interning of the low cardinality strings while decoding.
+
+Decodes a synthetic predictions payload with and without interning, builds the
+ACTransitPrediction objects and reports the memory held by them (tracemalloc).
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_interning.py [rows]
+"""
+
+
+import random
+import sys
+import tracemalloc
+from json import JSONDecoder
+from json import dumps
+
+from api_classes import ACTransitPrediction
+from interning import intern_fields
+
+
+ROUTES = ['1', '1R', '6', '12', '18', '19', '51A', '51B', '52', '72', '72M', '72R', 'NL', 'O', 'F']
+
+
+def make_payload(rows):
+    random.seed(42)
+    return dumps([{
+        'StopId': 50000 + random.randrange(5000),
+        'TripId': 5000000 + random.randrange(20000),
+        'VehicleId': 1000 + random.randrange(600),
+        'RouteName': random.choice(ROUTES),
+        'PredictedDelayInSeconds': random.randrange(-120, 900),
+        'PredictedDeparture': '2017-01-11T{:02d}:{:02d}:00'.format(
+            random.randrange(5, 24), random.randrange(60)),
+        'PredictionDateTime': '2017-01-11T17:{:02d}:{:02d}'.format(
+            random.randrange(10, 15), random.randrange(60)),
+    } for _ in range(rows)])
+
+
+def measure(payload, object_hook):
+    tracemalloc.start()
+    json_obj = JSONDecoder(object_hook=object_hook).decode(payload)
+    predictions = [ACTransitPrediction(obj) for obj in json_obj]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del predictions
+    return current
+
+
+def main(rows):
+    payload = make_payload(rows)
+    plain = measure(payload, None)
+    interned = measure(payload, intern_fields)
+    print('rows:          {}'.format(rows))
+    print('plain:         {:.1f} MiB ({:.0f} bytes/row)'.format(plain / 2.0 ** 20, plain / rows))
+    print('interned:      {:.1f} MiB ({:.0f} bytes/row)'.format(interned / 2.0 ** 20, interned / rows))
+    print('saving:        {:.1f}%'.format(100.0 * (plain - interned) / plain))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
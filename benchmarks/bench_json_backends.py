@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_json_backends
+----------------------------------
+
+Benchmark of the JSON decoding backends on a /stops/ sized payload.
+
+Compares the original decoding (str copy of the body, then the stdlib JSONDecoder)
+with every installed backend, with and without the interning of the strings.
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_json_backends.py [stops]
+"""
+
+
+import random
+import sys
+import timeit
+from json import JSONDecoder
+from json import dumps
+
+from json_backends import available_backends
+from json_backends import get_backend
+
+
+def make_stops_payload(stops):
+    random.seed(42)
+    return dumps([{
+        'StopId': 50000 + stop,
+        'Name': '{} St:{} Av'.format(random.choice(['3rd', 'Broadway', 'Telegraph', 'College']),
+                                     random.choice(['Santa Clara', 'Ashby', 'Alcatraz'])),
+        'Latitude': 37.6 + random.random() * 0.4,
+        'Longitude': -122.4 + random.random() * 0.4,
+        'ScheduledTime': None,
+    } for stop in range(stops)]).encode('utf-8')
+
+
+def best_of(function, number=20):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main(stops):
+    payload = make_stops_payload(stops)
+    print('payload:       {} stops, {:.0f} KiB'.format(stops, len(payload) / 1024.0))
+
+    decoder = JSONDecoder()
+    baseline = best_of(lambda: decoder.decode(str(payload, encoding='utf-8')))
+    print('{:<24} {:8.2f} ms'.format('str + JSONDecoder', baseline * 1000))
+    for name in available_backends():
+        backend = get_backend(name)
+        for intern in (False, True):
+            elapsed = best_of(lambda: backend.decode(payload, intern))
+            label = '{}{}'.format(name, ' (interned)' if intern else '')
+            print('{:<24} {:8.2f} ms  {:5.2f}x'.format(label, elapsed * 1000, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5500)
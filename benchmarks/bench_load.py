@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_load
+----------------------------------
+
+Load-generation harness measuring the throughput of the client against its concurrency.
+
+Starts a stand-in for ACTransit's APIs in a separate process, serving synthetic
+/stops/ and /stops/{id}/predictions responses after a sampled latency (constant,
+exponential or lognormal) and failing a given share of the requests with a 500.
+Then drives get_predictions (or get_stops) from a growing number of threads, and
+reports for every thread count the requests per second, the p50/p95/p99 latency,
+the error rate and the CPU time of the client per request.
+
+The client's CPU is measured with time.process_time, the stand-in server runs in
+its own process so it is not counted.
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_load.py \\
+  [--endpoint predictions|stops] [--threads 1,2,4,8,16,32] [--duration 5] \\
+  [--latency-ms 50] [--latency-distribution constant|exponential|lognormal] \\
+  [--error-rate 0.01]
+"""
+
+
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+from actransit_apis import actransit_apis
+
+
+PREDICTIONS_PATH = re.compile(r'^/stops/(\d+)/predictions')
+
+
+def sample_latency(distribution, mean):
+    if distribution == 'constant':
+        return mean
+    if distribution == 'exponential':
+        return random.expovariate(1.0 / mean) if mean > 0 else 0.0
+    # lognormal with the given mean and a sigma of 0.5
+    sigma = 0.5
+    return random.lognormvariate(np.log(mean) - sigma * sigma / 2, sigma) if mean > 0 else 0.0
+
+
+def make_handler(latency, distribution, error_rate, stops):
+    stops_body = json.dumps([{
+        'StopId': 50000 + stop, 'Name': 'Stop {}'.format(stop), 'Latitude': 37.8,
+        'Longitude': -122.27, 'ScheduledTime': None} for stop in range(stops)]).encode('utf-8')
+
+    class StandInHandler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(sample_latency(distribution, latency))
+            if random.random() < error_rate:
+                body, status = b'{"Message": "An error has occurred."}', 500
+            elif PREDICTIONS_PATH.match(self.path):
+                stop_id = int(PREDICTIONS_PATH.match(self.path).group(1))
+                body, status = json.dumps([{
+                    'StopId': stop_id, 'TripId': 5155418 + trip, 'VehicleId': 5021, 'RouteName': '51B',
+                    'PredictedDelayInSeconds': 60, 'PredictedDeparture': '2017-01-11T17:31:00',
+                    'PredictionDateTime': '2017-01-11T17:10:41'} for trip in range(8)]).encode('utf-8'), 200
+            else:
+                body, status = stops_body, 200
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StandInHandler
+
+
+def run_stand_in(port_queue, latency, distribution, error_rate, stops):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(latency, distribution, error_rate, stops))
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def drive(call, threads, duration):
+    '''
+    Calls call() from the threads for duration seconds. Returns the latencies of the
+    calls, the number of errors, the elapsed wall time and the CPU time of the process.
+    '''
+
+    latencies = [[] for _ in range(threads)]
+    errors = [0] * threads
+    stop = threading.Event()
+
+    def worker(index):
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                call()
+            except Exception:
+                errors[index] += 1
+            latencies[index].append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return np.concatenate([np.array(samples) for samples in latencies]), sum(errors), wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the client against a stand-in server')
+    parser.add_argument('--endpoint', choices=('predictions', 'stops'), default='predictions')
+    parser.add_argument('--threads', default='1,2,4,8,16,32')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per thread count')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='mean latency of the stand-in')
+    parser.add_argument('--latency-distribution', choices=('constant', 'exponential', 'lognormal'),
+                        default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--stops', type=int, default=5500, help='size of the /stops/ response')
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=run_stand_in, daemon=True, args=(
+        port_queue, args.latency_ms / 1000.0, args.latency_distribution, args.error_rate, args.stops))
+    server.start()
+    actransit_apis.set_base_url('http://127.0.0.1:{}'.format(port_queue.get(timeout=10)))
+    actransit_apis.set_api_key('load-test')
+
+    if args.endpoint == 'predictions':
+        call = lambda: actransit_apis.get_predictions(50000 + random.randrange(5000))
+    else:
+        call = actransit_apis.get_stops
+
+    print('{} against a {} {:.0f} ms stand-in, {:.1%} errors, {:.0f} s per step'.format(
+        args.endpoint, args.latency_distribution, args.latency_ms, args.error_rate, args.duration))
+    print('{:>7} {:>9} {:>9} {:>9} {:>9} {:>8} {:>12}'.format(
+        'threads', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors', 'CPU ms/req'))
+    try:
+        for threads in [int(count) for count in args.threads.split(',')]:
+            latencies, errors, wall, cpu = drive(call, threads, args.duration)
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) * 1000
+            print('{:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>7.2%} {:>12.3f}'.format(
+                threads, len(latencies) / wall, p50, p95, p99, errors / float(len(latencies)),
+                cpu * 1000 / len(latencies)))
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
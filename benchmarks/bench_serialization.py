@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_serialization
+----------------------------------
+
+Round-trip benchmark of the serialization of lists of ACTransitPrediction objects.
+
+Compares the default pickling of the wrapper objects (their __dict__ - the JSON
+object plus every attribute extracted from it), the tuple based pickling
+(ACTransitObject.__reduce__) and the batch codec (with and without compression).
+
+Run with - PYTHONPATH=.:actransit_apis python benchmarks/bench_serialization.py [rows]
+"""
+
+
+import pickle
+import random
+import sys
+import time
+
+from api_classes import ACTransitPrediction
+from batch_codec import decode_batch
+from batch_codec import encode_batch
+
+
+ROUTES = ['1', '1R', '6', '12', '18', '19', '51A', '51B', '52', '72', '72M', '72R', 'NL', 'O', 'F']
+
+
+def make_predictions(rows):
+    random.seed(42)
+    return [ACTransitPrediction({
+        'StopId': 50000 + random.randrange(5000),
+        'TripId': 5000000 + random.randrange(20000),
+        'VehicleId': 1000 + random.randrange(600),
+        'RouteName': random.choice(ROUTES),
+        'PredictedDelayInSeconds': random.randrange(-120, 900),
+        'PredictedDeparture': '2017-01-11T{:02d}:{:02d}:00'.format(
+            random.randrange(5, 24), random.randrange(60)),
+        'PredictionDateTime': '2017-01-11T17:{:02d}:{:02d}'.format(
+            random.randrange(10, 15), random.randrange(60)),
+    }) for _ in range(rows)]
+
+
+def dict_dumps(objs):
+    # what pickle stored before ACTransitObject.__reduce__
+    return pickle.dumps([(type(obj), obj.__dict__) for obj in objs], pickle.HIGHEST_PROTOCOL)
+
+
+def dict_loads(data):
+    objs = []
+    for cls, state in pickle.loads(data):
+        obj = cls.__new__(cls)
+        obj.__dict__.update(state)
+        objs.append(obj)
+    return objs
+
+
+def measure(name, dumps, loads, objs, repeat=3):
+    best_dumps = best_loads = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = dumps(objs)
+        best_dumps = min(best_dumps, time.perf_counter() - start)
+        start = time.perf_counter()
+        loaded = loads(data)
+        best_loads = min(best_loads, time.perf_counter() - start)
+    assert [obj.to_tuple() for obj in loaded] == [obj.to_tuple() for obj in objs]
+    print('{:<24} {:>10.1f} bytes/row {:>8.0f} ms dumps {:>8.0f} ms loads {:>10.0f} rows/s round-trip'
+          .format(name, len(data) / len(objs), best_dumps * 1000, best_loads * 1000,
+                  len(objs) / (best_dumps + best_loads)))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    predictions = make_predictions(rows)
+    print('{} predictions'.format(rows))
+    measure('pickle (__dict__)', dict_dumps, dict_loads, predictions)
+    measure('pickle (__reduce__)', lambda objs: pickle.dumps(objs, pickle.HIGHEST_PROTOCOL),
+            pickle.loads, predictions)
+    measure('batch codec', encode_batch, decode_batch, predictions)
+    measure('batch codec (zlib 1)', lambda objs: encode_batch(objs, compression_level=1),
+            decode_batch, predictions)
+
+
+if __name__ == '__main__':
+    main()
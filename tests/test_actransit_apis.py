@@ -11,6 +11,7 @@ Tests for `actransit_apis` module.
 
 import sys
 import unittest
+from unittest import mock
 
 from actransit_apis import actransit_apis
 
@@ -26,3 +27,20 @@ class TestActransit_apis(unittest.TestCase):
 
     def test_000_something(self):
         pass
+
+    def test_001_urls(self):
+        actransit_apis.set_base_url('http://gateway/transit/')
+        actransit_apis.set_api_key('key')
+        self.addCleanup(actransit_apis.set_base_url, None)
+        self.addCleanup(actransit_apis.set_api_key, None)
+        with mock.patch.object(actransit_apis, 'fetch_decode_json', return_value=[]) as fetch:
+            actransit_apis._fetch_stops()
+            actransit_apis.get_active_stops_type2(37.8, -122.27, '51B', 300)
+            actransit_apis.get_predictions(58123)
+            actransit_apis.get_trip_estimate('51B', 1, 2)
+        self.assertEqual([call[0][0] for call in fetch.call_args_list], [
+            'http://gateway/transit/stops/?token=key',
+            'http://gateway/transit/stops/37.8/-122.27?distance=300&routeName=51B&token=key',
+            'http://gateway/transit/stops/58123/predictions?token=key',
+            'http://gateway/transit/route/51B/tripestimate?fromStopId=1&toStopId=2&token=key',
+        ])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_batch_codec
+----------------------------------
+
+Tests for the serialization of the wrapper classes and the `batch_codec` module.
+"""
+
+
+import pickle
+import unittest
+
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitServiceNotice
+from api_classes import ACTransitStop
+from api_classes import ACTransitTrip
+from batch_codec import decode_batch
+from batch_codec import encode_batch
+
+
+PREDICTIONS = [ACTransitPrediction({
+    'StopId': 56707, 'TripId': 5155418 + trip, 'VehicleId': None, 'RouteName': '19',
+    'PredictedDelayInSeconds': 540, 'PredictedDeparture': '2017-01-11T17:31:00',
+    'PredictionDateTime': '2017-01-11T17:10:41', 'Extra': 'not a field'}) for trip in range(3)]
+
+NOTICE = ACTransitServiceNotice({'PostDate': '2017-02-13T00:57:45.0014771-08:00', 'Title': 'Detour',
+                                 'NoticeText': 'text', 'Url': 'http://x', 'ImpactedRoutes': ['19', '51B']})
+
+
+class TestBatchCodec(unittest.TestCase):
+
+    def test_000_dicts_and_pickling(self):
+        prediction = PREDICTIONS[0]
+        self.assertNotIn('Extra', prediction.to_dict())
+        self.assertEqual(ACTransitPrediction.from_dict(prediction.to_dict()).to_tuple(), prediction.to_tuple())
+        for obj in (prediction, NOTICE, ACTransitTrip({'TripId': 1, 'RouteName': '51B', 'ScheduleType': 5,
+                                                       'StartTime': None, 'Direction': 'Northbound'})):
+            copy = pickle.loads(pickle.dumps(obj))
+            self.assertIs(type(copy), type(obj))
+            self.assertEqual(copy.to_dict(), obj.to_dict())
+        self.assertLess(len(pickle.dumps(PREDICTIONS)), len(pickle.dumps([p.__dict__ for p in PREDICTIONS])))
+
+    def test_001_batches(self):
+        for compression_level in (None, 6):
+            decoded = decode_batch(encode_batch(PREDICTIONS, compression_level=compression_level))
+            self.assertEqual([p.tripId for p in decoded], [5155418, 5155419, 5155420])
+            self.assertEqual(decoded[0].to_dict(), PREDICTIONS[0].to_dict())
+        self.assertEqual(decode_batch(encode_batch([NOTICE]))[0].impacted_routes, ['19', '51B'])
+        self.assertEqual(decode_batch(encode_batch([], ACTransitStop)), [])
+        self.assertRaises(ValueError, encode_batch, [])
+        self.assertRaises(ValueError, encode_batch, PREDICTIONS + [NOTICE])
+        self.assertRaises(ValueError, decode_batch, b'not a batch at all')
+
+    def test_002_corrupted_batches(self):
+        for compression_level in (None, 6):
+            data = encode_batch(PREDICTIONS, compression_level=compression_level)
+            for size in range(len(data)):
+                with self.assertRaises(ValueError):
+                    decode_batch(data[:size])
+            garbled = bytearray(data)
+            for index in range(len(data) - 8, len(data)):
+                garbled[index] ^= 0x5a
+            with self.assertRaises(ValueError):
+                decode_batch(bytes(garbled))
+        # the string columns are stored once per distinct value
+        self.assertEqual(encode_batch(PREDICTIONS).count(b'"19"'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_compression
+----------------------------------
+
+Tests for `compression` module and the compressed transfer of `fetch_decode_json`.
+"""
+
+
+import gzip
+import json
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+
+from actransit_apis import actransit_apis
+from compression import accept_encoding
+from compression import decompressor
+
+
+STOPS = [{'StopId': 58123 + stop, 'Name': '3rd St:Santa Clara Av', 'Latitude': 37.77,
+          'Longitude': -122.28, 'ScheduledTime': None} for stop in range(2000)]
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StopsHandler(BaseHTTPRequestHandler):
+
+    encodings = []
+
+    def do_GET(self):
+        body = json.dumps(STOPS).encode('utf-8')
+        accepted = self.headers.get('Accept-Encoding', '')
+        StopsHandler.encodings.append(accepted)
+        self.send_response(200)
+        if 'gzip' in accepted:
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_000_decompressors(self):
+        data = json.dumps(STOPS).encode('utf-8')
+        for encoding, body in (('gzip', gzip.compress(data)), ('deflate', zlib.compress(data)),
+                               ('deflate', raw_deflate(data)), (None, data)):
+            body_decompressor = decompressor(encoding)
+            chunks = [body_decompressor.decompress(body[start:start + 1000])
+                      for start in range(0, len(body), 1000)]
+            self.assertEqual(b''.join(chunks) + body_decompressor.flush(), data)
+        self.assertRaises(ValueError, decompressor, 'compress')
+
+    def test_001_fetch_decode_json_gzip(self):
+        server = HTTPServer(('127.0.0.1', 0), StopsHandler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:{}/stops/'.format(server.server_address[1])
+            self.assertEqual(actransit_apis.fetch_decode_json(url), STOPS)
+        finally:
+            thread.join()
+            server.server_close()
+        self.assertEqual(StopsHandler.encodings, [accept_encoding()])
+
+
+if __name__ == '__main__':
+    unittest.main()
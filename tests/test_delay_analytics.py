@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_delay_analytics
+----------------------------------
+
+Tests for `delay_analytics` module.
+"""
+
+
+import unittest
+
+import numpy as np
+
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitTripScheduleType
+from delay_analytics import columns_from_predictions
+from delay_analytics import delay_percentiles
+from delay_analytics import rolling_delay
+from delay_analytics import schedule_types
+from history import NULL_TIME
+from timeutils import parse_timestamp
+
+
+def prediction(route_name, stop_id, departure, delay):
+    return ACTransitPrediction({
+        'StopId': stop_id, 'TripId': 1, 'VehicleId': 1, 'RouteName': route_name,
+        'PredictedDelayInSeconds': delay, 'PredictedDeparture': departure,
+        'PredictionDateTime': departure})
+
+
+class TestDelayAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        # 2017-01-11 was a Wednesday, 2017-01-14 a Saturday
+        self.columns = columns_from_predictions([
+            prediction('51B', 1, '2017-01-11T08:10:00', 60),
+            prediction('51B', 1, '2017-01-11T08:20:00', 120),
+            prediction('51B', 2, '2017-01-11T08:30:00', 180),
+            prediction('51B', 2, '2017-01-11T09:10:00', 240),
+            prediction('19', 1, '2017-01-14T08:10:00', 0),
+            prediction('19', 1, '2017-01-14T08:50:00', 30),
+        ])
+
+    def test_000_schedule_types(self):
+        days = [parse_timestamp('2017-01-{}T12:00:00'.format(day)) for day in (13, 14, 15, 16)]
+        self.assertEqual(schedule_types(days, holidays=[days[3]]).tolist(), [0, 5, 6, 6])
+
+    def test_001_percentiles_by_route(self):
+        stats = delay_percentiles(self.columns, by=('route',), percentiles=(50, 100))
+        self.assertEqual(sorted(stats['route'].tolist()), ['19', '51B'])
+        by_route = dict(zip(stats['route'], zip(stats['count'], stats['p50'], stats['p100'],
+                                                stats['mean'])))
+        self.assertEqual(by_route['51B'], (4, 150.0, 240.0, 150.0))
+        self.assertEqual(by_route['19'], (2, 15.0, 30.0, 15.0))
+
+    def test_002_group_by_several_columns(self):
+        stats = delay_percentiles(self.columns, by=('route', 'hour', 'schedule_type'))
+        rows = sorted(zip(stats['route'], stats['hour'], stats['schedule_type'], stats['count']))
+        self.assertEqual(rows, [('19', 8, ACTransitTripScheduleType.SATURDAY.value, 2),
+                                ('51B', 8, 0, 3), ('51B', 9, 0, 1)])
+        stats = delay_percentiles(self.columns, by=('stop',))
+        self.assertEqual(stats['stop'].tolist(), [1, 2])
+        self.assertEqual(stats['max'].tolist(), [120, 240])
+
+    def test_003_rolling_mean(self):
+        rolling = rolling_delay(self.columns, 1200, by=('route',), time_column='predicted_departure')
+        mask = rolling['route'] == '51B'
+        self.assertEqual(rolling['rolling_count'][mask].tolist(), [1, 2, 3, 1])
+        self.assertEqual(rolling['rolling_mean'][mask].tolist(), [60, 90, 120, 240])
+
+    def test_004_unknown_group(self):
+        self.assertRaises(ValueError, delay_percentiles, self.columns, ('vehicle',))
+        self.assertEqual(len(delay_percentiles(
+            {'predicted_delay': np.zeros(0), 'route_code': np.zeros(0, dtype=np.int32),
+             'route_names': []})['count']), 0)
+
+    def test_005_missing_departures(self):
+        columns = columns_from_predictions([
+            prediction('51B', 1, '2017-01-11T08:10:00', 60),
+            prediction('51B', 1, None, 600),
+        ])
+        self.assertEqual(columns['predicted_departure'][1], NULL_TIME)
+        self.assertEqual(columns['prediction_time'][0], parse_timestamp('2017-01-11T08:10:00'))
+        stats = delay_percentiles(columns, by=('route', 'hour', 'schedule_type'))
+        self.assertEqual(list(zip(stats['hour'], stats['count'])), [(8, 1)])
+        self.assertEqual(delay_percentiles(columns)['count'].tolist(), [2])
+        rolling = rolling_delay(columns, 600)
+        self.assertEqual(rolling['rolling_count'].tolist(), [1])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
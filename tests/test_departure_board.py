@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_departure_board
+----------------------------------
+
+Tests for `departure_board` module.
+"""
+
+
+import unittest
+from unittest import mock
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitPrediction
+from departure_board import DepartureBoard
+
+
+def prediction(stop_id, minute, trip_id=1):
+    return ACTransitPrediction({
+        'StopId': stop_id, 'TripId': trip_id, 'VehicleId': 1, 'RouteName': '51B',
+        'PredictedDelayInSeconds': 0,
+        'PredictedDeparture': None if minute is None else '2017-01-11T17:{:02d}:00'.format(minute),
+        'PredictionDateTime': '2017-01-11T17:00:00'})
+
+
+def departures(predictions):
+    return [(p.stopId, p.predicted_departure[-5:-3] if p.predicted_departure else None)
+            for p in predictions]
+
+
+class TestDepartureBoard(unittest.TestCase):
+
+    def setUp(self):
+        self.board = DepartureBoard()
+        self.board.update_stop(1, [prediction(1, 30), prediction(1, 10)])
+        self.board.update_stop(2, [prediction(2, 20), prediction(2, None)])
+
+    def test_000_merged_order(self):
+        self.assertEqual(departures(self.board.top(3)), [(1, '10'), (2, '20'), (1, '30')])
+        self.assertEqual(departures(self.board.top(10))[-1], (2, None))
+        self.assertEqual(len(self.board), 4)
+
+    def test_001_update_replaces_only_the_stop(self):
+        self.board.update_stop(1, [prediction(1, 25)])
+        self.assertEqual(departures(self.board.top(10)), [(2, '20'), (1, '25'), (2, None)])
+        self.board.remove_stop(2)
+        self.assertEqual(departures(self.board.top(10)), [(1, '25')])
+        self.assertEqual(self.board.stop_ids, [1])
+        self.board.update_stop(2, [])
+        self.assertEqual(departures(self.board.top(10)), [(1, '25')])
+
+    def test_002_compaction(self):
+        for minute in range(200):
+            self.board.update_stop(1, [prediction(1, minute % 60, trip) for trip in range(5)])
+        self.assertEqual(len(self.board), 7)
+        self.assertEqual(len(self.board.top(100)), 7)
+
+    @mock.patch.object(actransit_apis, 'get_predictions')
+    def test_003_refresh(self, get_predictions):
+        get_predictions.side_effect = lambda stop_id: [prediction(stop_id, 5)]
+        self.board.refresh()
+        self.assertEqual(departures(self.board.top(2)), [(1, '05'), (2, '05')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_diagnostics
+----------------------------------
+
+Tests for `diagnostics` module, and the memory budgets of the wrapper classes.
+"""
+
+
+import unittest
+
+from api_classes import ACTransitGtfsScheduleInfo
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitRoute
+from api_classes import ACTransitServiceNotice
+from api_classes import ACTransitStop
+from api_classes import ACTransitTimePoint
+from api_classes import ACTransitTrip
+from api_classes import ACTransitTripEstimate
+from api_classes import ACTransitVehicle
+from caching import TTLCache
+from diagnostics import MemoryBudgetError
+from diagnostics import check_budgets
+from diagnostics import deep_size
+from diagnostics import format_report
+from diagnostics import memory_report
+
+
+SAMPLES = {
+    ACTransitStop: {'StopId': 58123, 'Name': '3rd St:Santa Clara Av', 'Latitude': 37.7732681,
+                    'Longitude': -122.2882275, 'ScheduledTime': None},
+    ACTransitPrediction: {'StopId': 56707, 'TripId': 5155418, 'VehicleId': 5021, 'RouteName': '19',
+                          'PredictedDelayInSeconds': 540, 'PredictedDeparture': '2017-01-11T17:31:00',
+                          'PredictionDateTime': '2017-01-11T17:10:41'},
+    ACTransitVehicle: {'VehicleId': 1, 'CurrentTripId': 2, 'Latitude': 1.0, 'Longitude': 1.0, 'Heading': 1,
+                       'TimeLastReported': '2017-02-12T18:42:34.7670857-08:00'},
+    ACTransitGtfsScheduleInfo: {'UpdatedDate': '2017-02-13T11:19:49.9671828-08:00',
+                                'EarliestServiceDate': '2017-02-13T11:19:49.9671828-08:00',
+                                'LatestServiceDate': '2017-02-13T11:19:49.9671828-08:00'},
+    ACTransitServiceNotice: {'PostDate': '2017-02-13T00:57:45.0014771-08:00', 'Title': 'sample str 1',
+                             'NoticeText': 'sample str 2', 'Url': 'sample str 3', 'ImpactedRoutes': ['19']},
+    ACTransitRoute: {'RouteId': '51B', 'Name': '51B', 'Description': 'Rockridge BART'},
+    ACTransitTrip: {'TripId': 1, 'RouteName': '51B', 'ScheduleType': 0,
+                    'StartTime': '2017-02-12T19:59:08.7349044-08:00', 'Direction': 'Northbound'},
+    ACTransitTimePoint: {'TripId': 1, 'Sequence': 2, 'Latitude': 1.0, 'Longitude': 1.0},
+    ACTransitTripEstimate: {'RouteName': '51B', 'OriginStopId': 2, 'DestinationStopId': 3,
+                            'ExpectedDepartureTime': '2017-02-14T09:15:53.5418487-08:00',
+                            'TripDuration': '00:00:00.1234567', 'VehicleId': 1},
+}
+
+# The bytes per wrapper object, on top of its JSON object. Raise a budget only
+# when an object really needs to hold more.
+BUDGETS = dict((cls, 200) for cls in SAMPLES)
+
+
+class TestDiagnostics(unittest.TestCase):
+
+    def test_000_report(self):
+        stops = [ACTransitStop(dict(SAMPLES[ACTransitStop])) for _ in range(10)]
+        cache = TTLCache(name='test_cache')
+        cache.put('stops', stops)
+        report = memory_report()
+        self.assertGreaterEqual(report['classes']['ACTransitStop']['count'], 10)
+        self.assertGreater(report['classes']['ACTransitStop']['bytes'], deep_size(stops[0]))
+        self.assertEqual(report['caches']['test_cache']['entries'], 1)
+        self.assertIn('test_cache', format_report(report))
+
+    def test_001_memory_budgets(self):
+        samples = dict((cls, [dict(json_obj) for _ in range(1000)]) for cls, json_obj in SAMPLES.items())
+        sizes = check_budgets(BUDGETS, samples)
+        self.assertEqual(set(sizes), set(SAMPLES))
+        self.assertRaises(MemoryBudgetError, check_budgets, {ACTransitStop: 10}, samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_disk_cache
+----------------------------------
+
+Tests for `disk_cache` module and the response cache of `fetch_decode_json`.
+"""
+
+
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from actransit_apis import actransit_apis
+from disk_cache import DiskCache
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def put_in_worker(path, worker):
+    cache = DiskCache(path)
+    for index in range(50):
+        cache.put('{}/{}'.format(worker, index), b'x' * 100)
+
+
+class FakeResponse(io.BytesIO):
+
+    headers = {}
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        actransit_apis.set_response_cache(None)
+        shutil.rmtree(self.directory)
+
+    def test_000_ttl(self):
+        cache = DiskCache(self.path, ttl=10, clock=self.clock)
+        cache.put('stops', b'[1, 2]')
+        cache.put('trips/51B', b'forever', ttl=1000)
+        self.assertEqual(cache.get('stops'), b'[1, 2]')
+        self.assertEqual(cache.expires_at('stops'), 1010.0)
+        self.clock.now += 10
+        self.assertIsNone(cache.get('stops'))
+        self.assertNotIn('stops', cache)
+        self.assertIn('trips/51B', cache)
+        # shared through the file
+        self.assertEqual(DiskCache(self.path, clock=self.clock).keys(), ['trips/51B'])
+        cache.invalidate('trips/51B')
+        self.assertEqual(len(cache), 0)
+        # only raw bytes under text keys, nothing is pickled
+        self.assertRaises(TypeError, cache.put, 'stops', [1, 2])
+        self.assertRaises(TypeError, cache.put, ('trips', '51B'), b'x')
+
+    def test_001_size_bounded_eviction(self):
+        cache = DiskCache(self.path, max_bytes=1000, clock=self.clock)
+        for index in range(5):
+            self.clock.now += 1
+            cache.put(str(index), b'x' * 300)
+        self.clock.now += 1
+        cache.get('2')
+        self.clock.now += 1
+        cache.put('5', b'x' * 300)
+        self.assertEqual(sorted(cache.keys()), ['2', '4', '5'])
+        # the running total follows the replaced, expired, invalidated and evicted entries
+        cache.put('2', b'x' * 100, ttl=1)
+        self.assertEqual(cache.size, 700)
+        self.clock.now += 1
+        self.assertIsNone(cache.get('2'))
+        cache.invalidate('4')
+        self.assertEqual(cache.size, 300)
+        self.assertEqual(DiskCache(self.path).size, 300)
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+
+    def test_002_concurrent_processes(self):
+        context = multiprocessing.get_context('fork')
+        DiskCache(self.path)
+        workers = [context.Process(target=put_in_worker, args=(self.path, worker)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(len(DiskCache(self.path)), 200)
+
+    def test_003_response_cache(self):
+        actransit_apis.set_response_cache(DiskCache(self.path, ttl=60),
+                                          ttl=lambda url: 0 if '/predictions' in url else None)
+        with mock.patch.object(actransit_apis, 'urlopen',
+                               side_effect=lambda request: FakeResponse(b'[{"StopId": 1}]')) as urlopen:
+            self.assertEqual(actransit_apis.fetch_decode_json('http://x/stops/?token=a'), [{'StopId': 1}])
+            self.assertEqual(actransit_apis.fetch_decode_json('http://x/stops/?token=b'), [{'StopId': 1}])
+            self.assertEqual(urlopen.call_count, 1)
+            actransit_apis.fetch_decode_json('http://x/stops/1/predictions?token=a')
+            actransit_apis.fetch_decode_json('http://x/stops/1/predictions?token=a')
+            self.assertEqual(urlopen.call_count, 3)
+        self.assertEqual(DiskCache(self.path).keys(), ['http://x/stops/'])
+
+    def test_005_endpoint_ttls(self):
+        # a cache whose entries never expire, the responses expire as per their endpoint
+        cache = DiskCache(self.path, clock=self.clock)
+        actransit_apis.set_response_cache(cache)
+        with mock.patch.object(actransit_apis, 'urlopen', side_effect=lambda request: FakeResponse(b'[]')):
+            for path in ('stops/', 'stops/1/predictions', 'route/51B/tripestimate', 'routes', 'vehicle/1'):
+                actransit_apis.fetch_decode_json('http://x/{}?token=a'.format(path))
+        self.assertEqual(cache.expires_at('http://x/stops/'), self.clock.now + actransit_apis.STATIC_TTL)
+        self.assertEqual(cache.expires_at('http://x/stops/1/predictions'),
+                         self.clock.now + actransit_apis.PREDICTIONS_TTL)
+        self.assertEqual(cache.expires_at('http://x/route/51B/tripestimate'),
+                         self.clock.now + actransit_apis.TRIP_ESTIMATE_TTL)
+        # the URLs of unknown endpoints are not cached
+        self.assertEqual(sorted(cache.keys()), ['http://x/route/51B/tripestimate', 'http://x/routes',
+                                                'http://x/stops/', 'http://x/stops/1/predictions'])
+        self.clock.now += actransit_apis.PREDICTIONS_TTL
+        self.assertIsNone(cache.get('http://x/stops/1/predictions'))
+
+    def test_004_home_directory(self):
+        with mock.patch.dict(os.environ, {'HOME': self.directory}):
+            cache = DiskCache('~/home.db')
+        self.assertEqual(cache.path, os.path.join(self.directory, 'home.db'))
+        cache.put('stops', b'[]')
+        self.assertTrue(os.path.exists(cache.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_export
+----------------------------------
+
+Tests for `export` module.
+"""
+
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from urllib.error import URLError
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitStop
+from export import CSV
+from export import PREDICTION_FIELDS
+from export import RecordWriter
+from export import history_records
+from export import main
+from export import stop_records
+from export import watch_predictions
+from history import HistoryRecorder
+from timeutils import parse_timestamp
+
+
+def prediction(stop_id, minute):
+    return ACTransitPrediction({
+        'StopId': stop_id, 'TripId': 5155418, 'VehicleId': None, 'RouteName': '51B',
+        'PredictedDelayInSeconds': 60,
+        'PredictedDeparture': '2017-01-11T17:{:02d}:00'.format(minute + 5),
+        'PredictionDateTime': '2017-01-11T17:{:02d}:00'.format(minute)})
+
+
+STOPS = [ACTransitStop({'StopId': 58123, 'Name': '3rd St, "Santa Clara"', 'Latitude': 37.77,
+                        'Longitude': -122.28, 'ScheduledTime': None})]
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_000_formats(self):
+        out = io.StringIO()
+        writer = RecordWriter(out, ('StopId', 'Name'), CSV)
+        writer.write_all(stop.__json__ for stop in STOPS)
+        self.assertEqual(out.getvalue(), 'StopId,Name\n58123,"3rd St, ""Santa Clara"""\n')
+        out = io.StringIO()
+        writer = RecordWriter(out, ('StopId', 'ScheduledTime'))
+        writer.write({'StopId': 1, 'Name': 'left out'})
+        self.assertEqual(json.loads(out.getvalue()), {'StopId': 1, 'ScheduledTime': None})
+        self.assertRaises(ValueError, RecordWriter, out, ('StopId',), 'xml')
+
+    def test_001_history(self):
+        path = os.path.join(self.directory, 'history.log')
+        with HistoryRecorder(path, block_rows=2) as recorder:
+            recorder.record_predictions([prediction(1, minute) for minute in range(5)])
+        records = list(history_records(path))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0], dict(prediction(1, 0).__json__, PredictionDateTime='2017-01-11T17:00:00Z',
+                                          PredictedDeparture='2017-01-11T17:05:00Z'))
+        # the times are UTC and read back as they were recorded
+        self.assertEqual(parse_timestamp(records[0]['PredictionDateTime']),
+                         parse_timestamp(prediction(1, 0).__json__['PredictionDateTime']))
+
+    @mock.patch.object(actransit_apis, 'get_predictions', side_effect=lambda stop_id: [prediction(stop_id, 0)])
+    def test_002_watch(self, get_predictions):
+        out = io.StringIO()
+        sleep = mock.Mock()
+        written = watch_predictions([1, 2], RecordWriter(out, PREDICTION_FIELDS), 30, polls=3, sleep=sleep)
+        self.assertEqual(written, 6)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual([json.loads(line)['StopId'] for line in out.getvalue().splitlines()], [1, 2] * 3)
+
+    @mock.patch('sys.stderr', new_callable=io.StringIO)
+    def test_003_watch_failed_poll(self, stderr):
+        calls = []
+
+        def get_predictions(stop_id):
+            calls.append(stop_id)
+            if len(calls) == 4:
+                raise URLError('timed out')
+            return [prediction(stop_id, 0)]
+
+        out = io.StringIO()
+        with mock.patch.object(actransit_apis, 'get_predictions', side_effect=get_predictions):
+            written = watch_predictions([1, 2], RecordWriter(out, PREDICTION_FIELDS), 30, polls=3,
+                                        sleep=mock.Mock())
+        # the second poll failed on its second stop, none of it is written
+        self.assertEqual(written, 4)
+        self.assertEqual([json.loads(line)['StopId'] for line in out.getvalue().splitlines()], [1, 2] * 2)
+        self.assertIn('poll 2 failed', stderr.getvalue())
+
+    @mock.patch.object(actransit_apis, 'get_predictions', side_effect=lambda stop_id: [prediction(stop_id, 0)])
+    @mock.patch.object(actransit_apis, 'fetch_decode_json', return_value=[stop.__json__ for stop in STOPS])
+    def test_004_cli(self, fetch_decode_json, get_predictions):
+        path = os.path.join(self.directory, 'stops.csv')
+        main(['stops', '--format', 'csv', '--output', path])
+        with open(path) as stops:
+            self.assertEqual(stops.read().splitlines()[0], 'StopId,Name,Latitude,Longitude,ScheduledTime')
+        path = os.path.join(self.directory, 'predictions.csv')
+        for _ in range(2):
+            main(['predictions', '7', '--format', 'csv', '--output', path, '--watch', '0', '--polls', '1'])
+        with open(path) as predictions:
+            # the header is only written once, the polls are appended
+            self.assertEqual(len(predictions.read().splitlines()), 3)
+
+    @mock.patch.object(actransit_apis, 'ACTransitStop', side_effect=AssertionError('wrapper built'))
+    def test_005_stops_without_wrappers(self, wrapper):
+        objs = [stop.__json__ for stop in STOPS]
+        with mock.patch.object(actransit_apis, 'fetch_decode_json', return_value=objs) as fetch:
+            self.assertEqual(list(stop_records()), objs)
+        self.assertIn('/stops/?', fetch.call_args[0][0])
+        feed = mock.Mock()
+        feed.stop_records.return_value = iter(objs)
+        actransit_apis.set_offline_feed(feed)
+        self.addCleanup(actransit_apis.set_offline_feed, None)
+        self.assertEqual(list(stop_records()), objs)
+        self.assertFalse(feed.stops.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
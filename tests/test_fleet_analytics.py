@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_fleet_analytics
+----------------------------------
+
+Tests for `fleet_analytics` module.
+"""
+
+
+import unittest
+
+import numpy as np
+
+from api_classes import ACTransitTrip
+from api_classes import ACTransitVehicle
+from fleet_analytics import FleetSpeedTracker
+from fleet_analytics import detect_bunching
+from fleet_analytics import trip_route_codes
+from fleet_analytics import vehicle_snapshot
+from history import NULL_TIME
+from trip_paths import haversine_meters
+
+
+def vehicle(vehicle_id, trip_id, latitude, longitude, heading, reported):
+    return ACTransitVehicle({'VehicleId': vehicle_id, 'CurrentTripId': trip_id, 'Latitude': latitude,
+                             'Longitude': longitude, 'Heading': heading, 'TimeLastReported': reported})
+
+
+def trip(trip_id, route_name):
+    return ACTransitTrip({'TripId': trip_id, 'RouteName': route_name, 'ScheduleType': 0,
+                          'StartTime': None, 'Direction': None})
+
+
+# 0.001 degree of latitude is about 111 meters
+FIRST_POLL = [
+    vehicle(1, 10, 37.800, -122.27, 0, '2017-02-12T18:42:00-08:00'),
+    vehicle(2, 11, 37.801, -122.27, 0, '2017-02-12T18:42:00-08:00'),
+    vehicle(3, 12, 37.810, -122.27, 180, '2017-02-12T18:42:00-08:00'),
+    vehicle(4, 13, 37.800, -122.27, 10, None),
+]
+SECOND_POLL = [
+    vehicle(1, 10, 37.801, -122.27, 0, '2017-02-12T18:42:20-08:00'),
+    vehicle(2, 11, 37.801, -122.27, 0, '2017-02-12T18:42:00-08:00'),
+    vehicle(3, 12, 37.811, -122.27, 180, '2017-02-12T18:52:00-08:00'),
+    vehicle(4, 13, 37.8015, -122.27, 10, '2017-02-12T18:42:20-08:00'),
+    vehicle(5, 14, 37.805, -122.27, 0, '2017-02-12T18:42:20-08:00'),
+]
+TRIPS = [trip(10, '51B'), trip(11, '51B'), trip(12, '51B'), trip(13, '72'), trip(14, '51B')]
+
+
+class TestFleetAnalytics(unittest.TestCase):
+
+    def test_000_speeds(self):
+        tracker = FleetSpeedTracker(max_gap=300)
+        first = tracker.update(vehicle_snapshot(FIRST_POLL))
+        self.assertTrue(np.isnan(first.speed).all())
+        self.assertEqual(len(tracker), 3)
+        second = tracker.update(vehicle_snapshot(SECOND_POLL))
+        self.assertAlmostEqual(second.speed[0], haversine_meters(37.8, -122.27, 37.801, -122.27) / 20)
+        self.assertAlmostEqual(second.elapsed[0], 20)
+        # no new report, a gap over max_gap, no previous report and a new vehicle
+        self.assertTrue(np.isnan(second.speed[1:]).all())
+        self.assertEqual(len(tracker), 5)
+        third = tracker.update(vehicle_snapshot([vehicle(4, 13, 37.8025, -122.27, 10,
+                                                         '2017-02-12T18:42:40-08:00')]))
+        self.assertGreater(third.speed[0], 5.0)
+
+    def test_001_route_codes(self):
+        snapshot = vehicle_snapshot(SECOND_POLL)
+        codes, route_names = trip_route_codes(np.append(snapshot['trip_id'], 99), TRIPS)
+        self.assertEqual(route_names, ['51B', '72'])
+        self.assertEqual(list(codes), [0, 0, 0, 1, 0, -1])
+
+    def test_002_bunching(self):
+        snapshot = vehicle_snapshot(SECOND_POLL)
+        codes, _ = trip_route_codes(snapshot['trip_id'], TRIPS)
+        # 1 and 2 are at the same place, 3 goes the other way, 4 is on another route
+        # and 5 is about 450 meters (90 seconds at 5 m/s) ahead
+        pairs = detect_bunching(snapshot, codes, headway=60)
+        self.assertEqual(list(zip(pairs.vehicle_a, pairs.vehicle_b)), [(1, 2)])
+        pairs = detect_bunching(snapshot, codes, headway=120)
+        self.assertEqual(sorted(zip(pairs.vehicle_a, pairs.vehicle_b)), [(1, 2), (1, 5), (2, 5)])
+        speeds = np.array([20.0, 20.0, np.nan, np.nan, 20.0])
+        pairs = detect_bunching(snapshot, codes, speeds=speeds, headway=60)
+        self.assertEqual(len(pairs.vehicle_a), 3)
+        self.assertTrue((pairs.headway < 60).all())
+        # 4 never reported, its position is not compared with 1 and 2 of the same route
+        snapshot = vehicle_snapshot(FIRST_POLL)
+        codes, _ = trip_route_codes(snapshot['trip_id'], TRIPS[:3] + [trip(13, '51B')])
+        pairs = detect_bunching(snapshot, codes)
+        self.assertEqual(list(zip(pairs.vehicle_a, pairs.vehicle_b)), [(1, 2)])
+
+    def test_003_empty(self):
+        snapshot = vehicle_snapshot([])
+        self.assertEqual(len(FleetSpeedTracker().update(snapshot).speed), 0)
+        self.assertEqual(len(detect_bunching(snapshot, np.zeros(0, dtype=np.int32)).headway), 0)
+        self.assertEqual(vehicle_snapshot(FIRST_POLL)['time_last_reported'][3], NULL_TIME)
+
+
+if __name__ == '__main__':
+    unittest.main()
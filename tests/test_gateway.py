@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_gateway
+----------------------------------
+
+Tests for `gateway` module.
+"""
+
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+
+from actransit_apis import actransit_apis
+from disk_cache import DiskCache
+from gateway import Gateway
+from gateway import STATIC_TTL
+from gateway import route_ttl
+
+
+STOPS = [{'StopId': 58123, 'Name': '3rd St:Santa Clara Av', 'Latitude': 37.77,
+          'Longitude': -122.28, 'ScheduledTime': None}]
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+
+    paths = []
+
+    def do_GET(self):
+        UpstreamHandler.paths.append(self.path)
+        time.sleep(0.1)
+        if self.path.startswith('/transit/routes'):
+            # dies in the middle of the body
+            self.send_response(200)
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            self.wfile.write(b'[{"RouteId": ')
+            self.close_connection = True
+            return
+        if self.path.startswith('/transit/stops/'):
+            status, body = 200, json.dumps(STOPS).encode('utf-8')
+        else:
+            status, body = 500, b'{"Message": "upstream failure"}'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGateway(unittest.TestCase):
+
+    def setUp(self):
+        UpstreamHandler.paths = []
+        self.upstream = ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+        threading.Thread(target=self.upstream.serve_forever, daemon=True).start()
+        self.gateway = Gateway('gateway-key', 'http://127.0.0.1:{}/transit'.format(
+            self.upstream.server_address[1]))
+        actransit_apis.set_base_url(self.gateway.start(port=0))
+        actransit_apis.set_api_key('client-key')
+
+    def tearDown(self):
+        actransit_apis.set_base_url(None)
+        actransit_apis.set_api_key(None)
+        self.gateway.stop()
+        self.upstream.shutdown()
+        self.upstream.server_close()
+
+    def test_000_coalesced_and_cached(self):
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda _: actransit_apis.fetch_decode_json(
+                '{}/stops/?token=client-key'.format(actransit_apis.__BASE_URL__)), range(8)))
+        self.assertEqual(results, [STOPS] * 8)
+        self.assertEqual([stop.stopId for stop in actransit_apis._fetch_stops()], [58123])
+        self.assertEqual(UpstreamHandler.paths, ['/transit/stops/?token=gateway-key'])
+        stats = self.gateway.stats
+        self.assertEqual(stats['requests'], 9)
+        self.assertEqual(stats['upstream'], 1)
+        self.assertEqual(stats['hits'] + stats['coalesced'], 8)
+
+    def test_001_errors(self):
+        with self.assertRaises(HTTPError) as context:
+            actransit_apis.get_service_notices()
+        self.assertEqual(context.exception.code, 500)
+        with self.assertRaises(HTTPError) as context:
+            actransit_apis.fetch_decode_json('{}/vehicles/1'.format(actransit_apis.__BASE_URL__))
+        self.assertEqual(context.exception.code, 404)
+        self.assertEqual(self.gateway.stats['upstream'], 1)
+
+    def test_002_disk_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        gateway = Gateway('gateway-key', 'http://127.0.0.1:{}/transit'.format(self.upstream.server_address[1]),
+                          cache=DiskCache(os.path.join(directory, 'gateway.db')))
+        body, gzipped = gateway.fetch('/stops/')
+        self.assertEqual(json.loads(body), STOPS)
+        self.assertEqual(gzip.decompress(gzipped), body)
+        self.assertEqual(gateway.fetch('/stops/'), (body, gzipped))
+        self.assertEqual(gateway.stats['upstream'], 1)
+
+    def test_003_traversal(self):
+        self.assertEqual(route_ttl('/stops/37.8/-122.27/500/51B'), STATIC_TTL)
+        for path in ('/stops/../../x/y', '/stops/%2e%2e/%2E%2E/x/y', '/stops/./predictions',
+                     '/route/../trips', '/stops/1/..'):
+            self.assertIsNone(route_ttl(path))
+            with self.assertRaises(HTTPError) as context:
+                actransit_apis.fetch_decode_json('{}{}?token=client-key'.format(actransit_apis.__BASE_URL__, path))
+            self.assertEqual(context.exception.code, 404)
+        self.assertEqual(UpstreamHandler.paths, [])
+
+    def test_004_upstream_dies_mid_body(self):
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(actransit_apis._fetch_routes) for _ in range(4)]
+        for future in futures:
+            self.assertIsInstance(future.exception(), HTTPError)
+            self.assertEqual(future.exception().code, 502)
+        # the gateway keeps serving
+        self.assertEqual([stop.stopId for stop in actransit_apis._fetch_stops()], [58123])
+
+
+if __name__ == '__main__':
+    unittest.main()
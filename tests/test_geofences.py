@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_geofences
+----------------------------------
+
+Tests for `geofences` module.
+"""
+
+
+import unittest
+
+import numpy as np
+
+from api_classes import ACTransitVehicle
+from geofences import GeofenceEngine
+
+
+# about 111 meters per 0.001 degree of latitude
+def vehicle(vehicle_id, latitude, longitude=-122.27):
+    return ACTransitVehicle({'VehicleId': vehicle_id, 'CurrentTripId': 1, 'Latitude': latitude,
+                             'Longitude': longitude, 'Heading': 0, 'TimeLastReported': None})
+
+
+class TestGeofences(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = GeofenceEngine()
+        self.engine.add_fence('stop-1', 37.800, -122.27, 150)
+        self.engine.add_fence('stop-2', 37.810, -122.27, 150)
+
+    def test_000_transitions(self):
+        self.assertEqual(self.engine.update([vehicle(1, 37.795), vehicle(2, 37.8)]),
+                         ([(2, 'stop-1')], []))
+        # only the transitions are reported
+        self.assertEqual(self.engine.update([vehicle(1, 37.799), vehicle(2, 37.8005)]),
+                         ([(1, 'stop-1')], []))
+        self.assertEqual(self.engine.update([vehicle(1, 37.809), vehicle(2, 37.805)]),
+                         ([(1, 'stop-2')], [(1, 'stop-1'), (2, 'stop-1')]))
+        # vehicle 1 left the fleet
+        self.assertEqual(self.engine.update([vehicle(2, 37.805)]), ([], [(1, 'stop-2')]))
+
+    def test_001_partial_and_fence_changes(self):
+        self.engine.update([vehicle(1, 37.8), vehicle(2, 37.81)])
+        self.assertEqual(self.engine.update([vehicle(1, 37.9)], partial=True), ([], [(1, 'stop-1')]))
+        self.engine.remove_fence('stop-1')
+        self.engine.add_fence('stop-3', 37.81, -122.2705, 100)
+        self.assertEqual(self.engine.update([vehicle(2, 37.81)]), ([(2, 'stop-3')], []))
+        self.assertEqual(self.engine.fence_ids, ['stop-2', 'stop-3'])
+
+    def test_002_matches_brute_force(self):
+        random = np.random.RandomState(7)
+        engine = GeofenceEngine(cell_size=100)
+        fences = np.column_stack((random.uniform(37.7, 37.9, 2000), random.uniform(-122.3, -122.1, 2000),
+                                  random.uniform(20, 400, 2000)))
+        for fence_id, (latitude, longitude, radius) in enumerate(fences):
+            engine.add_fence(fence_id, latitude, longitude, radius)
+        latitudes = random.uniform(37.7, 37.9, 500)
+        longitudes = random.uniform(-122.3, -122.1, 500)
+        positions, found = engine.inside(latitudes, longitudes)
+
+        scale = 6371008.8 * np.pi / 180.0
+        dx = (longitudes[:, None] - fences[None, :, 1]) * scale * np.cos(np.radians(37.8))
+        dy = (latitudes[:, None] - fences[None, :, 0]) * scale
+        expected = np.argwhere(dx * dx + dy * dy <= fences[None, :, 2] ** 2)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(sorted(zip(positions.tolist(), found.tolist())), sorted(map(tuple, expected.tolist())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_gtfs_feed
+----------------------------------
+
+Tests for `gtfs_feed` module.
+"""
+
+
+import io
+import unittest
+import zipfile
+from datetime import date
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitTripScheduleType
+from gtfs_feed import GtfsFeed
+from timeutils import parse_timestamp
+
+
+FEED = {
+    'stops.txt': '﻿stop_id,stop_code,stop_name,stop_lat,stop_lon\n'
+                 '1,58123,3rd St:Santa Clara Av,37.7732681,-122.2882275\n'
+                 '2,58124,4th St:Santa Clara Av,37.7740000,-122.2870000\n'
+                 '3,,Depot,37.9000000,-122.1000000\n',
+    'routes.txt': 'route_id,agency_id,route_short_name,route_long_name,route_type\n'
+                  '51B-141,AC,51B,Berkeley Amtrak - Rockridge BART,3\n'
+                  '72-141,AC,72,Richmond - Oakland,3\n',
+    'trips.txt': 'route_id,service_id,trip_id,trip_headsign,direction_id\n'
+                 '51B-141,WKDY,5155418,Rockridge BART,0\n'
+                 '72-141,SAT,5155419,,1\n',
+    'stop_times.txt': 'trip_id,arrival_time,departure_time,stop_id,stop_sequence,timepoint\n'
+                      '5155418,07:05:00,07:05:00,2,2,1\n'
+                      '5155418,07:00:00,07:00:00,1,1,1\n'
+                      '5155418,07:10:00,07:10:00,3,3,0\n'
+                      '5155419,25:10:00,25:10:00,3,1,1\n',
+    'calendar.txt': 'service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday\n'
+                    'WKDY,1,1,1,1,1,0,0\n'
+                    'SAT,0,0,0,0,0,1,0\n',
+}
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+class TestGtfsFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.feed = GtfsFeed.from_zip(make_zip(FEED))
+
+    def test_000_stops(self):
+        stops = self.feed.stops()
+        self.assertEqual([stop.stopId for stop in stops], [58123, 58124, 3])
+        self.assertEqual(stops[0].name, '3rd St:Santa Clara Av')
+        self.assertAlmostEqual(stops[0].latitude, 37.7732681)
+        self.assertEqual(list(self.feed.stop_records()), [stop.__json__ for stop in stops])
+
+    def test_001_routes_and_trips(self):
+        self.assertEqual([route.name for route in self.feed.routes()], ['51B', '72'])
+        # the start times and directions are converted to the format of the live API
+        trip, = self.feed.trips('51B', date(2017, 2, 13))
+        self.assertEqual(trip.trip_id, 5155418)
+        self.assertEqual(trip.start_time, '2017-02-13T07:00:00')
+        self.assertIsNotNone(parse_timestamp(trip.start_time))
+        self.assertEqual(trip.direction, 'Eastbound')
+        self.assertEqual(trip.schedule_type, ACTransitTripScheduleType.WEEKDAY)
+        trip, = self.feed.trips('72', date(2017, 2, 11))
+        self.assertEqual(trip.schedule_type, ACTransitTripScheduleType.SATURDAY)
+        # past midnight on the next day, a trip with a single stop has no bound
+        self.assertEqual(trip.start_time, '2017-02-12T01:10:00')
+        self.assertIsNone(trip.direction)
+
+    def test_002_timepoints(self):
+        timepoints = self.feed.timepoints(5155418)
+        self.assertEqual([tp.sequence for tp in timepoints], [1, 2])
+        self.assertAlmostEqual(timepoints[1].longitude, -122.287)
+        self.assertEqual(self.feed.timepoints(1), [])
+
+    def test_003_offline_api(self):
+        actransit_apis.set_offline_feed(self.feed)
+        self.addCleanup(actransit_apis.set_offline_feed, None)
+        self.assertEqual(len(actransit_apis.get_stops()), 3)
+        self.assertEqual(len(actransit_apis.get_trips('72')), 1)
+        nearby = actransit_apis.get_active_stops(37.7733, -122.2882, '51B', 200)
+        self.assertEqual([stop.stopId for stop in nearby], [58123])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_history
+----------------------------------
+
+Tests for `history` module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitVehicle
+from delay_analytics import delay_percentiles
+from export import history_records
+from history import HistoryReader
+from history import HistoryRecorder
+from history import NULL_DELAY
+from timeutils import parse_timestamp
+
+
+def prediction(minute, route_name, delay):
+    return ACTransitPrediction({
+        'StopId': 56707, 'TripId': 5155418, 'VehicleId': None, 'RouteName': route_name,
+        'PredictedDelayInSeconds': delay,
+        'PredictedDeparture': '2017-01-11T17:{:02d}:00'.format(minute + 5),
+        'PredictionDateTime': '2017-01-11T17:{:02d}:00'.format(minute)})
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'history.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_000_round_trip(self):
+        with HistoryRecorder(self.path, block_rows=4) as recorder:
+            recorder.record_predictions(
+                [prediction(minute, ['19', '51B'][minute % 2], minute * 10)
+                 for minute in range(10)])
+            recorder.record_vehicles([ACTransitVehicle({
+                'VehicleId': 5021, 'CurrentTripId': 5155418, 'Latitude': 37.8,
+                'Longitude': -122.27, 'Heading': 90,
+                'TimeLastReported': '2017-02-12T18:42:34.7670857-08:00'})])
+
+        predictions = HistoryReader(self.path).read_predictions()
+        self.assertEqual(predictions['predicted_delay'].tolist(), list(range(0, 100, 10)))
+        self.assertEqual(predictions['vehicle_id'].tolist(), [-1] * 10)
+        self.assertEqual([predictions['route_names'][code] for code in predictions['route_code']],
+                         ['19', '51B'] * 5)
+        self.assertEqual(predictions['predicted_departure'][0],
+                         parse_timestamp('2017-01-11T17:05:00'))
+
+        vehicles = HistoryReader(self.path).read_vehicles()
+        self.assertEqual(vehicles['vehicle_id'].tolist(), [5021])
+        self.assertEqual(vehicles['heading'].tolist(), [90])
+
+    def test_001_time_range(self):
+        recorder = HistoryRecorder(self.path, block_rows=3)
+        recorder.record_predictions([prediction(minute, '19', minute) for minute in range(9)])
+        recorder.close()
+        reader = HistoryReader(self.path)
+        start = parse_timestamp('2017-01-11T17:04:00')
+        end = parse_timestamp('2017-01-11T17:06:00')
+        self.assertEqual(len(list(reader.blocks(b'P', start, end))), 2)
+        self.assertEqual(reader.read_predictions(start, end)['predicted_delay'].tolist(),
+                         [4, 5, 6])
+
+    def test_002_missing_delay(self):
+        with HistoryRecorder(self.path) as recorder:
+            recorder.record_predictions([prediction(0, '19', None), prediction(1, '19', -1)])
+        predictions = HistoryReader(self.path).read_predictions()
+        self.assertEqual(predictions['predicted_delay'].tolist(), [NULL_DELAY, -1])
+        stats = delay_percentiles(predictions)
+        self.assertEqual((stats['count'].tolist(), stats['mean'].tolist()), ([1], [-1.0]))
+        records = list(history_records(self.path))
+        self.assertEqual([record['PredictedDelayInSeconds'] for record in records], [None, -1])
+
+    def test_003_missing_route_name(self):
+        with HistoryRecorder(self.path, block_rows=2) as recorder:
+            recorder.record_predictions([prediction(0, None, 1), prediction(1, '', 2), prediction(2, '19', 3)])
+        predictions = HistoryReader(self.path).read_predictions()
+        self.assertEqual([predictions['route_names'][code] for code in predictions['route_code']],
+                         [None, '', '19'])
+        self.assertEqual([record['RouteName'] for record in history_records(self.path)], [None, '', '19'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_interning
+----------------------------------
+
+Tests for `interning` module.
+"""
+
+
+import unittest
+from json import JSONDecoder
+from json import loads
+
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitRoute
+from interning import ROUTE_TABLE
+from interning import intern_fields
+from interning import intern_json
+
+
+PAYLOAD = '''[
+  {"TripId": 1, "RouteName": "51" "B", "Direction": "North" "bound"},
+  {"TripId": 2, "RouteName": "51B", "Direction": "Northbound",
+   "Notice": {"ImpactedRoutes": ["51B"]}}
+]'''.replace('" "', '')
+
+
+class TestInterning(unittest.TestCase):
+
+    def tearDown(self):
+        ROUTE_TABLE.clear()
+
+    def test_000_object_hook(self):
+        first, second = JSONDecoder(object_hook=intern_fields).decode(PAYLOAD)
+        self.assertIs(first['RouteName'], second['RouteName'])
+        self.assertIs(first['Direction'], second['Direction'])
+        self.assertIs(second['Notice']['ImpactedRoutes'][0], first['RouteName'])
+
+    def test_001_intern_json(self):
+        first, second = intern_json(loads(PAYLOAD))
+        self.assertIs(first['RouteName'], second['RouteName'])
+        self.assertIs(second['Notice']['ImpactedRoutes'][0], first['RouteName'])
+
+    def test_002_route_table(self):
+        prediction = ACTransitPrediction({
+            'StopId': 1, 'TripId': 2, 'VehicleId': 3, 'RouteName': '51B',
+            'PredictedDelayInSeconds': 0, 'PredictedDeparture': None,
+            'PredictionDateTime': None})
+        self.assertIsNone(prediction.route)
+        route = ACTransitRoute({'RouteId': '51B', 'Name': '51B', 'Description': 'Broadway'})
+        ROUTE_TABLE.register([route])
+        self.assertIs(prediction.route, route)
+
+
+if __name__ == '__main__':
+    unittest.main()
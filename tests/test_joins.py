@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_joins
+----------------------------------
+
+Tests for `joins` module.
+"""
+
+
+import unittest
+from unittest import mock
+from urllib.error import URLError
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitTrip
+from api_classes import ACTransitVehicle
+from caching import TTLCache
+from joins import SnapshotJoin
+from joins import join_predictions
+
+
+def prediction(trip_id, vehicle_id, route_name='51B'):
+    return ACTransitPrediction({
+        'StopId': 56707, 'TripId': trip_id, 'VehicleId': vehicle_id, 'RouteName': route_name,
+        'PredictedDelayInSeconds': 0, 'PredictedDeparture': '2017-01-11T17:31:00',
+        'PredictionDateTime': '2017-01-11T17:10:41'})
+
+
+def vehicle(vehicle_id, trip_id):
+    return ACTransitVehicle({'VehicleId': vehicle_id, 'CurrentTripId': trip_id, 'Latitude': 37.8,
+                             'Longitude': -122.27, 'Heading': 0, 'TimeLastReported': None})
+
+
+def trip(trip_id, route_name='51B', direction='Northbound'):
+    return ACTransitTrip({'TripId': trip_id, 'RouteName': route_name, 'ScheduleType': 0,
+                          'StartTime': None, 'Direction': direction})
+
+
+ROUTE_TRIPS = {'51B': [trip(1), trip(2, direction='Southbound')], '19': [trip(3, '19')]}
+
+
+class TestJoins(unittest.TestCase):
+
+    @mock.patch.object(actransit_apis, 'get_trips', side_effect=lambda route_name: ROUTE_TRIPS[route_name])
+    def test_000_join(self, get_trips):
+        predictions = [prediction(1, 10), prediction(2, 20), prediction(3, 30, '19'), prediction(4, None)]
+        join = SnapshotJoin(predictions, [vehicle(10, 1), vehicle(30, 3)], [trip(1)], cache=TTLCache())
+        records = join.records()
+        self.assertEqual([record.vehicle.vehicle_id if record.vehicle else None for record in records],
+                         [10, None, 30, None])
+        self.assertEqual([record.trip.direction if record.trip else None for record in records],
+                         ['Northbound', 'Southbound', 'Northbound', None])
+        # one fetch per route with missing trips
+        self.assertEqual(sorted(call[0][0] for call in get_trips.call_args_list), ['19', '51B'])
+        self.assertEqual(join.predictions_for_vehicle(10), [predictions[0]])
+
+    @mock.patch.object(actransit_apis, 'get_trips', side_effect=lambda route_name: ROUTE_TRIPS[route_name])
+    def test_001_cached_trips(self, get_trips):
+        cache = TTLCache()
+        SnapshotJoin([prediction(2, 20)], cache=cache)
+        SnapshotJoin([prediction(2, 20), prediction(4, 40)], cache=cache)
+        self.assertEqual(get_trips.call_count, 1)
+        self.assertEqual(join_predictions([prediction(2, 20)], fetch_missing_trips=False)[0].trip, None)
+
+    def test_002_failed_route(self):
+        def get_trips(route_name):
+            if route_name == '19':
+                raise URLError('timed out')
+            return ROUTE_TRIPS[route_name]
+
+        cache = TTLCache()
+        predictions = [prediction(1, 10), prediction(3, 30, '19')]
+        with mock.patch.object(actransit_apis, 'get_trips', side_effect=get_trips):
+            join = SnapshotJoin(predictions, cache=cache)
+        self.assertEqual([record.trip.trip_id if record.trip else None for record in join.records()], [1, None])
+        self.assertEqual(list(join.errors), ['19'])
+        self.assertIsNone(cache.get(('route', '19')))
+        # the failed route is fetched again by the next join
+        with mock.patch.object(actransit_apis, 'get_trips', side_effect=lambda route_name: ROUTE_TRIPS[route_name]):
+            join = SnapshotJoin(predictions, cache=cache)
+        self.assertEqual(join.trip(predictions[1]).trip_id, 3)
+        self.assertEqual(join.errors, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_json_backends
+----------------------------------
+
+Tests for `json_backends` module.
+"""
+
+
+import unittest
+from json import JSONDecodeError
+
+import json_backends
+
+
+PAYLOAD = '[{"StopId": 58123, "Name": "3rd St:Santa Clara Av"}, ' \
+          '{"StopId": 58124, "Name": "3rd St:Santa Clara Av"}]'.encode('utf-8')
+
+
+class TestJsonBackends(unittest.TestCase):
+
+    def tearDown(self):
+        json_backends.__BACKEND__ = None
+
+    def test_000_every_backend_decodes_bytes(self):
+        self.assertIn('json', json_backends.available_backends())
+        for name in json_backends.available_backends():
+            backend = json_backends.get_backend(name)
+            first, second = backend.decode(PAYLOAD)
+            self.assertEqual(first['StopId'], 58123)
+            self.assertIs(first['Name'], second['Name'])
+            self.assertEqual(backend.decode(PAYLOAD, intern=False)[1]['StopId'], 58124)
+
+    def test_001_default_and_fallback(self):
+        self.assertEqual(json_backends.get_backend().name,
+                         json_backends.available_backends()[0])
+        json_backends.set_backend('json')
+        self.assertEqual(json_backends.decode_json(b'{"a": 1}'), {'a': 1})
+        self.assertRaises(ValueError, json_backends.set_backend, 'yaml')
+
+    def test_002_decode_errors(self):
+        def loads(data):
+            raise ValueError('Expected object or value')
+
+        backends = [json_backends.get_backend(name) for name in json_backends.available_backends()]
+        backends.append(json_backends.JsonBackend('other', loads, loads))
+        for backend in backends:
+            for data in (b'[{"StopId": ', b'\xff\xfe'):
+                with self.assertRaises(JSONDecodeError):
+                    backend.decode(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
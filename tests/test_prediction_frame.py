@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_prediction_frame
+----------------------------------
+
+Tests for `prediction_frame` module.
+"""
+
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitPrediction
+from delay_analytics import delay_percentiles
+from history import NULL_DELAY
+from history import NULL_ID
+from history import NULL_TIME
+from prediction_frame import PredictionFrame
+from prediction_frame import ROUTE
+from prediction_frame import predictions_frame
+from timeutils import parse_timestamp
+
+
+def json_prediction(stop_id, trip_id, route_name, delay, departure, vehicle_id=5021):
+    return {'StopId': stop_id, 'TripId': trip_id, 'VehicleId': vehicle_id, 'RouteName': route_name,
+            'PredictedDelayInSeconds': delay, 'PredictedDeparture': departure,
+            'PredictionDateTime': '2017-01-11T17:10:41'}
+
+
+JSON_PREDICTIONS = [
+    json_prediction(1, 10, '51B', 60, '2017-01-11T17:31:00'),
+    json_prediction(1, 11, '72', 600, '2017-01-11T17:20:00'),
+    json_prediction(1, 12, '51B', 0, '2017-01-11T17:45:00', vehicle_id=None),
+    json_prediction(2, 10, '51B', 420, '2017-01-11T17:35:00'),
+]
+
+
+class TestPredictionFrame(unittest.TestCase):
+
+    def test_000_from_json(self):
+        frame = PredictionFrame.from_json(JSON_PREDICTIONS)
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(frame.route_names, ['51B', '72'])
+        self.assertEqual(list(frame['route_code']), [0, 1, 0, 0])
+        self.assertEqual(frame['vehicle_id'][2], NULL_ID)
+        self.assertEqual(frame['predicted_departure'][0], parse_timestamp('2017-01-11T17:31:00'))
+        same = PredictionFrame.from_predictions(ACTransitPrediction(obj) for obj in JSON_PREDICTIONS)
+        self.assertTrue(np.array_equal(same['predicted_departure'], frame['predicted_departure']))
+
+    def test_001_filter_sort(self):
+        frame = PredictionFrame.from_json(JSON_PREDICTIONS)
+        start = parse_timestamp('2017-01-11T17:30:00')
+        late = frame.filter(frame.route_mask('51B', '99') & frame.delay_mask(minimum=31) &
+                            frame.departure_mask(start))
+        self.assertEqual(list(late['trip_id']), [10, 10])
+        self.assertEqual(list(late.sort('predicted_delay', descending=True)['stop_id']), [2, 1])
+        self.assertEqual(list(frame.sort((ROUTE, 'predicted_departure'))['trip_id']), [10, 10, 12, 11])
+        self.assertEqual(list(frame.filter(frame.stop_mask(2))['trip_id']), [10])
+
+    def test_002_concat(self):
+        first = PredictionFrame.from_json(JSON_PREDICTIONS[:2])
+        second = PredictionFrame.from_json([json_prediction(3, 13, '19', 5, None)] + JSON_PREDICTIONS[3:])
+        frame = PredictionFrame.concat([first, PredictionFrame.empty(), second])
+        self.assertEqual(list(frame.route_name_column()), ['51B', '72', '19', '51B'])
+        self.assertEqual(frame['predicted_departure'][2], NULL_TIME)
+        self.assertEqual(len(frame.filter(frame.departure_mask())), 3)
+        self.assertEqual(list(frame.sort('predicted_departure', descending=True)['trip_id']), [10, 10, 11, 13])
+        stats = delay_percentiles(frame.columns(), percentiles=(50,))
+        self.assertIsNotNone(stats)
+
+    def test_003_missing_values(self):
+        frame = PredictionFrame.from_json([json_prediction(1, 10, None, None, None)] + JSON_PREDICTIONS[:2])
+        self.assertEqual(frame['predicted_delay'][0], NULL_DELAY)
+        self.assertEqual(list(frame.filter(frame.delay_mask(maximum=100))['trip_id']), [10])
+        self.assertEqual(list(frame.sort(ROUTE)['trip_id']), [10, 10, 11])
+        self.assertEqual(list(frame.sort(ROUTE)['route_code']), [0, 1, 2])
+
+    @mock.patch.object(actransit_apis, 'get_predictions',
+                       side_effect=lambda stop_id: [ACTransitPrediction(obj) for obj in JSON_PREDICTIONS
+                                                    if obj['StopId'] == stop_id])
+    def test_004_predictions_frame(self, get_predictions):
+        frame = predictions_frame([1, 2, 3])
+        self.assertEqual(list(frame['stop_id']), [1, 1, 1, 2])
+        self.assertEqual(len(predictions_frame([])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_prefetch
+----------------------------------
+
+Tests for `prefetch` module, and the prediction cache of `actransit_apis`.
+"""
+
+
+import unittest
+from unittest import mock
+
+from actransit_apis import actransit_apis
+from caching import TTLCache
+from prefetch import DecayingCounter
+from prefetch import PredictionPrefetcher
+from ratelimit import RateLimiter
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        actransit_apis.set_prediction_cache(TTLCache(clock=self.clock), ttl=15)
+
+    def tearDown(self):
+        actransit_apis.set_prediction_cache(None)
+
+    def test_000_decaying_counter(self):
+        counter = DecayingCounter(half_life=10, clock=self.clock)
+        for _ in range(4):
+            counter.hit('a')
+        counter.hit('b')
+        self.assertAlmostEqual(counter.score('a'), 4.0)
+        self.clock.now += 10
+        self.assertAlmostEqual(counter.score('a'), 2.0)
+        self.assertEqual(counter.top(10, threshold=1.0), ['a'])
+        # b is under the threshold but keeps counting, until it decays to about nothing
+        self.assertEqual(len(counter), 2)
+        self.clock.now += 200
+        counter.top(10)
+        self.assertEqual(len(counter), 0)
+
+    @mock.patch.object(actransit_apis, '_fetch_predictions', side_effect=lambda stop_id: [stop_id])
+    def test_001_prediction_cache(self, fetch):
+        self.assertEqual(actransit_apis.get_predictions(1), [1])
+        self.assertEqual(actransit_apis.get_predictions(1), [1])
+        self.assertEqual(fetch.call_count, 1)
+        self.clock.now += 15
+        actransit_apis.get_predictions(1)
+        self.assertEqual(fetch.call_count, 2)
+
+    @mock.patch.object(actransit_apis, '_fetch_predictions', side_effect=lambda stop_id: [stop_id])
+    def test_002_refresh_due(self, fetch):
+        budget = RateLimiter(rate=1, burst=1, clock=self.clock)
+        prefetcher = PredictionPrefetcher(budget=budget, hot_threshold=2.0, lead=3, clock=self.clock)
+        for _ in range(3):
+            prefetcher.get_predictions(1)
+            prefetcher.get_predictions(2)
+        prefetcher.get_predictions(3)
+        prefetcher.get_predictions(1)
+        self.assertEqual(prefetcher.hot_stops(), [1, 2])
+        self.assertEqual(fetch.call_count, 3)
+
+        # not due yet
+        self.assertEqual(prefetcher.refresh_due(), 0)
+        # due, but the budget only allows one refresh
+        self.clock.now += 13
+        self.assertEqual(prefetcher.refresh_due(), 1)
+        self.assertEqual(prefetcher.stats, {'refreshed': 1, 'skipped': 1, 'errors': 0})
+        self.assertEqual(fetch.call_args_list[-1][0][0], 1)
+        self.clock.now += 1
+        self.assertEqual(prefetcher.refresh_due(), 1)
+        self.assertEqual(fetch.call_args_list[-1][0][0], 2)
+
+        # the hot stops are still cached when their first predictions expire
+        self.clock.now += 2
+        prefetcher.get_predictions(1)
+        prefetcher.get_predictions(2)
+        self.assertEqual(fetch.call_count, 5)
+
+    @mock.patch.object(actransit_apis, '_fetch_predictions', side_effect=lambda stop_id: [stop_id])
+    def test_003_hits_spread_over_time(self, fetch):
+        prefetcher = PredictionPrefetcher(budget=RateLimiter(rate=10, burst=10, clock=self.clock),
+                                          hot_threshold=2.0, clock=self.clock)
+        # one call every 10 seconds, with the background passes in between
+        for _ in range(40):
+            prefetcher.get_predictions(1)
+            for _ in range(10):
+                self.clock.now += 1
+                prefetcher.refresh_due()
+        self.assertEqual(prefetcher.hot_stops(), [1])
+        self.assertGreater(prefetcher.stats['refreshed'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
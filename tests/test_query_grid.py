@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_query_grid
+----------------------------------
+
+Tests for `query_grid` module, and the grid mode of `actransit_apis.get_active_stops`.
+"""
+
+
+import random
+import unittest
+from unittest import mock
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitStop
+from caching import TTLCache
+from query_grid import distance_feet
+from query_grid import snap_to_grid
+
+
+def stops_around(latitude, longitude, count, seed=7):
+    rng = random.Random(seed)
+    return [ACTransitStop({'StopId': stop_id, 'Name': str(stop_id), 'ScheduledTime': None,
+                           'Latitude': latitude + rng.uniform(-0.01, 0.01),
+                           'Longitude': longitude + rng.uniform(-0.01, 0.01)})
+            for stop_id in range(count)]
+
+
+STOPS = stops_around(37.8, -122.27, 400)
+
+
+def fake_fetch(latitude, longitude, route_name, search_radius):
+    return [stop for stop in STOPS
+            if distance_feet(latitude, longitude, stop.latitude, stop.longitude) <= search_radius]
+
+
+class TestQueryGrid(unittest.TestCase):
+
+    def setUp(self):
+        actransit_apis.set_stop_query_grid(300)
+
+    def tearDown(self):
+        actransit_apis.set_stop_query_grid(None)
+
+    def test_000_snap_to_grid(self):
+        cell = snap_to_grid(37.8, -122.27, 300)
+        self.assertLessEqual(distance_feet(37.8, -122.27, cell.latitude, cell.longitude), cell.half_diagonal)
+        self.assertAlmostEqual(cell.half_diagonal, 300 * 2 ** 0.5 / 2, delta=2)
+        self.assertEqual(snap_to_grid(cell.latitude, cell.longitude, 300)[:2], cell[:2])
+
+    @mock.patch.object(actransit_apis, '_fetch_active_stops', side_effect=fake_fetch)
+    def test_001_same_results_as_exact_queries(self, fetch):
+        rng = random.Random(11)
+        for _ in range(200):
+            latitude = 37.8 + rng.uniform(-0.003, 0.003)
+            longitude = -122.27 + rng.uniform(-0.003, 0.003)
+            stops = actransit_apis.get_active_stops(latitude, longitude, '51B', 500)
+            expected = fake_fetch(latitude, longitude, '51B', 500)
+            self.assertEqual([stop.stopId for stop in stops], [stop.stopId for stop in expected])
+        # one fetch per cell visited, not per query
+        self.assertLess(fetch.call_count, 100)
+
+    @mock.patch.object(actransit_apis, '_fetch_active_stops', side_effect=fake_fetch)
+    def test_002_cell_shared(self, fetch):
+        cell = snap_to_grid(37.8, -122.27, 300)
+        actransit_apis.get_active_stops(cell.latitude + 0.0001, cell.longitude, '51B')
+        actransit_apis.get_active_stops(cell.latitude - 0.0001, cell.longitude + 0.0001, '51B')
+        self.assertEqual(fetch.call_count, 1)
+        actransit_apis.get_active_stops(cell.latitude, cell.longitude, '72')
+        self.assertEqual(fetch.call_count, 2)
+        actransit_apis.set_stop_query_grid(None)
+        actransit_apis.get_active_stops(cell.latitude, cell.longitude, '72')
+        self.assertEqual(fetch.call_args[0][:2], (cell.latitude, cell.longitude))
+        self.assertEqual(fetch.call_args[0][3], 500)
+
+    @mock.patch.object(actransit_apis, '_fetch_active_stops', side_effect=fake_fetch)
+    def test_003_bounded_cache(self, fetch):
+        cache = TTLCache(max_entries=2)
+        actransit_apis.set_stop_query_grid(300, cache)
+        for step in range(3):
+            actransit_apis.get_active_stops(37.8 + step * 0.01, -122.27, '51B')
+        self.assertEqual(len(cache), 2)
+        actransit_apis.invalidate_static_cache()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
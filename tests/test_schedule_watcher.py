@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_schedule_watcher
+----------------------------------
+
+Tests for `schedule_watcher` module.
+"""
+
+
+import io
+import json
+import unittest
+from unittest import mock
+
+from actransit_apis import actransit_apis
+from api_classes import ACTransitGtfsScheduleInfo
+from caching import TTLCache
+from schedule_watcher import ScheduleWatcher
+
+
+def schedule_info(updated_date):
+    return ACTransitGtfsScheduleInfo({'UpdatedDate': updated_date,
+                                      'EarliestServiceDate': '2017-02-13T00:00:00',
+                                      'LatestServiceDate': '2017-06-13T00:00:00'})
+
+
+STOPS = [{'StopId': 58123, 'Name': '3rd St:Santa Clara Av', 'Latitude': 37.77,
+          'Longitude': -122.28, 'ScheduledTime': None}]
+
+FETCH_DECODE_JSON = actransit_apis.fetch_decode_json
+
+
+class FakeResponse(io.BytesIO):
+
+    headers = {}
+
+
+class TestScheduleWatcher(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(actransit_apis, 'fetch_decode_json', return_value=STOPS)
+        self.fetch_decode_json = patcher.start()
+        self.addCleanup(patcher.stop)
+        actransit_apis.set_static_cache(TTLCache(name='static'))
+        self.addCleanup(actransit_apis.set_static_cache, None)
+
+    @mock.patch.object(actransit_apis, 'get_gtfs_schedule_info')
+    def test_000_invalidate_on_change(self, get_gtfs_schedule_info):
+        get_gtfs_schedule_info.return_value = schedule_info('2017-02-13T11:19:49')
+        cache = actransit_apis.__STATIC_CACHE__
+        watcher = ScheduleWatcher()
+        self.assertIs(actransit_apis.__STATIC_CACHE__, cache)
+        self.assertFalse(watcher.check())
+
+        actransit_apis.get_stops()
+        actransit_apis.get_stops()
+        self.assertEqual(self.fetch_decode_json.call_count, 1)
+
+        # same schedule, the stops stay cached
+        self.assertFalse(watcher.check())
+        actransit_apis.get_stops()
+        self.assertEqual(self.fetch_decode_json.call_count, 1)
+
+        get_gtfs_schedule_info.return_value = schedule_info('2017-03-01T08:00:00')
+        self.assertTrue(watcher.check())
+        self.assertEqual(watcher.schedule_info.updated_date, '2017-03-01T08:00:00')
+        actransit_apis.get_stops()
+        self.assertEqual(self.fetch_decode_json.call_count, 2)
+
+    @mock.patch.object(actransit_apis, 'get_gtfs_schedule_info')
+    def test_001_reload_on_change(self, get_gtfs_schedule_info):
+        changes = []
+        get_gtfs_schedule_info.return_value = schedule_info('2017-02-13T11:19:49')
+        watcher = ScheduleWatcher(reload=True, on_change=changes.append)
+        watcher.check()
+        actransit_apis.get_stops()
+
+        get_gtfs_schedule_info.return_value = schedule_info('2017-03-01T08:00:00')
+        watcher.check()
+        self.assertEqual(self.fetch_decode_json.call_count, 2)
+        self.assertEqual(len(changes), 1)
+        actransit_apis.get_stops()
+        self.assertEqual(self.fetch_decode_json.call_count, 2)
+
+    @mock.patch.object(actransit_apis, 'get_gtfs_schedule_info')
+    def test_002_response_cache(self, get_gtfs_schedule_info):
+        self.fetch_decode_json.side_effect = FETCH_DECODE_JSON
+        actransit_apis.set_response_cache(TTLCache(name='responses'))
+        self.addCleanup(actransit_apis.set_response_cache, None)
+        bodies = {'/predictions': [[], []], '/stops/': [STOPS, STOPS + [dict(STOPS[0], StopId=58124)]]}
+
+        def urlopen(request):
+            path = next(path for path in bodies if path in request.full_url)
+            return FakeResponse(json.dumps(bodies[path].pop(0)).encode('utf-8'))
+
+        get_gtfs_schedule_info.return_value = schedule_info('2017-02-13T11:19:49')
+        watcher = ScheduleWatcher(reload=True)
+        watcher.check()
+        with mock.patch.object(actransit_apis, 'urlopen', side_effect=urlopen) as fetched:
+            self.assertEqual(len(actransit_apis.get_stops()), 1)
+            actransit_apis.get_predictions(58123)
+            get_gtfs_schedule_info.return_value = schedule_info('2017-03-01T08:00:00')
+            watcher.check()
+            # reloaded from the APIs, not from the cached response of the old schedule
+            self.assertEqual(fetched.call_count, 3)
+            self.assertEqual(len(actransit_apis.get_stops()), 2)
+            # the predictions are not static data, their response stays cached
+            actransit_apis.get_predictions(58123)
+            self.assertEqual(fetched.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
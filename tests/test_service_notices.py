@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_service_notices
+----------------------------------
+
+Tests for `service_notices` module.
+"""
+
+
+import unittest
+
+from service_notices import ServiceNoticeStore
+
+
+def notice_json(post_date, url, routes):
+    return {'PostDate': post_date, 'Title': 'Detour', 'NoticeText': 'Detour on ' + url,
+            'Url': url, 'ImpactedRoutes': routes}
+
+
+class TestServiceNoticeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ServiceNoticeStore()
+        self.store.refresh([
+            notice_json('2017-02-13T00:57:45', 'a', ['51B', '1']),
+            notice_json('2017-02-13T01:00:00', 'b', ['51B']),
+        ])
+
+    def test_000_lookup_by_route(self):
+        self.assertEqual([n.url for n in self.store.notices_for_route('51B')], ['a', 'b'])
+        self.assertEqual([n.url for n in self.store.notices_for_route('1')], ['a'])
+        self.assertEqual(self.store.notices_for_route('72'), ())
+
+    def test_001_incremental_refresh(self):
+        kept = self.store.notices_for_route('1')[0]
+        added, removed = self.store.refresh([
+            notice_json('2017-02-13T00:57:45', 'a', ['51B', '1']),
+            notice_json('2017-02-14T08:00:00', 'c', ['72']),
+        ])
+        self.assertEqual([n.url for n in added], ['c'])
+        self.assertEqual([n.url for n in removed], ['b'])
+        # unchanged notices are not rebuilt
+        self.assertIs(self.store.notices_for_route('1')[0], kept)
+        self.assertEqual([n.url for n in self.store.notices_for_route('51B')], ['a'])
+        self.assertEqual(sorted(self.store.route_names), ['1', '51B', '72'])
+        self.assertEqual(len(self.store), 2)
+
+    def test_002_routes_without_notices_are_dropped(self):
+        self.store.refresh([])
+        self.assertEqual(self.store.route_names, [])
+        self.assertEqual(self.store.notices_for_route('51B'), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
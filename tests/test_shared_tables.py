@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_shared_tables
+----------------------------------
+
+Tests for `shared_tables` module.
+"""
+
+
+import multiprocessing
+import os
+import unittest
+
+from api_classes import ACTransitRoute
+from api_classes import ACTransitStop
+from shared_tables import ROUTES
+from shared_tables import SharedTablePublisher
+from shared_tables import SharedTableReader
+
+
+def stop(stop_id, name, scheduled_time=None):
+    return ACTransitStop({'StopId': stop_id, 'Name': name, 'Latitude': 37.8 + stop_id / 1000.0,
+                          'Longitude': -122.2, 'ScheduledTime': scheduled_time})
+
+
+def read_in_worker(name, queue):
+    reader = SharedTableReader(name)
+    queue.put([(s.stopId, s.name) for s in reader.rows()])
+    reader.close()
+
+
+class TestSharedTables(unittest.TestCase):
+
+    def setUp(self):
+        self.name = 'actest_{}'.format(os.getpid())
+        self.publisher = SharedTablePublisher(self.name)
+
+    def tearDown(self):
+        self.publisher.close()
+
+    def test_000_publish_and_read(self):
+        reader = SharedTableReader(self.name)
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(self.publisher.publish([stop(3, 'Broadway'), stop(1, 'Telegraph & 40th', '17:05')]), 1)
+        self.assertTrue(reader.refresh())
+        self.assertEqual([s.stopId for s in reader.rows()], [1, 3])
+        found = reader.find(1)
+        self.assertEqual((found.name, found.scheduled_time), ('Telegraph & 40th', '17:05'))
+        self.assertAlmostEqual(found.latitude, 37.801)
+        self.assertIsNone(reader.find(3).scheduled_time)
+        self.assertIsNone(reader.find(2))
+        latitudes = reader.column('latitude')
+        self.assertFalse(latitudes.flags.writeable)
+        with self.assertRaises(ValueError):
+            latitudes.flags.writeable = True
+        with self.assertRaises(ValueError):
+            latitudes[0] = 0.0
+        del latitudes
+        reader.close()
+
+    def test_001_version_swap(self):
+        self.publisher.publish([stop(1, 'A')])
+        reader = SharedTableReader(self.name)
+        old = reader.find(1)
+        self.publisher.publish([stop(1, 'B'), stop(2, 'C')])
+        # the reader keeps its version until it refreshes
+        self.assertEqual(len(reader), 1)
+        self.assertTrue(reader.refresh())
+        self.assertFalse(reader.refresh())
+        self.assertEqual(reader.version, 2)
+        self.assertEqual([s.name for s in reader.rows()], ['B', 'C'])
+        self.assertEqual(old.name, 'A')
+        reader.close()
+
+    def test_002_other_process(self):
+        self.publisher.publish([stop(5, 'Fruitvale BART'), stop(4, 'MacArthur')])
+        queue = multiprocessing.get_context('fork').Queue()
+        worker = multiprocessing.get_context('fork').Process(target=read_in_worker, args=(self.name, queue))
+        worker.start()
+        self.assertEqual(queue.get(timeout=10), [(4, 'MacArthur'), (5, 'Fruitvale BART')])
+        worker.join()
+
+    def test_003_routes(self):
+        publisher = SharedTablePublisher(self.name + 'r', ROUTES)
+        publisher.publish([ACTransitRoute({'RouteId': '51B', 'Name': '51B', 'Description': 'Rockridge BART'}),
+                           ACTransitRoute({'RouteId': '1T', 'Name': '1T', 'Description': 'International'})])
+        reader = SharedTableReader(self.name + 'r')
+        self.assertEqual(reader.find('51B').description, 'Rockridge BART')
+        self.assertIsNone(reader.find('72'))
+        reader.close()
+        publisher.close()
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(unittest.main())
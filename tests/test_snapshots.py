@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_snapshots
+----------------------------------
+
+Tests for the value semantics of the wrapper classes and the `snapshots` module.
+"""
+
+
+import unittest
+
+from api_classes import ACTransitPrediction
+from api_classes import ACTransitVehicle
+from snapshots import apply_diff
+from snapshots import diff_snapshots
+
+
+def prediction(trip_id, delay):
+    return ACTransitPrediction({
+        'StopId': 56707, 'TripId': trip_id, 'VehicleId': 5021, 'RouteName': '19',
+        'PredictedDelayInSeconds': delay, 'PredictedDeparture': '2017-01-11T17:31:00',
+        'PredictionDateTime': '2017-01-11T17:10:41'})
+
+
+def vehicle(vehicle_id, latitude):
+    return ACTransitVehicle({'VehicleId': vehicle_id, 'CurrentTripId': 1, 'Latitude': latitude,
+                             'Longitude': -122.27, 'Heading': 90, 'TimeLastReported': None})
+
+
+class TestSnapshots(unittest.TestCase):
+
+    def test_000_value_semantics(self):
+        self.assertEqual(prediction(1, 60), prediction(1, 60))
+        self.assertNotEqual(prediction(1, 60), prediction(1, 120))
+        self.assertEqual(hash(prediction(1, 60)), hash(prediction(1, 120)))
+        self.assertEqual(prediction(1, 60).key(), (56707, 1))
+        self.assertEqual(vehicle(7, 37.8).key(), (7,))
+        self.assertNotEqual(prediction(1, 60), vehicle(1, 37.8))
+        self.assertEqual(len({prediction(1, 60), prediction(1, 60), prediction(2, 60)}), 2)
+
+    def test_001_diff(self):
+        old = [prediction(1, 60), prediction(2, 60), prediction(3, 60), vehicle(1, 37.8)]
+        new = [prediction(2, 60), prediction(3, 180), prediction(4, 0), vehicle(1, 37.9)]
+        diff = diff_snapshots(old, new)
+        self.assertEqual(diff.added, [prediction(4, 0)])
+        self.assertEqual(diff.removed, [prediction(1, 60)])
+        self.assertEqual(diff.changed, [(prediction(3, 60), prediction(3, 180)),
+                                        (vehicle(1, 37.8), vehicle(1, 37.9))])
+        self.assertEqual(set(map(repr, apply_diff(old, diff))), set(map(repr, new)))
+        self.assertEqual(diff_snapshots(new, new), ([], [], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_trip_matrix
+----------------------------------
+
+Tests for `trip_matrix` and `timeutils` modules.
+"""
+
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import trip_matrix
+from actransit_apis import actransit_apis
+from api_classes import ACTransitTripEstimate
+from caching import TTLCache
+from timeutils import parse_duration
+from timeutils import parse_timestamp
+
+
+def fake_trip_estimate(route_name, origin_stop_id, destination_stop_id):
+    if destination_stop_id == 99:
+        raise IOError('no route to stop')
+    return ACTransitTripEstimate({
+        'RouteName': route_name,
+        'OriginStopId': origin_stop_id,
+        'DestinationStopId': destination_stop_id,
+        'ExpectedDepartureTime': '2017-02-14T09:15:00-08:00',
+        'TripDuration': '00:{:02d}:00'.format(destination_stop_id - origin_stop_id),
+        'VehicleId': 1,
+    })
+
+
+class TestTimeutils(unittest.TestCase):
+
+    def test_000_parse_timestamp(self):
+        self.assertAlmostEqual(parse_timestamp('2017-02-14T09:15:53.5418487-08:00'),
+                               1487092553.5418487)
+        self.assertEqual(parse_timestamp('2017-01-11T17:31:00'), 1484155860)
+        self.assertIsNone(parse_timestamp(None))
+        self.assertRaises(ValueError, parse_timestamp, 'yesterday')
+
+    def test_001_parse_duration(self):
+        self.assertAlmostEqual(parse_duration('00:12:30.5000000'), 750.5)
+        self.assertEqual(parse_duration('1.00:00:01'), 86401)
+        self.assertEqual(parse_duration('-00:01:00'), -60)
+
+
+class TestTripEstimateMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TTLCache(ttl=60)
+
+    @mock.patch.object(actransit_apis, 'get_trip_estimate', side_effect=fake_trip_estimate)
+    def test_000_matrix(self, get_trip_estimate):
+        matrix = trip_matrix.get_trip_estimate_matrix(
+            '51B', [10, 20, 10], [30, 20, 99], cache=self.cache)
+        self.assertEqual(matrix.origin_stop_ids, [10, 20])
+        self.assertEqual(matrix.destination_stop_ids, [30, 20, 99])
+        # (20, 20) is skipped, so 5 pairs are fetched
+        self.assertEqual(get_trip_estimate.call_count, 5)
+        self.assertEqual(matrix.trip_durations[0, 0], 20 * 60)
+        self.assertEqual(matrix.trip_durations[1, 0], 10 * 60)
+        self.assertTrue(np.isnan(matrix.trip_durations[1, 1]))
+        self.assertTrue(np.isnan(matrix.departure_times[0, 2]))
+        self.assertIn((10, 99), matrix.errors)
+        self.assertEqual(matrix.departure_times[0, 1], 1487092500)
+
+    @mock.patch.object(actransit_apis, 'get_trip_estimate', side_effect=fake_trip_estimate)
+    def test_001_cached_pairs_are_not_fetched(self, get_trip_estimate):
+        trip_matrix.get_trip_estimate_matrix('51B', [10], [30], cache=self.cache)
+        matrix = trip_matrix.get_trip_estimate_matrix('51B', [10, 20], [30], cache=self.cache)
+        self.assertEqual(get_trip_estimate.call_count, 2)
+        self.assertEqual(matrix.estimate(10, 30).destination_stop_id, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
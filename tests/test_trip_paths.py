@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_trip_paths
+----------------------------------
+
+Tests for `trip_paths` module.
+"""
+
+
+import unittest
+
+import numpy as np
+
+from api_classes import ACTransitTimePoint
+from api_classes import ACTransitVehicle
+from trip_paths import TripPathStore
+
+
+def timepoint(trip_id, sequence, latitude, longitude):
+    return ACTransitTimePoint({'TripId': trip_id, 'Sequence': sequence,
+                               'Latitude': latitude, 'Longitude': longitude})
+
+
+def vehicle(vehicle_id, trip_id, latitude, longitude):
+    return ACTransitVehicle({'VehicleId': vehicle_id, 'CurrentTripId': trip_id,
+                             'Latitude': latitude, 'Longitude': longitude,
+                             'Heading': 0, 'TimeLastReported': None})
+
+
+class TestTripPathStore(unittest.TestCase):
+
+    def setUp(self):
+        # out of order on purpose, the store sorts on the sequence
+        self.store = TripPathStore([
+            timepoint(1, 3, 37.80, -122.28),
+            timepoint(1, 1, 37.80, -122.30),
+            timepoint(1, 2, 37.80, -122.29),
+            timepoint(2, 1, 37.70, -122.20),
+            timepoint(2, 2, 37.71, -122.20),
+        ])
+
+    def test_000_paths_are_sorted(self):
+        sequences, latitudes, longitudes = self.store.path(1)
+        self.assertEqual(sequences.tolist(), [1, 2, 3])
+        self.assertEqual(longitudes.tolist(), [-122.30, -122.29, -122.28])
+        self.assertEqual(len(self.store), 2)
+        self.assertIn(2, self.store)
+
+    def test_001_project_vehicles(self):
+        progress = self.store.project([
+            vehicle(10, 1, 37.8001, -122.295),
+            vehicle(11, 2, 37.71, -122.20),
+            vehicle(12, 3, 37.0, -122.0),
+            vehicle(13, None, 37.8001, -122.295),
+        ])
+        self.assertAlmostEqual(progress.fraction[0], 0.25, places=3)
+        self.assertEqual(progress.next_sequence[0], 2)
+        half_segment = self.store.path_length(1) / 4.0
+        self.assertAlmostEqual(progress.distance_to_next[0], half_segment, delta=1.0)
+        self.assertAlmostEqual(progress.fraction[1], 1.0)
+        self.assertAlmostEqual(progress.distance_to_next[1], 0.0)
+        self.assertTrue(np.isnan(progress.fraction[2]))
+        self.assertEqual(progress.next_sequence[2], -1)
+        # out of service, no current trip
+        self.assertTrue(np.isnan(progress.fraction[3]))
+        self.assertEqual(progress.next_sequence[3], -1)
+
+    def test_002_replace_trip_path(self):
+        self.store.project_positions([1], [37.80], [-122.29])
+        self.store.add_timepoints([timepoint(1, 1, 37.80, -122.29),
+                                   timepoint(1, 2, 37.80, -122.27)])
+        progress = self.store.project_positions([1], [37.80], [-122.28])
+        self.assertAlmostEqual(progress.fraction[0], 0.5, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()